@@ -0,0 +1,223 @@
+import math
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+import profiler
+import progress_store
+from facet_index import FacetIndex
+
+# Elo-style Rasch model: P(correct) = 1 / (1 + exp(difficulty - ability)), both on the logit scale.
+# Step sizes shrink as a user or question collects answers
+BASE_K = 0.4
+MIN_K = 0.05
+K_DECAY_ANSWERS = 20
+# The next question is the one the user should get right this often
+TARGET_SUCCESS = 0.7
+TARGET_OFFSET = math.log(TARGET_SUCCESS / (1 - TARGET_SUCCESS))
+# Starting difficulty of questions the bank labels
+LABEL_PRIORS = {"Easy": -1.0, "Medium": 0.0, "Hard": 1.0}
+# Learned difficulty ranges shown under each label of the Difficulty selector
+BANDS = (("Easy", -math.inf, -0.5), ("Medium", -0.5, 0.5), ("Hard", 0.5, math.inf))
+# Answers a question needs before its learned difficulty replaces the bank's label
+MIN_BAND_ANSWERS = 5
+# How often the selection order and the learned difficulty bands are rebuilt from the estimates
+REFRESH_SECONDS = 60
+# Sorted positions checked per step when looking outward for the nearest unused question
+SCAN_WINDOW = 512
+# Users whose ability is kept in memory, the least recently used beyond this are read back from the store
+MAX_CACHED_USERS = 10000
+
+_lock = threading.Lock()
+# user -> [rating, answers], loaded from the progress store on first use, least recently used first
+_abilities = OrderedDict()
+
+
+# Per-bank difficulty estimates, aligned with question ids
+class Estimates:
+    __slots__ = ("values", "answers", "label_codes", "ranking", "refreshed_at", "learned")
+
+    def __init__(self, values, answers, label_codes):
+        self.values = values
+        self.answers = answers
+        # Index into BANDS plus one for the bank's own label, 0 when it has none of them
+        self.label_codes = label_codes
+        # (question ids sorted by difficulty, their difficulties), a snapshot used for selection
+        self.ranking = None
+        self.refreshed_at = 0.0
+        # (facet index with learned difficulty bands, version), the bank's own index is shared and left alone
+        self.learned = None
+
+
+# Function to get the step size for something that has been answered n times
+def _k(answers):
+    return max(MIN_K, BASE_K / (1 + answers / K_DECAY_ANSWERS))
+
+
+def probability(rating, difficulty):
+    return 1 / (1 + math.exp(difficulty - rating))
+
+
+# Function to build a bank's estimates from its labels and what the store has learned
+def _build(bank):
+    import numpy as np
+
+    with profiler.phase("adaptive_load"):
+        size = len(bank)
+        values = np.zeros(size, np.float32)
+        answers = np.zeros(size, np.uint32)
+        label_codes = np.zeros(size, np.uint8)
+        # The difficulty facet already lists each label's questions, so the labels are not read one by one
+        postings = bank.facets.postings["difficulty"]
+        for code, (label, _, _) in enumerate(BANDS, 1):
+            if label in postings:
+                ids = np.frombuffer(postings[label], dtype=np.uint32)
+                values[ids] = LABEL_PRIORS[label]
+                label_codes[ids] = code
+        learned = progress_store.get_store().load_difficulties()
+        if learned:
+            for qid, question_hash in enumerate(bank.question_hashes()):
+                row = learned.get(question_hash)
+                if row is not None:
+                    values[qid], answers[qid] = row
+        estimates = Estimates(values, answers, label_codes)
+        _rank(estimates)
+    return estimates
+
+
+# Function to re-sort the bank by difficulty for selection
+def _rank(estimates):
+    import numpy as np
+
+    order = np.argsort(estimates.values, kind="stable").astype(np.uint32)
+    estimates.ranking = (order, estimates.values[order])
+    estimates.refreshed_at = time.monotonic()
+
+
+# Function to get a bank's estimates, built on first use
+def estimates(bank):
+    if bank.estimates is None:
+        with _lock:
+            if bank.estimates is None:
+                bank.estimates = _build(bank)
+    return bank.estimates
+
+
+# Function to rebuild the selection order and the learned difficulty bands once the estimates are stale
+def refresh(bank, force=False):
+    import numpy as np
+
+    est = estimates(bank)
+    if not force and time.monotonic() - est.refreshed_at < REFRESH_SECONDS:
+        return
+    with profiler.phase("adaptive_refresh"):
+        _rank(est)
+        learned = est.answers >= MIN_BAND_ANSWERS
+        if not learned.any():
+            return
+        postings = {
+            label: ids for label, ids in bank.facets.postings["difficulty"].items()
+            if label not in LABEL_PRIORS
+        }
+        for code, (label, low, high) in enumerate(BANDS, 1):
+            in_band = np.where(learned, (est.values >= low) & (est.values < high), est.label_codes == code)
+            ids = np.flatnonzero(in_band).astype(np.uint32)
+            if len(ids):
+                postings[label] = array("I", ids.tobytes())
+        previous, version = est.learned or (bank.facets, 0)
+        if postings != previous.postings["difficulty"]:
+            est.learned = (FacetIndex.from_postings(bank.facets.size, {**bank.facets.postings, "difficulty": postings}),
+                           version + 1)
+
+
+# Function to get the facet index the filters read, with learned difficulty bands once there are any,
+# and a version that changes whenever the bands do
+def facets(bank):
+    learned = estimates(bank).learned
+    return learned if learned is not None else (bank.facets, 0)
+
+
+# Function to get a user's [rating, answers], the caller holds _lock
+def _ability_entry(user):
+    entry = _abilities.get(user)
+    if entry is not None:
+        _abilities.move_to_end(user)
+        return entry
+    row = progress_store.get_store().load_ability(user)
+    entry = _abilities[user] = list(row) if row else [0.0, 0]
+    # Every anonymous session is a new user, so the cache would otherwise grow for the life of the process
+    if len(_abilities) > MAX_CACHED_USERS:
+        _abilities.popitem(last=False)
+    return entry
+
+
+def ability(user):
+    with _lock:
+        return _ability_entry(user)[0]
+
+
+# Function to update the user's ability and the question's difficulty after an answer,
+# returns the probability the model gave the answer being correct
+def record_answer(bank, qid, user, correct):
+    est = estimates(bank)
+    with _lock:
+        entry = _ability_entry(user)
+        rating, user_answers = entry
+        difficulty = float(est.values[qid])
+        item_answers = int(est.answers[qid])
+        expected = probability(rating, difficulty)
+        error = (1.0 if correct else 0.0) - expected
+        entry[0] = rating + _k(user_answers) * error
+        entry[1] = user_answers + 1
+        difficulty -= _k(item_answers) * error
+        est.values[qid] = difficulty
+        est.answers[qid] = item_answers + 1
+        saved = (user, entry[0], entry[1], bank.question_hash(qid), difficulty, item_answers + 1)
+    progress_store.get_store().save_estimates(*saved)
+    return expected
+
+
+# Function to mark the questions an adaptive quiz may draw from
+def start_pool(bank, question_ids):
+    import numpy as np
+
+    pool = np.zeros(len(bank), dtype=bool)
+    pool[np.asarray(question_ids, dtype=np.uint32)] = True
+    return pool
+
+
+# Function to pick the unused pool question closest to the difficulty the user should get right
+# TARGET_SUCCESS of the time, and take it out of the pool; None when the pool is empty
+@profiler.timed("adaptive_pick")
+def pick_next(bank, user, pool):
+    import numpy as np
+
+    order, ranked = estimates(bank).ranking
+    target = ability(user) - TARGET_OFFSET
+    size = len(order)
+    best_qid, best_distance = None, math.inf
+    low = high = int(np.searchsorted(ranked, target))
+    # Widen a window around the target until nothing outside it could be closer than the best hit
+    while True:
+        segments = []
+        if low > 0 and target - ranked[low - 1] < best_distance:
+            segments.append((max(0, low - SCAN_WINDOW), low))
+            low = segments[-1][0]
+        if high < size and ranked[high] - target < best_distance:
+            segments.append((high, min(size, high + SCAN_WINDOW)))
+            high = segments[-1][1]
+        if not segments:
+            break
+        for start, stop in segments:
+            hits = np.flatnonzero(pool[order[start:stop]])
+            if not len(hits):
+                continue
+            distances = np.abs(ranked[start:stop][hits] - target)
+            nearest = int(distances.argmin())
+            if distances[nearest] < best_distance:
+                best_distance = float(distances[nearest])
+                best_qid = int(order[start + hits[nearest]])
+    if best_qid is not None:
+        pool[best_qid] = False
+    return best_qid
@@ -0,0 +1,166 @@
+import profiler
+import progress_store
+from progress_store import OVERALL
+
+# Topics attempts are rolled up under, with the names the dashboard shows
+DIMENSIONS = {"unit": "Unit", "lesson_name": "Lesson", "syllabus_area": "Syllabus area"}
+# Topics need this many attempts to be ranked, and their accuracy is pulled toward the user's overall
+# accuracy as if PRIOR_ATTEMPTS more answers had been given at it, so one lucky answer does not rank
+MIN_TOPIC_ATTEMPTS = 3
+PRIOR_ATTEMPTS = 5
+WEAKEST_COUNT = 5
+# Answer times kept as a sketch per question across all users, from the question being shown to the
+# answer being submitted
+LATENCY_METRIC = "response"
+# Questions need this many timed answers to be ranked by how long they take
+MIN_LATENCY_ANSWERS = 5
+SLOWEST_COUNT = 20
+
+
+# Function to get the topics an attempt at a question is rolled up under
+def topics(bank, qid):
+    lesson = bank.lesson_of(qid)
+    return {
+        "unit": bank.lesson_units[lesson],
+        "lesson_name": bank.lesson_names[lesson],
+        "syllabus_area": bank.syllabus_areas[qid],
+    }
+
+
+# Function to roll up a user's attempts from before rollups were kept, through the loaded bank.
+# Attempts at questions this bank does not have are left out
+def backfill(bank, user):
+    ids = None
+
+    def topics_of(question_hash):
+        nonlocal ids
+        if ids is None:
+            ids = {value: qid for qid, value in enumerate(bank.question_hashes())}
+        qid = ids.get(question_hash)
+        return None if qid is None else topics(bank, qid)
+
+    return progress_store.get_store().backfill_rollups(user, topics_of)
+
+
+# Function to turn summed counts into (accuracy %, average seconds) arrays
+def _rates(np, counts):
+    attempts, correct, latency_ms, timed = counts
+    accuracy = np.divide(correct * 100.0, attempts, out=np.zeros(len(attempts)), where=attempts > 0)
+    seconds = np.divide(latency_ms / 1000.0, timed, out=np.zeros(len(timed)), where=timed > 0)
+    return accuracy, seconds
+
+
+# A user's history: per topic and per day totals summed from the rollups. counts arrays are
+# (attempts, correct, latency ms, answers with a latency), one column per topic or day
+class History:
+    __slots__ = ("topics", "days", "totals")
+
+    def __init__(self, topics, days, totals):
+        # dimension -> (topic names, counts)
+        self.topics = topics
+        # (days as YYYY-MM-DD in order, counts)
+        self.days = days
+        # (attempts, correct, latency ms, timed) over everything
+        self.totals = totals
+
+    def attempts(self):
+        return int(self.totals[0])
+
+    def accuracy(self):
+        return self.totals[1] * 100 / self.totals[0] if self.totals[0] else 0.0
+
+    def avg_seconds(self):
+        return self.totals[2] / self.totals[3] / 1000 if self.totals[3] else 0.0
+
+    # Function to get accuracy % for each of the last days with answers, oldest first
+    def daily(self, days):
+        import numpy as np
+
+        names, counts = self.days
+        accuracy, _ = _rates(np, counts[:, -days:])
+        return dict(zip(names[-days:].tolist(), np.round(accuracy, 1).tolist()))
+
+    # Function to list one dimension's topics as table rows, most answered first
+    def table(self, dimension):
+        import numpy as np
+
+        names, counts = self.topics[dimension]
+        accuracy, seconds = _rates(np, counts)
+        order = np.argsort(-counts[0], kind="stable")
+        names = names.tolist()
+        return [
+            {"topic": names[i], "answered": int(counts[0, i]), "accuracy %": round(float(accuracy[i]), 1),
+             "avg seconds": round(float(seconds[i]), 1)}
+            for i in order.tolist()
+        ]
+
+    # Function to get a dimension's weakest topics as (name, accuracy %, answered), weakest first
+    def weakest(self, dimension, count=WEAKEST_COUNT):
+        import numpy as np
+
+        names, counts = self.topics[dimension]
+        attempts, correct = counts[0], counts[1]
+        overall = self.totals[1] / self.totals[0] if self.totals[0] else 0.0
+        smoothed = (correct + PRIOR_ATTEMPTS * overall) / (attempts + PRIOR_ATTEMPTS)
+        ranked = np.flatnonzero(attempts >= MIN_TOPIC_ATTEMPTS)
+        ranked = ranked[np.argsort(smoothed[ranked], kind="stable")][:count]
+        accuracy, _ = _rates(np, counts[:, ranked])
+        names = names.tolist()
+        return [(names[i], round(float(a), 1), int(attempts[i])) for i, a in zip(ranked.tolist(), accuracy)]
+
+
+# Function to sum the rows of one rollup dimension by value, returns (sorted values, counts)
+def _group(np, values, counts, mask):
+    names, inverse = np.unique(values[mask], return_inverse=True)
+    grouped = np.zeros((4, len(names)), dtype=np.int64)
+    for row in range(4):
+        grouped[row] = np.bincount(inverse, weights=counts[row, mask], minlength=len(names))
+    return names, grouped
+
+
+# Function to load a user's history; the work grows with the number of topics and days practised,
+# not with the number of attempts
+@profiler.timed("analytics")
+def history(user):
+    import numpy as np
+
+    rows = progress_store.get_store().load_rollups(user)
+    if not rows:
+        empty = (np.array([], dtype=str), np.zeros((4, 0), dtype=np.int64))
+        return History({dimension: empty for dimension in DIMENSIONS}, empty, np.zeros(4, dtype=np.int64))
+    dimensions, values, days, *counts = zip(*rows)
+    dimensions = np.array(dimensions)
+    values = np.array(values)
+    counts = np.array(counts, dtype=np.int64)
+    overall = dimensions == OVERALL
+    topic_totals = {dimension: _group(np, values, counts, dimensions == dimension) for dimension in DIMENSIONS}
+    by_day = _group(np, np.array(days), counts, overall)
+    return History(topic_totals, by_day, counts[:, overall].sum(axis=1))
+
+
+# Function to list the questions of the loaded bank that take longest to answer across all users, ranked by
+# their 90th percentile time, as table rows. Summaries are kept per question as answers come in, so this
+# reads one row per question that has enough answers
+@profiler.timed("analytics")
+def slowest_questions(bank, count=SLOWEST_COUNT, min_answers=MIN_LATENCY_ANSWERS):
+    slowest = progress_store.get_store().load_slowest(LATENCY_METRIC, min_answers)
+    if not slowest:
+        return []
+    # Summaries are kept by question hash across every bank, only the ones in this bank are listed
+    ranks = {row[0]: rank for rank, row in enumerate(slowest)}
+    found = {}
+    for qid, question_hash in enumerate(bank.question_hashes()):
+        rank = ranks.get(question_hash)
+        if rank is not None:
+            found[rank] = qid
+    rows = []
+    for rank in sorted(found)[:count]:
+        _, answers, p50, p90, p99 = slowest[rank]
+        rows.append({
+            "question": bank.questions[found[rank]],
+            "answers": answers,
+            "median s": round(p50 / 1000, 1),
+            "p90 s": round(p90 / 1000, 1),
+            "p99 s": round(p99 / 1000, 1),
+        })
+    return rows
@@ -0,0 +1,211 @@
+"""Measure per-click rerun latency of main.py headlessly with Streamlit's AppTest.
+
+    python benchmarks/bench_reruns.py --sizes 100,10000 --output bench.json
+
+Each bank size runs in its own subprocess so peak RSS is per size. The
+result is one JSON document; compare two of them with --compare.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCH_DIR), "main.py")
+DEFAULT_SIZES = "100,10000,100000,1000000"
+# Questions read by the streaming-load measurement, the sidebar's default cap
+STREAM_PAIRS = 1000
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(APP_PATH))
+
+
+# Function to summarize a list of millisecond timings
+def summarize(samples):
+    ordered = sorted(samples)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))], 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+# Function to get this process's peak resident set size in MB
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+# Click recorder around one AppTest session
+class Session:
+    def __init__(self, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.timings = {}
+
+    def run(self, name, element=None):
+        started = time.perf_counter()
+        if element is None:
+            self.app.run()
+        else:
+            element.click().run()
+        self.timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        if self.app.exception:
+            raise RuntimeError(f"{name}: {self.app.exception[0].value}")
+
+    def button(self, key):
+        return self.app.button(key=key)
+
+    def option_button(self):
+        return self.app.button(key=f"btn_A_{self.app.session_state.quiz.cursor}")
+
+
+# Function to script home -> quiz -> answer/next -> results and the flashcard loop
+def drive(session, quiz_rounds, card_rounds):
+    session.run("cold_start")
+    session.run("home_rerun")
+    session.run("start_quiz", session.button("start_quiz"))
+    while not session.app.session_state.quiz.finished():
+        session.run("answer", session.option_button())
+        session.run("next_question", session.button("next_btn"))
+        if len(session.timings["answer"]) >= quiz_rounds:
+            break
+    session.run("nav_flashcards", session.button("nav_flashcards"))
+    for _ in range(card_rounds):
+        session.run("flip_card", session.button("flip_btn"))
+        session.run("rate_card", session.button("mastery_3"))
+        session.run("next_card", session.button("next_btn"))
+
+
+# Function to time a streaming load capped like the app's default, with its peak traced memory. The app
+# leaves tracing off because tracemalloc is process-wide; this subprocess only runs one size
+def measure_stream_load(bank_path):
+    import quiz_bank
+
+    with open(bank_path, "rb") as f:
+        _, stats = quiz_bank.load_bank_streaming(
+            f, max_pairs=STREAM_PAIRS, cache=quiz_bank.BankCache(), trace_memory=True
+        )
+    return {"pairs": stats["pairs"], "peak_mb": round(stats["peak_bytes"] / 1e6, 2),
+            "seconds": round(stats["seconds"], 3)}
+
+
+# Function to benchmark one bank size inside the current process
+def bench_size(size, quiz_rounds, card_rounds, timeout):
+    from synthetic_bank import write_bank
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bank_path = os.path.join(tmp, f"bank_{size}.json")
+        started = time.perf_counter()
+        write_bank(bank_path, size)
+        generate_s = time.perf_counter() - started
+        stream_load = measure_stream_load(bank_path)
+        os.environ["QUIZ_BANK_PATH"] = bank_path
+        os.environ["QUIZ_PROGRESS_DB"] = os.path.join(tmp, "progress.db")
+
+        session = Session(timeout)
+        drive(session, quiz_rounds, card_rounds)
+        return {
+            "size": size,
+            "bank_bytes": os.path.getsize(bank_path),
+            "generate_s": round(generate_s, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            "stream_load": stream_load,
+            "interactions": {name: summarize(samples) for name, samples in session.timings.items()},
+        }
+
+
+# Function to get the current commit, if this is a git checkout
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(APP_PATH),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Function to print the p50 change of every interaction between two result files
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = {r["size"]: r for r in json.load(f)["results"] if "interactions" in r}
+    with open(new_path) as f:
+        new = {r["size"]: r for r in json.load(f)["results"] if "interactions" in r}
+    for size in sorted(set(old) & set(new)):
+        for name, stats in new[size]["interactions"].items():
+            before = old[size]["interactions"].get(name)
+            if before:
+                change = (stats["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100
+                print(
+                    f"{size:>9} {name:<16} p50 {before['p50_ms']:>9.1f} -> {stats['p50_ms']:>9.1f} ms "
+                    f"({change:+.1f}%)"
+                )
+        print(f"{size:>9} {'peak_rss_mb':<16}     {old[size]['peak_rss_mb']:>9.1f} -> {new[size]['peak_rss_mb']:>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma separated bank sizes")
+    parser.add_argument("--quiz-rounds", type=int, default=10, help="questions answered per run")
+    parser.add_argument("--card-rounds", type=int, default=10, help="flashcards rated per run")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per rerun")
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.single:
+        result = bench_size(args.single, args.quiz_rounds, args.card_rounds, args.timeout)
+        json.dump(result, sys.stdout)
+        return
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        print(f"Benchmarking {size} questions...", file=sys.stderr)
+        proc = subprocess.run(
+            [sys.executable, __file__, "--single", str(size), "--quiz-rounds", str(args.quiz_rounds),
+             "--card-rounds", str(args.card_rounds), "--timeout", str(args.timeout)],
+            capture_output=True, text=True,
+        )
+        if proc.returncode:
+            print(proc.stderr, file=sys.stderr)
+            results.append({"size": size, "error": proc.stderr.strip().splitlines()[-1:]})
+            continue
+        results.append(json.loads(proc.stdout))
+
+    import streamlit
+
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
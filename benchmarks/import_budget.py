@@ -0,0 +1,85 @@
+"""Check the app's cold start against an import-time budget.
+
+    python benchmarks/import_budget.py --budget-ms 1000
+
+A fresh interpreter imports Streamlit and renders the home page once with
+AppTest. The script reports the time of each step and fails if the total is
+over budget or if a deferred module (pandas, PIL, numpy) was imported.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(os.path.dirname(BENCH_DIR), "main.py")
+# Modules the home page must not pull in, views import them when they need them
+DEFERRED = ("pandas", "PIL", "numpy")
+DEFAULT_BUDGET_MS = 1000
+
+
+# Function to time one cold start, run in its own interpreter so nothing is cached
+def measure(timeout):
+    started = time.perf_counter()
+    import streamlit  # noqa: F401
+
+    streamlit_ms = (time.perf_counter() - started) * 1000
+    from streamlit.testing.v1 import AppTest
+
+    preloaded = [name for name in DEFERRED if name in sys.modules]
+    started = time.perf_counter()
+    app = AppTest.from_file(APP_PATH, default_timeout=timeout).run()
+    home_ms = (time.perf_counter() - started) * 1000
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return {
+        "streamlit_import_ms": round(streamlit_ms, 1),
+        "home_render_ms": round(home_ms, 1),
+        "total_ms": round(streamlit_ms + home_ms, 1),
+        # Only count modules the app imported, not ones the test harness already had
+        "deferred_imported": [name for name in DEFERRED if name in sys.modules and name not in preloaded],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="allowed cold start in ms")
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to measure, the fastest is kept")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed for the home page")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        json.dump(measure(args.timeout), sys.stdout)
+        return
+
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # Home page without a bank or saved progress, as a new container sees it
+        env = dict(os.environ, QUIZ_PROGRESS_DB=os.path.join(tmp, "progress.db"))
+        env.pop("QUIZ_BANK_PATH", None)
+        for _ in range(args.runs):
+            proc = subprocess.run(
+                [sys.executable, __file__, "--single", "--timeout", str(args.timeout)],
+                capture_output=True, text=True, env=env,
+            )
+            if proc.returncode:
+                print(proc.stderr, file=sys.stderr)
+                sys.exit(proc.returncode)
+            runs.append(json.loads(proc.stdout))
+
+    best = min(runs, key=lambda r: r["total_ms"])
+    print(json.dumps({"budget_ms": args.budget_ms, "best": best, "runs": runs}, indent=2))
+    if best["deferred_imported"]:
+        print(f"Home page imported deferred modules: {', '.join(best['deferred_imported'])}", file=sys.stderr)
+        sys.exit(1)
+    if best["total_ms"] > args.budget_ms:
+        print(f"Cold start {best['total_ms']:.0f} ms is over the {args.budget_ms:.0f} ms budget", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Load test main.py with concurrent simulated students driven by Streamlit's AppTest.
+
+    python benchmarks/load_test.py --stages 1,2,4,8 --size 10000 --output load.json
+    python benchmarks/load_test.py --bank tnpsc_bank.qbank --stages 4,16 --think 3
+
+Each stage starts that many new students at once. A student uploads the bank,
+sets a name, answers a quiz and rates flashcards (in random order), pausing a
+log-normal think time before each click. Students of earlier stages stay
+connected but idle, so the RSS after each stage shows what a held session
+costs.
+
+AppTest swaps process-wide Streamlit globals (the runtime and config options)
+on every run, so runs are serialized with a lock. Waiting for another
+student's rerun counts toward latency, as it would on a server whose reruns
+share one interpreter.
+"""
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_reruns import APP_PATH, git_commit, peak_rss_mb, summarize
+
+DEFAULT_STAGES = "1,2,4,8"
+# Spread of think times around their median, as the sigma of a log-normal
+THINK_SIGMA = 0.5
+# One AppTest run at a time, see the module docstring
+_run_lock = threading.Lock()
+
+
+# Function to get this process's current resident set size in MB, the peak where that is all there is
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+# One simulated student, an AppTest session with its own think times and click timings
+class Student:
+    def __init__(self, number, timeout, think, seed):
+        from streamlit.testing.v1 import AppTest
+
+        self.number = number
+        self.app = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.think = think
+        self.rng = random.Random(seed)
+        # interaction -> [ms]
+        self.timings = {}
+
+    def pause(self):
+        if self.think > 0:
+            time.sleep(self.rng.lognormvariate(math.log(self.think), THINK_SIGMA))
+
+    # Function to run the app once, after a click or widget change on element; latency includes the wait
+    # for other students' runs
+    def run(self, name, element=None):
+        if element is not None:
+            self.pause()
+        started = time.perf_counter()
+        with _run_lock:
+            if element is None:
+                self.app.run()
+            else:
+                element.run()
+        self.timings.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+        if self.app.exception:
+            raise RuntimeError(f"{name}: {self.app.exception[0].value}")
+
+    def button(self, key):
+        return self.app.button(key=key)
+
+
+# Function to answer up to rounds questions of a new quiz, picking options at random
+def take_quiz(student, rounds):
+    student.run("nav_quiz", student.button("nav_quiz").click())
+    for _ in range(rounds):
+        quiz = student.app.session_state.quiz
+        if quiz.finished():
+            break
+        suffix = f"_{quiz.cursor}"
+        options = [b for b in student.app.button if b.key and b.key.startswith("btn_") and b.key.endswith(suffix)]
+        student.run("answer", student.rng.choice(options).click())
+        student.run("next_question", student.button("next_btn").click())
+
+
+# Function to flip and rate up to rounds flashcards
+def study_cards(student, rounds):
+    student.run("nav_flashcards", student.button("nav_flashcards").click())
+    for _ in range(rounds):
+        student.run("flip_card", student.button("flip_btn").click())
+        student.run("rate_card", student.button(f"mastery_{student.rng.randint(0, 5)}").click())
+        if student.button("next_btn").disabled:
+            break
+        student.run("next_card", student.button("next_btn").click())
+
+
+# Function to play one student from opening the app to the end of both flows, returns an error or None
+def study(student, bank, quiz_rounds, card_rounds):
+    name, raw = bank
+    try:
+        student.run("cold_start")
+        # Every browser uploads its own copy of the file, so each session gets its own bytes
+        upload = (name, bytes(bytearray(raw)), "application/octet-stream")
+        student.run("upload", student.app.file_uploader[0].set_value([upload]))
+        student.run("set_name", student.app.text_input(key="user_name").input(f"student{student.number}"))
+        flows = [lambda: take_quiz(student, quiz_rounds), lambda: study_cards(student, card_rounds)]
+        student.rng.shuffle(flows)
+        for flow in flows:
+            flow()
+    except Exception as e:
+        return f"student {student.number}: {type(e).__name__}: {e}"
+    return None
+
+
+# Function to run one stage of new students at once, returns its report
+def run_stage(count, first_number, bank, args):
+    students = [
+        Student(first_number + i, args.timeout, args.think, args.seed + first_number + i) for i in range(count)
+    ]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        errors = [e for e in pool.map(lambda s: study(s, bank, args.quiz_rounds, args.card_rounds), students) if e]
+    wall = time.perf_counter() - started
+    by_name = {}
+    for student in students:
+        for name, samples in student.timings.items():
+            by_name.setdefault(name, []).extend(samples)
+    # The first click of each student loads the app, it is reported on its own and left out of the totals
+    clicks = [ms for name, samples in by_name.items() if name != "cold_start" for ms in samples]
+    return students, {
+        "students": count,
+        "wall_s": round(wall, 2),
+        "reruns": sum(len(samples) for samples in by_name.values()),
+        "reruns_per_s": round(sum(len(samples) for samples in by_name.values()) / wall, 2),
+        "rerun_latency": summarize(clicks) if clicks else None,
+        "interactions": {name: summarize(samples) for name, samples in sorted(by_name.items())},
+        "errors": errors,
+    }
+
+
+# Function to get the bank every student uploads, as (file name, bytes)
+def load_bank(args, tmp):
+    if args.bank:
+        with open(args.bank, "rb") as f:
+            return os.path.basename(args.bank), f.read()
+    from synthetic_bank import write_bank
+
+    path = os.path.join(tmp, f"bank_{args.size}.json")
+    write_bank(path, args.size)
+    with open(path, "rb") as f:
+        return os.path.basename(path), f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", default=DEFAULT_STAGES, help="comma separated students started per stage")
+    parser.add_argument("--size", type=int, default=10000, help="questions in the synthetic bank")
+    parser.add_argument("--bank", help="upload this JSON or .qbank file instead of a synthetic bank")
+    parser.add_argument("--think", type=float, default=2.0, help="median seconds between clicks, 0 for none")
+    parser.add_argument("--quiz-rounds", type=int, default=10, help="questions answered per student")
+    parser.add_argument("--card-rounds", type=int, default=10, help="flashcards rated per student")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Students upload the bank, a server bank would stand in for their uploads
+        os.environ.pop("QUIZ_BANK_PATH", None)
+        os.environ["QUIZ_PROGRESS_DB"] = os.path.join(tmp, "progress.db")
+        os.environ["QUIZ_BANK_SPOOL_DIR"] = tmp
+        bank = load_bank(args, tmp)
+
+        import streamlit
+
+        gc.collect()
+        baseline_rss = current_rss_mb()
+        held = []
+        stages = []
+        for count in (int(s) for s in args.stages.split(",")):
+            print(f"Starting {count} students ({len(held)} connected)...", file=sys.stderr)
+            previous_rss = stages[-1]["rss_mb"] if stages else baseline_rss
+            students, stage = run_stage(count, len(held) + 1, bank, args)
+            # Finished students stay connected, like open browser tabs
+            held.extend(students)
+            gc.collect()
+            stage["connected"] = len(held)
+            stage["rss_mb"] = current_rss_mb()
+            stage["rss_per_added_session_mb"] = round((stage["rss_mb"] - previous_rss) / count, 2)
+            stages.append(stage)
+        # Answers still queued are written before the progress database is removed
+        if "progress_store" in sys.modules:
+            sys.modules["progress_store"].get_store().flush()
+
+    # The first stage also loads the bank, later ones show what another session costs
+    steady = None
+    if len(stages) > 1:
+        steady = round(
+            (stages[-1]["rss_mb"] - stages[0]["rss_mb"]) / (stages[-1]["connected"] - stages[0]["connected"]), 2
+        )
+    report = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "streamlit": streamlit.__version__,
+        "bank": {"name": bank[0], "bytes": len(bank[1])},
+        "think_s": args.think,
+        "baseline_rss_mb": baseline_rss,
+        "rss_per_session_mb": steady,
+        "stages": stages,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
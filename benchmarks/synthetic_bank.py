@@ -0,0 +1,65 @@
+"""Write synthetic quiz banks in the app's JSON format.
+
+    python benchmarks/synthetic_bank.py 100000 bank_100k.json
+"""
+import argparse
+import json
+import random
+
+UNITS = ["Unit I: General Science", "Unit II: Current Events", "Unit III: Geography",
+         "Unit IV: History and Culture", "Unit V: Indian Polity", "Unit VI: Indian Economy",
+         "Unit VII: National Movement", "Unit VIII: Tamil Society", "Unit IX: Development Administration",
+         "Unit X: Aptitude"]
+AREAS = ["Polity", "History", "Geography", "Economy", "Science", "Tamil Culture", "Current Affairs"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+WORDS = ("சோழர் பாண்டியர் சேரர் கல்வெட்டு சங்க இலக்கியம் அரசியலமைப்பு நீதிமன்றம் ஆறு மலை "
+         "constitution parliament river dynasty inscription monsoon budget census article temple "
+         "kingdom treaty revenue election governor plateau delta harbour literature reform").split()
+PAIRS_PER_LESSON = 50
+
+
+# Function to make a short sentence of random bank words
+def _sentence(rng, length):
+    return " ".join(rng.choice(WORDS) for _ in range(length))
+
+
+# Function to build one synthetic pair
+def make_pair(rng, index):
+    options = [f"{_sentence(rng, 3)} {index}-{letter}" for letter in "ABCD"]
+    correct = rng.choice("ABCD")
+    return {
+        "question": f"{_sentence(rng, 8)} ({index})?",
+        "answer": options["ABCD".index(correct)],
+        "options": [{letter: text} for letter, text in zip("ABCD", options)],
+        "correct_option": correct,
+        "explanation": _sentence(rng, 20),
+        "syllabus_area": rng.choice(AREAS),
+        "difficulty": rng.choice(DIFFICULTIES),
+    }
+
+
+# Function to stream a bank of num_questions pairs to a file without holding it in memory
+def write_bank(path, num_questions, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for lesson_index, start in enumerate(range(0, num_questions, PAIRS_PER_LESSON)):
+            count = min(PAIRS_PER_LESSON, num_questions - start)
+            lesson = {
+                "lesson_name": f"Lesson {lesson_index + 1}",
+                "unit": UNITS[lesson_index % len(UNITS)],
+                "pairs": [make_pair(rng, start + i) for i in range(count)],
+            }
+            if lesson_index:
+                f.write(",\n")
+            json.dump(lesson, f, ensure_ascii=False)
+        f.write("]\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("num_questions", type=int)
+    parser.add_argument("path")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    write_bank(args.path, args.num_questions, args.seed)
@@ -0,0 +1,341 @@
+import hashlib
+import io
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+import profiler
+from facet_index import FACETS, FacetIndex
+from memory_aids import TOP_TERMS
+from question_bank import QuestionBank
+
+# Compiled banks start with the magic, the format version and a sha256 of everything after this prefix
+PREFIX = struct.Struct("<4sHH32s")
+MAGIC = b"QBNK"
+VERSION = 1
+EXTENSION = ".qbank"
+# Then the questions, lessons and strings counts, and one (offset, length) directory entry per section
+COUNTS = struct.Struct("<III")
+ENTRY = struct.Struct("<QQ")
+SECTIONS = (
+    "string_offsets",  # uint64 per string plus one, into string_data
+    "string_data",     # UTF-8 text of every distinct string
+    "records",         # RECORD_FIELDS uint32 string ids per question
+    "option_offsets",  # uint32 per question plus one, into option_ids
+    "option_ids",      # uint32 string id per option
+    "lessons",         # LESSON_FIELDS uint32 string ids per lesson
+    "lesson_offsets",  # uint32 per lesson plus one, the first question id of each lesson
+    "hashes",          # 8 bytes per question, its question_hash
+    "key_terms",       # TOP_TERMS uint32 string ids per question
+    "facet_table",     # per facet in FACETS order: label count, then (label id, start, count) per label
+    "facet_ids",       # uint32 question ids of every posting list
+)
+RECORD_FIELDS = ("questions", "answers", "correct_options", "explanations", "syllabus_areas", "difficulties")
+LESSON_FIELDS = ("lesson_names", "lesson_units", "lesson_sources")
+# String id written for a missing value
+NONE = 0xFFFFFFFF
+HASH_BYTES = 8
+# Sections start on 8-byte boundaries so they can be viewed as typed arrays in place
+ALIGN = 8
+# Uploaded compiled banks are written here once and mapped, so every worker process shares their pages
+SPOOL_DIR = os.environ.get("QUIZ_BANK_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "quiz_banks")
+
+
+# Function to check whether raw bytes (or a file's first bytes) are a compiled bank
+def is_compiled(raw):
+    return raw[:len(MAGIC)] == MAGIC
+
+
+# Function to check whether a file is a compiled bank without reading all of it
+def is_compiled_file(path):
+    with open(path, "rb") as f:
+        return is_compiled(f.read(len(MAGIC)))
+
+
+# Function to view a little-endian section as a typed array, in place where the host byte order allows
+def _view(buffer, typecode):
+    if sys.byteorder == "little":
+        return buffer.cast(typecode)
+    values = array(typecode, bytes(buffer))
+    values.byteswap()
+    return values
+
+
+# Function to get the bytes of an array in little-endian order
+def le_bytes(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+# Function to read a little-endian array back as a copy
+def le_array(typecode, data):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+# Strings of a compiled bank, decoded from the mapped file when they are read
+class StringTable:
+    __slots__ = ("offsets", "data")
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, string_id):
+        if string_id == NONE:
+            return None
+        return str(self.data[self.offsets[string_id]:self.offsets[string_id + 1]], "utf-8")
+
+
+# One string column of a compiled bank, a read-only sequence like the lists of a parsed bank
+class StringColumn:
+    __slots__ = ("table", "ids")
+
+    def __init__(self, table, ids):
+        self.table = table
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.table[string_id] for string_id in self.ids[index]]
+        return self.table[self.ids[index]]
+
+    def __iter__(self):
+        return map(self.table.__getitem__, self.ids)
+
+
+# Question hashes of a compiled bank, stored as raw bytes and read as hex
+class HashColumn:
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // HASH_BYTES
+
+    def __getitem__(self, qid):
+        if qid < 0:
+            qid += len(self)
+        return self.data[qid * HASH_BYTES:(qid + 1) * HASH_BYTES].hex()
+
+    def __iter__(self):
+        return (self[qid] for qid in range(len(self)))
+
+
+# Key terms of a compiled bank, each question's tuple read from its fixed slots
+class KeyTermsColumn:
+    __slots__ = ("table", "ids")
+
+    def __init__(self, table, ids):
+        self.table = table
+        self.ids = ids
+
+    def __len__(self):
+        return len(self.ids) // TOP_TERMS
+
+    def __getitem__(self, qid):
+        slots = self.ids[qid * TOP_TERMS:(qid + 1) * TOP_TERMS]
+        return tuple(self.table[string_id] for string_id in slots if string_id != NONE)
+
+
+# Function to write an indexed bank in the compiled format to a seekable binary file, returns the
+# content hash as hex. Sections are written one at a time so a large bank is not copied whole
+@profiler.timed("compile_bank")
+def write_bank(bank, f):
+    strings = {}
+
+    def string_id(value):
+        if value is None:
+            return NONE
+        found = strings.get(value)
+        if found is None:
+            found = strings[value] = len(strings)
+        return found
+
+    size = len(bank)
+    records = array("I", [0]) * (size * len(RECORD_FIELDS))
+    for field, name in enumerate(RECORD_FIELDS):
+        records[field::len(RECORD_FIELDS)] = array("I", map(string_id, getattr(bank, name)))
+    lessons = array("I", [0]) * (bank.num_lessons() * len(LESSON_FIELDS))
+    for field, name in enumerate(LESSON_FIELDS):
+        lessons[field::len(LESSON_FIELDS)] = array("I", map(string_id, getattr(bank, name)))
+    option_ids = array("I", map(string_id, bank.option_texts))
+
+    key_terms = array("I", [NONE]) * (size * TOP_TERMS)
+    if bank.key_terms is not None:
+        for qid, terms in enumerate(bank.key_terms):
+            for slot, term in enumerate(terms[:TOP_TERMS]):
+                key_terms[qid * TOP_TERMS + slot] = string_id(term)
+
+    facet_table, facet_ids = array("I"), array("I")
+    for name in FACETS:
+        postings = bank.facets.postings[name] if bank.facets is not None else {}
+        facet_table.append(len(postings))
+        for label, ids in postings.items():
+            facet_table.extend((string_id(label), len(facet_ids), len(ids)))
+            facet_ids.extend(ids)
+
+    encoded = [text.encode("utf-8") for text in strings]
+    string_offsets = array("Q", [0]) * (len(encoded) + 1)
+    total = 0
+    for index, data in enumerate(encoded, 1):
+        total += len(data)
+        string_offsets[index] = total
+
+    # Each section is a list of byte chunks
+    sections = {
+        "string_offsets": [le_bytes(string_offsets)],
+        "string_data": encoded,
+        "records": [le_bytes(records)],
+        "option_offsets": [le_bytes(array("I", bank.option_offsets))],
+        "option_ids": [le_bytes(option_ids)],
+        "lessons": [le_bytes(lessons)],
+        "lesson_offsets": [le_bytes(array("I", bank.lesson_offsets))],
+        "hashes": [bytes.fromhex("".join(bank.question_hashes()))],
+        "key_terms": [le_bytes(key_terms)],
+        "facet_table": [le_bytes(facet_table)],
+        "facet_ids": [le_bytes(facet_ids)],
+    }
+
+    # Directory offsets are from the start of the file, each section padded to ALIGN
+    offset = PREFIX.size + COUNTS.size + ENTRY.size * len(SECTIONS)
+    head = [COUNTS.pack(size, bank.num_lessons(), len(strings))]
+    paddings = []
+    for name in SECTIONS:
+        length = sum(map(len, sections[name]))
+        paddings.append(b"\0" * (-offset % ALIGN))
+        offset += len(paddings[-1])
+        head.append(ENTRY.pack(offset, length))
+        offset += length
+
+    # The prefix is written last, once the content hash is known
+    hasher = hashlib.sha256()
+    start = f.tell()
+    f.write(b"\0" * PREFIX.size)
+    for chunk in head:
+        hasher.update(chunk)
+        f.write(chunk)
+    for padding, name in zip(paddings, SECTIONS):
+        for chunk in (padding, *sections[name]):
+            hasher.update(chunk)
+            f.write(chunk)
+    end = f.tell()
+    f.seek(start)
+    f.write(PREFIX.pack(MAGIC, VERSION, 0, hasher.digest()))
+    f.seek(end)
+    return hasher.hexdigest()
+
+
+# Function to pack an indexed bank into the compiled format, returns the file's bytes
+def compile_bank(bank):
+    buffer = io.BytesIO()
+    write_bank(bank, buffer)
+    return buffer.getvalue()
+
+
+# Function to read a compiled bank's prefix, returns the content hash it claims as hex without checking it
+def content_hash(buffer):
+    if len(buffer) < PREFIX.size + COUNTS.size:
+        raise ValueError("Compiled bank is truncated.")
+    magic, version, _, content_hash = PREFIX.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError("Not a compiled quiz bank.")
+    if version != VERSION:
+        raise ValueError(f"Compiled bank has format version {version}, this app reads version {VERSION}.")
+    return content_hash.hex()
+
+
+# Function to check a compiled bank's bytes against its content hash, returns the hash as hex
+@profiler.timed("verify_bank")
+def verify(buffer):
+    expected = content_hash(buffer)
+    if hashlib.sha256(memoryview(buffer)[PREFIX.size:]).hexdigest() != expected:
+        raise ValueError("Compiled bank is corrupt: its content hash does not match.")
+    return expected
+
+
+# Function to build a bank over a compiled file's buffer (an mmap or bytes) without copying its sections
+def bank_from_buffer(buffer, size=0):
+    digest = content_hash(buffer)
+    view = memoryview(buffer)
+    num_questions, num_lessons, num_strings = COUNTS.unpack_from(view, PREFIX.size)
+    sections = {}
+    position = PREFIX.size + COUNTS.size
+    for name in SECTIONS:
+        offset, length = ENTRY.unpack_from(view, position)
+        position += ENTRY.size
+        if offset + length > len(view):
+            raise ValueError("Compiled bank is truncated.")
+        sections[name] = view[offset:offset + length]
+
+    table = StringTable(_view(sections["string_offsets"], "Q"), sections["string_data"])
+    records = _view(sections["records"], "I")
+    lessons = _view(sections["lessons"], "I")
+    if len(table) != num_strings or len(records) != num_questions * len(RECORD_FIELDS):
+        raise ValueError("Compiled bank sections do not match its counts.")
+
+    bank = QuestionBank(digest, size)
+    for field, name in enumerate(RECORD_FIELDS):
+        setattr(bank, name, StringColumn(table, records[field::len(RECORD_FIELDS)]))
+    for field, name in enumerate(LESSON_FIELDS):
+        setattr(bank, name, StringColumn(table, lessons[field::len(LESSON_FIELDS)]))
+    bank.option_texts = StringColumn(table, _view(sections["option_ids"], "I"))
+    bank.option_offsets = _view(sections["option_offsets"], "I")
+    bank.lesson_offsets = _view(sections["lesson_offsets"], "I")
+    bank._hashes = HashColumn(sections["hashes"])
+    bank.key_terms = KeyTermsColumn(table, _view(sections["key_terms"], "I"))
+
+    # Posting lists stay slices of the mapped ids, only the labels are decoded
+    facet_table = _view(sections["facet_table"], "I")
+    facet_ids = _view(sections["facet_ids"], "I")
+    postings = {}
+    position = 0
+    for name in FACETS:
+        labels = facet_table[position]
+        position += 1
+        postings[name] = {}
+        for _ in range(labels):
+            label, start, count = facet_table[position:position + 3]
+            postings[name][table[label]] = facet_ids[start:start + count]
+            position += 3
+    bank.facets = FacetIndex.from_postings(num_questions, postings)
+    if num_lessons != bank.num_lessons():
+        raise ValueError("Compiled bank sections do not match its counts.")
+    return bank
+
+
+# Function to memory-map a compiled bank file, its pages are shared with every process mapping it
+@profiler.timed("map_bank")
+def open_bank(path):
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Mapped pages live in the page cache, so they are not counted against the bank cache's byte cap
+    return bank_from_buffer(mapped)
+
+
+# Function to save uploaded compiled bytes under their content hash and map the saved file
+def open_uploaded(raw, digest):
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    path = os.path.join(SPOOL_DIR, digest + EXTENSION)
+    if not os.path.exists(path):
+        # Written under a temporary name first so other workers never map a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=SPOOL_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+    return open_bank(path)
@@ -0,0 +1,109 @@
+"""Compile quiz JSON banks into the binary format the app memory-maps.
+
+    python compile_bank.py tnpsc_bank.json -o tnpsc_bank.qbank
+    python compile_bank.py lessons/ -o lessons.qbank --report problems.json
+    python compile_bank.py --verify tnpsc_bank.qbank
+
+Several JSON files, or a directory of them, are merged into one bank the way
+the app merges uploads. The bank is checked and indexed here once; the app
+maps the result and reads strings, records, facet postings, question hashes
+and memory-aid terms in place. Upload the .qbank file or point
+QUIZ_BANK_PATH at it.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import binary_bank
+import quiz_bank
+
+
+# Function to load the inputs the way the app would, as one checked and indexed bank
+def load_inputs(paths):
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        return quiz_bank.load_bank_dir(paths[0])
+    if len(paths) == 1:
+        # One file is read lesson by lesson, so the whole JSON document is never in memory at once
+        with open(paths[0], "rb") as f:
+            return quiz_bank.load_bank_streaming(f)[0]
+    files = []
+    for path in paths:
+        with open(path, "rb") as f:
+            files.append((os.path.basename(path), f.read()))
+    return quiz_bank.load_bank_files(files)
+
+
+# Function to compile a bank to a file so readers never see a partial one, returns its size in bytes
+def write_compiled(bank, path):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            binary_bank.write_bank(bank, f)
+            size = f.tell()
+        # The app may run as another user, so the bank is readable like any other data file
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return size
+
+
+# Function to check compiled files against their content hashes
+def verify(paths):
+    failed = False
+    for path in paths:
+        with open(path, "rb") as f:
+            raw = f.read()
+        try:
+            digest = binary_bank.verify(raw)
+            bank = binary_bank.bank_from_buffer(raw)
+        except ValueError as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            failed = True
+            continue
+        print(f"{path}: ok, {len(bank)} questions in {bank.num_lessons()} lessons, sha256 {digest}")
+    return not failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="JSON bank files or one directory of them")
+    parser.add_argument("-o", "--output", help="compiled file to write (default: first input with .qbank)")
+    parser.add_argument("--report", help="write the validation report as JSON to this path")
+    parser.add_argument("--verify", action="store_true", help="check compiled files instead of compiling")
+    args = parser.parse_args()
+
+    if args.verify:
+        sys.exit(0 if verify(args.inputs) else 1)
+
+    output = args.output or os.path.splitext(os.path.normpath(args.inputs[0]))[0] + binary_bank.EXTENSION
+    started = time.perf_counter()
+    try:
+        bank = load_inputs(args.inputs)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    loaded = time.perf_counter()
+    size = write_compiled(bank, output)
+
+    report = bank.report
+    if args.report and report is not None:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, indent=2, ensure_ascii=False)
+    print(json.dumps({
+        "output": output,
+        "questions": len(bank),
+        "lessons": bank.num_lessons(),
+        "bytes": size,
+        "load_seconds": round(loaded - started, 2),
+        "compile_seconds": round(time.perf_counter() - loaded, 2),
+        "problems": report.summary() if report is not None and not report.clean() else None,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+import math
+import threading
+from array import array
+
+import profiler
+from memory_aids import TOKEN_RE
+
+# MinHash signature length, split into LSH bands of ROWS values each.
+# Pairs above about (1 / BANDS) ** (1 / ROWS) similarity usually share a band
+NUM_PERM = 32
+ROWS = 4
+BANDS = NUM_PERM // ROWS
+# Jaccard similarity of question + answer shingles that counts as a near duplicate. Pairs whose
+# signatures estimate at least THRESHOLD - ESTIMATE_SLACK are checked on their actual shingles
+SIMILARITY_THRESHOLD = 0.7
+ESTIMATE_SLACK = 0.15
+# Questions hashed per numpy pass, bounds the shingle arrays held at once
+CHUNK_QUESTIONS = 50_000
+# Bucket members compared against the whole bucket per numpy pass, bounds the comparison array
+PAIR_BLOCK = 128
+# Candidates kept per question and band, and candidate pairs a question is checked in on its actual
+# shingles, closest signatures first. Templated banks can put thousands of questions that all fall short in
+# one bucket, this keeps their time linear
+MAX_CANDIDATES = 8
+MAX_CHECKS = 20
+# Mersenne prime for the (a * x + b) mod P hash family
+PRIME = (1 << 31) - 1
+SEED = 17
+
+_lock = threading.Lock()
+
+
+# Which questions repeat each other: canonical[qid] is the lowest id in its cluster
+class Duplicates:
+    __slots__ = ("canonical", "exact", "near", "_clusters")
+
+    def __init__(self, canonical, exact, near):
+        self.canonical = canonical
+        self.exact = exact
+        self.near = near
+        self._clusters = None
+
+    def hidden(self):
+        return self.exact + self.near
+
+    # Function to list every cluster with more than one question, as sorted id arrays
+    def clusters(self):
+        if self._clusters is None:
+            import numpy as np
+
+            order = np.argsort(self.canonical, kind="stable")
+            keys = self.canonical[order]
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            ends = np.r_[starts[1:], len(keys)]
+            self._clusters = [order[s:e] for s, e in zip(starts, ends) if e - s > 1]
+        return self._clusters
+
+
+# Function to split text into lowercase words, keeping numbers and short words
+def _words(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+# Function to get a question's shingles as a set, for checking candidate pairs exactly
+def _shingle_set(bank, qid):
+    words = _words(bank.questions[qid]) + ["\x1f"] + _words(bank.answers[qid])
+    return set(words) | set(zip(words, words[1:]))
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+# Function to give one chunk of questions their b-bit MinHash signatures
+def _signatures(np, shingles, offsets, multipliers, increments):
+    values = np.array(shingles, dtype=np.uint64) % PRIME
+    starts = np.array(offsets[:-1], dtype=np.int64)
+    signatures = np.empty((len(starts), NUM_PERM), dtype=np.uint16)
+    for i in range(NUM_PERM):
+        hashed = (multipliers[i] * values + increments[i]) % PRIME
+        # Only the low 16 bits of each minimum are kept
+        signatures[:, i] = np.minimum.reduceat(hashed, starts) & 0xFFFF
+    return signatures
+
+
+# Function to list the pairs of a band bucket's members whose signatures agree in at least min_matches values,
+# up to MAX_CANDIDATES closest others for each member, as (lower * count + higher codes, matching values)
+def _similar_pairs(np, signatures, members, min_matches, count):
+    bucket = signatures[members]
+    codes, agreements = [], []
+    for block in range(0, len(members) - 1, PAIR_BLOCK):
+        rows = bucket[block:block + PAIR_BLOCK]
+        matches = (rows[:, None, :] == bucket[None, :, :]).sum(axis=2, dtype=np.uint8)
+        # A member is not its own candidate
+        matches[np.arange(len(rows)), np.arange(block, block + len(rows))] = 0
+        if len(members) > MAX_CANDIDATES:
+            other = np.argpartition(matches, -MAX_CANDIDATES, axis=1)[:, -MAX_CANDIDATES:]
+            first = np.repeat(np.arange(len(rows)), MAX_CANDIDATES)
+            other = other.ravel()
+        else:
+            first, other = np.nonzero(matches)
+        close = matches[first, other] >= min_matches
+        first, other = first[close], other[close]
+        agreements.append(matches[first, other])
+        first, other = members[first + block].astype(np.int64), members[other].astype(np.int64)
+        codes.append(np.minimum(first, other) * count + np.maximum(first, other))
+    return np.concatenate(codes), np.concatenate(agreements)
+
+
+# Function to find exact and near-duplicate questions over question + answer text
+def find_duplicates(bank, threshold=SIMILARITY_THRESHOLD):
+    import numpy as np
+
+    size = len(bank)
+    canonical = np.arange(size, dtype=np.uint32)
+    rng = np.random.default_rng(SEED)
+    multipliers = rng.integers(1, PRIME, NUM_PERM, dtype=np.uint64)
+    increments = rng.integers(0, PRIME, NUM_PERM, dtype=np.uint64)
+
+    # Exact pass: questions with the same words in question and answer share the first id
+    first_seen = {}
+    vocabulary = {}
+    representatives = []
+    chunks = []
+    shingles, offsets = [], [0]
+    for qid in range(size):
+        question, answer = _words(bank.questions[qid]), _words(bank.answers[qid])
+        key = (" ".join(question), " ".join(answer))
+        first = first_seen.setdefault(key, qid)
+        if first != qid:
+            canonical[qid] = first
+            continue
+        # Shingles are word ids and word-pair ids, with a marker between question and answer
+        ids = [vocabulary.setdefault(word, len(vocabulary)) for word in question + ["\x1f"] + answer]
+        shingles.extend(ids)
+        shingles.extend(((a + 1) << 32) | b for a, b in zip(ids, ids[1:]))
+        offsets.append(len(shingles))
+        representatives.append(qid)
+        if len(offsets) > CHUNK_QUESTIONS:
+            chunks.append(_signatures(np, shingles, offsets, multipliers, increments))
+            shingles, offsets = [], [0]
+    if len(offsets) > 1:
+        chunks.append(_signatures(np, shingles, offsets, multipliers, increments))
+    exact = size - len(representatives)
+    if len(representatives) < 2:
+        return Duplicates(canonical, exact, 0)
+
+    # Near pass: every pair of questions sharing a band whose whole signatures agree closely enough is
+    # checked on their actual shingles
+    signatures = np.concatenate(chunks)
+    count = len(signatures)
+    band_keys = signatures.reshape(count, BANDS, ROWS).view(np.uint64).reshape(count, BANDS)
+    min_matches = math.ceil((threshold - ESTIMATE_SLACK) * NUM_PERM)
+    pairs = []
+    for band in range(BANDS):
+        keys = band_keys[:, band]
+        order = np.argsort(keys, kind="stable")
+        ordered = keys[order]
+        starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+        ends = np.r_[starts[1:], len(ordered)]
+        for start, end in zip(starts[ends - starts > 1], ends[ends - starts > 1]):
+            pairs.append(_similar_pairs(np, signatures, order[start:end], min_matches, count))
+    parent = list(range(count))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    if not pairs:
+        pairs = [(np.zeros(0, np.int64), np.zeros(0, np.uint8))]
+    # Pairs found in several bands are checked once, closest signatures first, then earlier questions
+    codes, first_seen = np.unique(np.concatenate([c for c, _ in pairs]), return_index=True)
+    agreements = np.concatenate([m for _, m in pairs])[first_seen]
+    checks = np.zeros(count, np.uint16)
+    shingle_sets = {}
+    for code in codes[np.lexsort((codes, -agreements.astype(np.int16)))]:
+        first, other = divmod(int(code), count)
+        a, b = root(first), root(other)
+        if a == b or checks[first] >= MAX_CHECKS or checks[other] >= MAX_CHECKS:
+            continue
+        checks[first] += 1
+        checks[other] += 1
+        for i in (first, other):
+            if i not in shingle_sets:
+                shingle_sets[i] = _shingle_set(bank, representatives[i])
+        if jaccard(shingle_sets[first], shingle_sets[other]) >= threshold:
+            # The earlier question stays the root so it becomes canonical
+            parent[max(a, b)] = min(a, b)
+
+    reps = np.array(representatives, dtype=np.uint32)
+    roots = np.fromiter((root(i) for i in range(len(reps))), np.int64, len(reps))
+    near = int(np.count_nonzero(roots != np.arange(len(reps))))
+    canonical[reps] = reps[roots]
+    # Exact duplicates follow their first copy into its cluster
+    canonical = canonical[canonical]
+    return Duplicates(canonical, exact, near)
+
+
+# Function to get a bank's duplicate clusters, found on first use
+def duplicates(bank):
+    if bank.duplicates is None:
+        with _lock:
+            if bank.duplicates is None:
+                with profiler.phase("dedup"):
+                    bank.duplicates = find_duplicates(bank)
+    return bank.duplicates
+
+
+# Function to keep one question of each cluster, in the order given: the canonical one, or the lowest id
+# of the cluster's questions that are given when the canonical one is not, so every session keeps the same
+def collapse(bank, question_ids):
+    import numpy as np
+
+    ids = np.asarray(question_ids, dtype=np.uint32)
+    clusters = duplicates(bank).canonical[ids]
+    by_cluster = np.lexsort((ids, clusters))
+    sorted_clusters = clusters[by_cluster]
+    kept = by_cluster[np.r_[True, sorted_clusters[1:] != sorted_clusters[:-1]]] if len(ids) else by_cluster
+    kept.sort()
+    return array("I", ids[kept].tobytes())
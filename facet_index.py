@@ -0,0 +1,85 @@
+import heapq
+from array import array
+from bisect import bisect_left
+
+# Facets that can filter a quiz, mapped to how each question's value is read
+FACETS = {
+    "difficulty": lambda bank, qid: bank.difficulties[qid],
+    "unit": lambda bank, qid: bank.lesson_units[bank.lesson_of(qid)],
+    "lesson_name": lambda bank, qid: bank.lesson_names[bank.lesson_of(qid)],
+    "syllabus_area": lambda bank, qid: bank.syllabus_areas[qid],
+    "source": lambda bank, qid: bank.lesson_sources[bank.lesson_of(qid)],
+}
+
+
+# Function to check whether a sorted id array contains an id
+def _contains(ids, qid):
+    pos = bisect_left(ids, qid)
+    return pos < len(ids) and ids[pos] == qid
+
+
+# Function to intersect sorted id arrays, probing the larger ones by bisection
+def intersect_sorted(id_arrays):
+    id_arrays = sorted(id_arrays, key=len)
+    if not id_arrays:
+        return array("I")
+    smallest, others = id_arrays[0], id_arrays[1:]
+    return array("I", (qid for qid in smallest if all(_contains(ids, qid) for ids in others)))
+
+
+# Function to union sorted id arrays into one sorted array
+def union_sorted(id_arrays):
+    if len(id_arrays) == 1:
+        return id_arrays[0]
+    return array("I", heapq.merge(*id_arrays))
+
+
+# Map of facet value -> sorted question ids, built once per bank
+class FacetIndex:
+    __slots__ = ("size", "postings")
+
+    def __init__(self, bank):
+        self.size = len(bank)
+        self.postings = {name: {} for name in FACETS}
+        lesson_values = {"unit": bank.lesson_units, "lesson_name": bank.lesson_names, "source": bank.lesson_sources}
+
+        # Lesson facets are filled per lesson range, question facets per id
+        for lesson_index in range(bank.num_lessons()):
+            ids = bank.lesson_ids(lesson_index)
+            for name, values in lesson_values.items():
+                value = values[lesson_index]
+                if value is not None and len(ids):
+                    self.postings[name].setdefault(value, array("I")).extend(ids)
+        for name in ("difficulty", "syllabus_area"):
+            read = FACETS[name]
+            postings = self.postings[name]
+            for qid in range(len(bank)):
+                value = read(bank, qid)
+                if value is not None:
+                    postings.setdefault(value, array("I")).append(qid)
+
+    # Function to wrap posting lists that were built elsewhere, such as a compiled bank's
+    @classmethod
+    def from_postings(cls, size, postings):
+        index = cls.__new__(cls)
+        index.size = size
+        index.postings = postings
+        return index
+
+    def values(self, name):
+        return sorted(self.postings[name])
+
+    def count(self, name, value):
+        return len(self.postings[name].get(value, ()))
+
+    # Function to get the sorted ids matching every facet (any value within a facet)
+    def select(self, filters):
+        selected = []
+        for name, values in filters.items():
+            if not values:
+                continue
+            postings = self.postings[name]
+            selected.append(union_sorted([postings[v] for v in values if v in postings] or [array("I")]))
+        if not selected:
+            return None
+        return intersect_sorted(selected)
@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+import math
+from datetime import datetime
+
+from scheduler import MASTERY_LEVELS, MIN_EASE
+
+# Columns written by every format, cards are matched back by question_hash on import
+COLUMNS = ("question_hash", "front", "back", "mastery_level", "ease", "interval", "reps", "due_date", "last_reviewed")
+# Anki maps the first two columns to a note's Front and Back, so its export starts with them
+ANKI_COLUMNS = COLUMNS[1:] + COLUMNS[:1]
+# Rows formatted per chunk written to the export file
+CHUNK_ROWS = 1000
+# Scheduler.restore keeps reps in an unsigned 16-bit array
+MAX_REPS = 65535
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Format key -> (label, file extension, MIME type)
+FORMATS = {
+    "jsonl": ("JSON Lines", "jsonl", "application/x-ndjson"),
+    "csv": ("CSV", "csv", "text/csv"),
+    "anki": ("Anki (tab separated)", "txt", "text/tab-separated-values"),
+}
+
+
+# Function to yield one export row per card, text read from the bank
+def iter_rows(bank, flashcards):
+    hashes = bank.question_hashes()
+    for card, qid in enumerate(flashcards.ids):
+        row = {"question_hash": hashes[qid], "front": bank.questions[qid], "back": bank.answers[qid]}
+        row.update(flashcards.card_state(card))
+        yield row
+
+
+# Function to clean a field for Anki's tab-separated import
+def _anki_field(value):
+    if value is None:
+        return ""
+    return str(value).replace("\t", " ").replace("\r", "").replace("\n", "<br>")
+
+
+# Function to yield the export as text chunks of CHUNK_ROWS rows
+def iter_export(bank, flashcards, fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    buffer = io.StringIO()
+    if fmt == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+        writer.writeheader()
+    elif fmt == "anki":
+        # Header lines understood by Anki 2.1.55+
+        buffer.write("#separator:tab\n#html:true\n#columns:" + "\t".join(ANKI_COLUMNS) + "\n")
+
+    for count, row in enumerate(iter_rows(bank, flashcards), 1):
+        if fmt == "jsonl":
+            buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+        elif fmt == "csv":
+            writer.writerow(row)
+        else:
+            buffer.write("\t".join(_anki_field(row[column]) for column in ANKI_COLUMNS) + "\n")
+        if count % CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# Function to write the export to an in-memory file for st.download_button, which only takes bytes,
+# text or in-memory buffers
+def export_file(bank, flashcards, fmt):
+    out = io.BytesIO()
+    for chunk in iter_export(bank, flashcards, fmt):
+        out.write(chunk.encode("utf-8"))
+    out.seek(0)
+    return out
+
+
+# Function to read rows back from an exported file in any of the formats, raises ValueError for a file
+# that cannot be read as one
+def iter_import(uploaded_file):
+    text = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+    try:
+        yield from _read_rows(text)
+    except UnicodeDecodeError:
+        raise ValueError("The file is not UTF-8 text.") from None
+    except csv.Error as e:
+        raise ValueError(f"The file is not a readable CSV or Anki export ({e}).") from None
+    finally:
+        # Leave the uploaded file open for Streamlit
+        text.detach()
+
+
+# Function to parse one JSON Lines row, which has to be an object
+def _json_row(line, line_number):
+    try:
+        row = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Line {line_number} is not valid JSON ({e}).") from None
+    if not isinstance(row, dict):
+        raise ValueError(f"Line {line_number} is not a JSON object.")
+    return row
+
+
+# Function to pick the reader for an export from its first line
+def _read_rows(text):
+    first = text.readline()
+    if first.startswith("{"):
+        yield _json_row(first, 1)
+        for line_number, line in enumerate(text, 2):
+            if line.strip():
+                yield _json_row(line, line_number)
+        return
+
+    if first.startswith("#"):
+        # Anki export: skip the header lines, the last one names the columns
+        columns = ANKI_COLUMNS
+        line = first
+        while line.startswith("#"):
+            if line.startswith("#columns:"):
+                columns = line[len("#columns:"):].rstrip("\r\n").split("\t")
+            line = text.readline()
+        rows = csv.DictReader(_prepend(line, text), fieldnames=columns, delimiter="\t", quoting=csv.QUOTE_NONE)
+    else:
+        rows = csv.DictReader(_prepend(first, text))
+    yield from rows
+
+
+# Function to put an already-read line back in front of the remaining lines
+def _prepend(line, lines):
+    if line:
+        yield line
+    yield from lines
+
+
+# Function to parse one imported row into Scheduler.restore arguments, raises ValueError for any field
+# the scheduler could not store
+def row_state(row):
+    last_reviewed = row.get("last_reviewed")
+    mastery_level = int(row["mastery_level"])
+    if not 0 <= mastery_level < MASTERY_LEVELS:
+        raise ValueError(f"Mastery level out of range: {mastery_level}")
+    ease = float(row["ease"])
+    if not (math.isfinite(ease) and ease >= MIN_EASE):
+        raise ValueError(f"Ease out of range: {ease}")
+    interval = float(row["interval"])
+    if not (math.isfinite(interval) and interval >= 0):
+        raise ValueError(f"Interval out of range: {interval}")
+    reps = int(row["reps"])
+    if not 0 <= reps <= MAX_REPS:
+        raise ValueError(f"Repetitions out of range: {reps}")
+    due = datetime.strptime(row["due_date"], DATE_FORMAT).timestamp()
+    if not math.isfinite(due):
+        raise ValueError(f"Due date out of range: {row['due_date']}")
+    return (
+        mastery_level,
+        ease,
+        interval,
+        reps,
+        due,
+        datetime.strptime(last_reviewed, DATE_FORMAT).timestamp() if last_reviewed else 0.0,
+    )
+
+
+# Function to apply imported mastery to a deck, returns (restored, skipped) counts. The whole file is read
+# first, so a file that cannot be read raises ValueError with nothing applied
+def import_progress(bank, flashcards, uploaded_file, on_restore=None):
+    hashes = bank.question_hashes()
+    cards = {hashes[qid]: card for card, qid in enumerate(flashcards.ids)}
+    updates = []
+    skipped = 0
+    for row in iter_import(uploaded_file):
+        card = cards.get(row.get("question_hash"))
+        if card is None:
+            skipped += 1
+            continue
+        try:
+            updates.append((card, row_state(row)))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            skipped += 1
+    for card, state in updates:
+        flashcards.restore(card, *state)
+        if on_restore is not None:
+            on_restore(card)
+    return len(updates), skipped
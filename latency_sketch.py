@@ -0,0 +1,69 @@
+import math
+from array import array
+
+# Log-bucketed latency sketch: bucket i holds times in (GROWTH**(i-1), GROWTH**i] ms and is read back as
+# one value within 5% of all of them, so a quantile is off by at most 5% however many times were added.
+# Sketches of the same question or session add up bucket by bucket
+GROWTH = 1.1
+LOG_GROWTH = math.log(GROWTH)
+# Bucket 0 holds everything up to 1 ms, the last one everything from about an hour up
+NUM_BUCKETS = 160
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+# Function to get the bucket a time in ms falls in
+def bucket_of(ms):
+    if ms <= 1:
+        return 0
+    return min(NUM_BUCKETS - 1, math.ceil(math.log(ms) / LOG_GROWTH))
+
+
+# Function to get the time in ms a bucket is read back as
+def bucket_value(bucket):
+    return 2 * GROWTH ** bucket / (GROWTH + 1) if bucket else 1.0
+
+
+# Function to get the position in a sorted list of n times that quantile q reads, counted from 1
+def _rank(q, n):
+    return max(1, math.ceil(q * n))
+
+
+# One stream of times, as fixed-size bucket counts
+class LatencySketch:
+    __slots__ = ("counts", "count")
+
+    def __init__(self):
+        self.counts = array("I", [0]) * NUM_BUCKETS
+        self.count = 0
+
+    # Function to rebuild a sketch from its (bucket, count) rows
+    @classmethod
+    def from_buckets(cls, rows):
+        sketch = cls()
+        for bucket, count in rows:
+            sketch.counts[bucket] += count
+            sketch.count += count
+        return sketch
+
+    def __len__(self):
+        return self.count
+
+    def add(self, ms):
+        self.counts[bucket_of(ms)] += 1
+        self.count += 1
+
+    # Function to get the time in ms below which a share q of the added times fall, None when empty
+    def quantile(self, q):
+        if not self.count:
+            return None
+        rank = _rank(q, self.count)
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return bucket_value(bucket)
+        return bucket_value(NUM_BUCKETS - 1)
+
+    # Function to get {quantile: ms} for the summary quantiles
+    def quantiles(self, quantiles=QUANTILES):
+        return {q: self.quantile(q) for q in quantiles}
@@ -1,12 +1,38 @@
 import streamlit as st
 import random
 import json
-import pandas as pd
-from PIL import Image
+import math
+import os
 import time
-import base64
-from datetime import datetime
+import uuid
+from array import array
+import adaptive
+import analytics
+import binary_bank
+import dedup
+import flashcard_export
+import memory_aids
+import profiler
+import progress_store
+import quiz_bank
+import render
+import search_index
+from question_bank import OPTION_LETTERS
+from quiz_state import QuizState
+from scheduler import Scheduler
 random.seed(int(time.time()) % 10000) # For more randomize
+# Optional bank file on the server, used when nothing is uploaded
+SERVER_BANK_PATH = os.environ.get("QUIZ_BANK_PATH")
+# Clusters listed per page of the duplicate report
+DUPLICATES_PER_PAGE = 50
+# How often the countdown of a timed quiz refreshes, in seconds
+TIMER_TICK_SECONDS = 1
+# Search hits offered for picking one by one
+SEARCH_PICK_LIMIT = 50
+# Days shown in the progress page's accuracy chart
+PROGRESS_DAYS = 14
+# Bank problems listed in the sidebar, the downloaded report has all of them
+REPORT_ROWS_SHOWN = 100
 # Set up the page configuration
 st.set_page_config(
     page_title="TNPSC Quiz",
@@ -16,298 +42,114 @@ st.set_page_config(
 )
 
 # Custom CSS for better design
+@profiler.timed("load_css")
 def load_css():
-    st.markdown("""
-    <style>
-        .main {
-            background-color: #f9f7f0;
-            padding: 20px;
-        }
-        .stButton button {
-            width: 100%;
-            border-radius: 10px;
-            font-size: 16px;
-            font-weight: 500;
-            transition: all 0.3s ease;
-        }
-        .stButton button:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 5px 15px rgba(0,0,0,0.1);
-        }
-        .question-card {
-            background-color: white;
-            padding: 20px;
-            border-radius: 15px;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            margin-bottom: 20px;
-        }
-        .heading-container {
-            text-align: center;
-            margin-bottom: 30px;
-        }
-        .option-container {
-            padding: 10px;
-            margin: 10px 0;
-            border-radius: 10px;
-            transition: all 0.2s ease;
-        }
-        .option-container:hover {
-            background-color: #f5f5f5;
-        }
-        .result-container {
-            text-align: center;
-            padding: 20px;
-            background-color: white;
-            border-radius: 15px;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }
-        .feedback-text {
-            font-size: 18px;
-            margin: 15px 0;
-        }
-        .progress-container {
-            margin: 20px 0;
-        }
-        .spaced-option {
-            margin-bottom: 10px;
-        }
-        .memory-tip {
-            background-color: #e8f4f8;
-            padding: 10px;
-            border-left: 4px solid #4e8cff;
-            margin: 15px 0;
-            border-radius: 5px;
-        }
-        .flashcard {
-            perspective: 1000px;
-            margin: 20px auto;
-            width: 100%;
-            max-width: 600px;
-            height: 300px;
-        }
-        .flashcard-inner {
-            position: relative;
-            width: 100%;
-            height: 100%;
-            text-align: center;
-            transition: transform 0.8s;
-            transform-style: preserve-3d;
-        }
-        .flipped .flashcard-inner {
-            transform: rotateY(180deg);
-        }
-        .flashcard-front, .flashcard-back {
-            position: absolute;
-            width: 100%;
-            height: 100%;
-            -webkit-backface-visibility: hidden;
-            backface-visibility: hidden;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            padding: 20px;
-            border-radius: 15px;
-            box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-            overflow-y: auto;
-        }
-        .flashcard-front {
-            background-color: #f0f8ff;
-            color: black;
-        }
-        .flashcard-back {
-            background-color: #e8f4e8;
-            color: black;
-            transform: rotateY(180deg);
-        }
-        .flashcard-content {
-            max-width: 90%;
-            max-height: 90%;
-            font-size: 18px;
-        }
-        .flashcard-controls {
-            margin-top: 20px;
-            display: flex;
-            justify-content: center;
-            gap: 10px;
-        }
-        .nav-buttons {
-            display: flex;
-            justify-content: center;
-            gap: 15px;
-            margin: 20px 0;
-        }
-        .nav-btn {
-            padding: 10px 20px;
-            border-radius: 20px;
-            background-color: #f0f0f0;
-            border: none;
-            cursor: pointer;
-            transition: all 0.3s ease;
-        }
-        .nav-btn:hover {
-            background-color: #e0e0e0;
-            transform: translateY(-2px);
-        }
-        .nav-btn.active {
-            background-color: #4e8cff;
-            color: white;
-        }
-        .mastery-progress {
-            margin: 15px 0;
-            padding: 10px;
-            background-color: #f9f9f9;
-            border-radius: 10px;
-        }
-        .export-section {
-            margin-top: 20px;
-            padding: 15px;
-            background-color: #f5f5f5;
-            border-radius: 10px;
-        }
-        .flashcard-deck-selector {
-            margin: 20px 0;
-            padding: 15px;
-            background-color: white;
-            border-radius: 10px;
-            box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-        }
-        /* Animation for new items */
-        @keyframes fadeIn {
-            from { opacity: 0; transform: translateY(20px); }
-            to { opacity: 1; transform: translateY(0); }
-        }
-        .fade-in {
-            animation: fadeIn 0.5s ease-out forwards;
-        }
-        .correct-answer {
-            color: #28a745;
-            font-weight: bold;
-            margin-top: 5px;
-            padding: 5px;
-            background-color: #e8f5e9;
-            border-radius: 5px;
-        }
-        .incorrect-answer {
-            color: #dc3545;
-            font-weight: bold;
-            margin-top: 5px;
-            padding: 5px;
-            background-color: #f8d7da;
-            border-radius: 5px;
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    # The stylesheet is read and minified once per process, style-only html takes no space
+    st.html(render.style_tag())
 
 # Function to create flashcard deck from quiz data
-def create_flashcards(data):
-    # Convert quiz data to flashcards
-    flashcards = []
-    for lesson in data:
-        for pair in lesson.get("pairs", []):
-            flashcard = {
-                "front": pair["question"],
-                "back": pair["answer"],
-                "mastery_level": 0,  # 0-5 scale for spaced repetition
-                "last_reviewed": None,
-                "due_date": datetime.now().strftime("%Y-%m-%d")
-            }
-            flashcards.append(flashcard)
+@profiler.timed("create_flashcards")
+def create_flashcards(bank, question_ids):
+    # Cards only hold question ids, the text is read from the bank when shown
+    flashcards = Scheduler(question_ids)
+
+    # Pick up where this user left off, matching cards by question content
+    saved = progress_store.get_store().load_mastery(current_user())
+    if saved:
+        hashes = bank.question_hashes()
+        for card, qid in enumerate(question_ids):
+            state = saved.get(hashes[qid])
+            if state is not None:
+                flashcards.restore(card, *state)
     return flashcards
 
 # Function to display flashcards
-def display_flashcards(flashcards):
-    st.markdown('<div class="heading-container">', unsafe_allow_html=True)
-    st.title("📇 Tamil Flashcards")
-    st.markdown('</div>', unsafe_allow_html=True)
+@profiler.timed("render_flashcards")
+def display_flashcards(bank, flashcards):
+    st.html(render.heading("📇 Tamil Flashcards"))
 
     # Initialize session state for flashcards
     if 'current_card' not in st.session_state:
-        st.session_state.current_card = 0
+        st.session_state.current_card = flashcards.next_due() or 0
     if 'is_flipped' not in st.session_state:
         st.session_state.is_flipped = False
-    if 'mastery_counts' not in st.session_state:
-        st.session_state.mastery_counts = {0: 0, 1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        for card in flashcards:
-            level = card.get("mastery_level", 0)
-            st.session_state.mastery_counts[level] = st.session_state.mastery_counts.get(level, 0) + 1
 
+    flashcard_view(bank, flashcards)
+
+    # Return to menu button
+    st.button("Return to Main Menu", key="return_menu", on_click=set_mode, args=("home",))
+
+# Function to move between cards, used as a button callback
+def go_to_card(card):
+    st.session_state.current_card = card
+    st.session_state.is_flipped = False
+
+# Function to flip the current card, used as a button callback
+def flip_card():
+    st.session_state.is_flipped = not st.session_state.is_flipped
+
+# Function to rate the current card, reschedule it and move on to the next due one
+def rate_card(bank, flashcards, quality):
+    card = st.session_state.current_card
+    old_level = flashcards.mastery_level[card]
+    flashcards.review(card, quality)
+    progress_store.get_store().record_review(
+        current_user(), bank.question_hash(flashcards.ids[card]), old_level, flashcards.raw_state(card)
+    )
+    go_to_card(flashcards.next_due())
+
+# Function to display the card and its controls; clicks here rerun only this fragment
+@st.fragment
+@profiler.rerun("flashcard_view")
+def flashcard_view(bank, flashcards):
     # Calculate total cards and current position
     total_cards = len(flashcards)
     current_position = st.session_state.current_card + 1
 
     # Display progress bar
-    st.markdown('<div class="progress-container">', unsafe_allow_html=True)
     col1, col2 = st.columns([1, 4])
     with col1:
         st.write(f"Card {current_position}/{total_cards}")
     with col2:
         progress = st.session_state.current_card / total_cards if total_cards > 0 else 0
         st.progress(progress)
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.caption(f"Due today: {flashcards.due_today()} of {total_cards} cards")
 
     # Display mastery progress
-    st.markdown('<div class="mastery-progress">', unsafe_allow_html=True)
     st.markdown("### Mastery Progress")
 
-    # Create mastery level counts
-    mastery_data = []
-    for level, count in st.session_state.mastery_counts.items():
-        mastery_data.append({"Level": f"Level {level}", "Count": count})
-
-    mastery_df = pd.DataFrame(mastery_data)
-    st.bar_chart(mastery_df.set_index("Level"))
-    st.markdown('</div>', unsafe_allow_html=True)
+    # Chart the mastery level counts straight from the scheduler, no dataframe needed
+    with profiler.phase("chart"):
+        mastery_data = {f"Level {level}": count for level, count in enumerate(flashcards.mastery_counts)}
+        st.html(render.bar_chart(mastery_data))
 
     # Get current flashcard
     if total_cards > 0:
-        card = flashcards[st.session_state.current_card]
-
-        # Display flashcard
-        flipped_class = "flipped" if st.session_state.is_flipped else ""
-        st.markdown(f'<div class="flashcard {flipped_class}">', unsafe_allow_html=True)
-        st.markdown('<div class="flashcard-inner">', unsafe_allow_html=True)
-
-        # Front of card
-        st.markdown('<div class="flashcard-front">', unsafe_allow_html=True)
-        st.markdown('<div class="flashcard-content">', unsafe_allow_html=True)
-        st.markdown(f"<h3>{card['front']}</h3>", unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-        # Back of card
-        st.markdown('<div class="flashcard-back">', unsafe_allow_html=True)
-        st.markdown('<div class="flashcard-content">', unsafe_allow_html=True)
-        st.markdown(f"<p>{card['back']}</p>", unsafe_allow_html=True)
-
-        # Add memory aid
-        memory_aid = create_memory_aid(card['front'], card['back'])
-        st.markdown(f'<div class="memory-tip">💡 <b>Memory Tip:</b> {memory_aid}</div>', unsafe_allow_html=True)
+        qid = flashcards.ids[st.session_state.current_card]
+        front = bank.questions[qid]
+        back = bank.answers[qid]
 
-        st.markdown('</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
-
-        st.markdown('</div>', unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
+        # Display flashcard as one block so the front and back nest inside it
+        memory_aid = memory_aids.memory_aid(bank, qid)
+        st.html(render.flashcard(front, back, memory_aid, st.session_state.is_flipped))
 
         # Controls
         col1, col2, col3 = st.columns([1, 2, 1])
 
         with col1:
-            if st.button("⬅️ Previous", key="prev_btn", disabled=(st.session_state.current_card == 0)):
-                st.session_state.current_card = max(0, st.session_state.current_card - 1)
-                st.session_state.is_flipped = False
-                st.rerun()
+            st.button(
+                "⬅️ Previous", key="prev_btn", disabled=(st.session_state.current_card == 0),
+                on_click=go_to_card, args=(max(0, st.session_state.current_card - 1),)
+            )
 
         with col2:
-            if st.button("Flip Card 🔄", key="flip_btn"):
-                st.session_state.is_flipped = not st.session_state.is_flipped
-                st.rerun()
+            st.button("Flip Card 🔄", key="flip_btn", on_click=flip_card)
 
         with col3:
-            if st.button("Next ➡️", key="next_btn", disabled=(st.session_state.current_card >= total_cards - 1)):
-                st.session_state.current_card = min(total_cards - 1, st.session_state.current_card + 1)
-                st.session_state.is_flipped = False
-                st.rerun()
+            st.button(
+                "Next ➡️", key="next_btn", disabled=(st.session_state.current_card >= total_cards - 1),
+                on_click=go_to_card, args=(min(total_cards - 1, st.session_state.current_card + 1),)
+            )
 
         # Rate knowledge level
         st.markdown("### Rate your mastery of this card")
@@ -318,242 +160,352 @@ def display_flashcards(flashcards):
 
         for i, (col, label) in enumerate(zip(mastery_cols, mastery_labels)):
             with col:
-                if st.button(f"{i}", key=f"mastery_{i}", help=label):
-                    # Update mastery count
-                    old_level = flashcards[st.session_state.current_card].get("mastery_level", 0)
-                    st.session_state.mastery_counts[old_level] = max(0, st.session_state.mastery_counts[old_level] - 1)
-                    st.session_state.mastery_counts[i] = st.session_state.mastery_counts.get(i, 0) + 1
-
-                    # Update card
-                    flashcards[st.session_state.current_card]["mastery_level"] = i
-                    flashcards[st.session_state.current_card]["last_reviewed"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-                    # Move to next card if not at the end
-                    if st.session_state.current_card < total_cards - 1:
-                        st.session_state.current_card += 1
-                        st.session_state.is_flipped = False
-                    st.rerun()
-
-        # Export flashcards option
-        with st.expander("Export Flashcards"):
+                st.button(f"{i}", key=f"mastery_{i}", help=label, on_click=rate_card, args=(bank, flashcards, i))
+
+        # Export and import flashcards option
+        with st.expander("Export / Import Flashcards"):
             st.markdown("Download your flashcards with mastery data to continue studying later.")
-            if st.button("Export as JSON"):
-                json_str = json.dumps(flashcards, indent=2, ensure_ascii=False)
-                b64 = base64.b64encode(json_str.encode()).decode()
-                href = f'<a href="data:application/json;base64,{b64}" download="tamil_flashcards.json">Download JSON File</a>'
-                st.markdown(href, unsafe_allow_html=True)
+            fmt = st.selectbox(
+                "Format",
+                list(flashcard_export.FORMATS),
+                format_func=lambda key: flashcard_export.FORMATS[key][0],
+                key="export_format"
+            )
+            _, extension, mime = flashcard_export.FORMATS[fmt]
+            # The file is only written when the button is clicked
+            st.download_button(
+                "Download Flashcards",
+                data=lambda: flashcard_export.export_file(bank, flashcards, fmt),
+                file_name=f"tamil_flashcards.{extension}",
+                mime=mime,
+                key="export_btn"
+            )
+
+            imported = st.file_uploader(
+                "Restore mastery from an export",
+                type=["jsonl", "csv", "txt", "tsv"],
+                key="import_file"
+            )
+            if imported is not None and st.session_state.get('imported_file_id') != imported.file_id:
+                store = progress_store.get_store()
+                user = current_user()
+                hashes = bank.question_hashes()
+                # A file is handled once, whether or not it could be read
+                st.session_state.imported_file_id = imported.file_id
+                try:
+                    restored, skipped = flashcard_export.import_progress(
+                        bank, flashcards, imported,
+                        on_restore=lambda card: store.save_mastery(
+                            user, hashes[flashcards.ids[card]], flashcards.raw_state(card)
+                        )
+                    )
+                except ValueError as e:
+                    st.error(f"Could not import {imported.name}: {e}")
+                else:
+                    st.session_state.current_card = flashcards.next_due()
+                    st.success(f"Restored {restored} cards ({skipped} rows did not match this deck).")
     else:
         st.warning("No flashcards available. Please upload quiz data first.")
 
-    # Return to menu button
-    if st.button("Return to Main Menu", key="return_menu"):
-        st.session_state.mode = "home"
-        st.rerun()
-
-# Function to create mnemonics or memory aids
-def create_memory_aid(question, answer):
-    # Simple algorithm to create memory aids
-    # This is a placeholder - in a real app, you might want more sophisticated logic
-    key_terms = []
-
-    # Extract potential key terms (words with more than 4 letters)
-    for word in answer.split():
-        if len(word) > 4:
-            key_terms.append(word)
-
-    # If we found key terms, create a simple memory aid
-    if key_terms:
-        if len(key_terms) > 3:
-            key_terms = key_terms[:3]  # Limit to first 3 key terms
-
-        memory_tip = f"Remember these key terms: {', '.join(key_terms)}"
-        return memory_tip
-
-    return "Try to create a mental image or association to remember this answer."
-
 # Function to run the quiz
-def run_quiz(data, num_questions=None):
-    # Extract all question pairs from all lessons
-    all_pairs = []
-    for lesson in data:
-        all_pairs.extend(lesson.get("pairs", []))
-
+@profiler.timed("render_quiz")
+def run_quiz(bank, question_ids, num_questions=None, adaptive_order=False, question_seconds=0, time_limit=0):
+    pool_ids = question_ids
     # If number of questions is specified, limit to that number
     if num_questions and num_questions > 0:
-        all_pairs = all_pairs[:num_questions]
-
-    # Store session state
-    if 'quiz_data' not in st.session_state:
-        st.session_state.quiz_data = all_pairs
-        st.session_state.current_question = 0
-        st.session_state.correct_count = 0
-        st.session_state.answered = False
-        st.session_state.total_questions = len(all_pairs)
-        st.session_state.show_results = False
-        st.session_state.start_time = time.time()
-        st.session_state.question_times = []
+        question_ids = question_ids[:num_questions]
+
+    # The session keeps one compact quiz record, started again if the bank changed underneath it
+    quiz = st.session_state.get('quiz')
+    if quiz is None or quiz.bank_digest != bank.digest:
+        st.session_state.pop('adaptive_pool', None)
+        # An unfinished quiz on this bank from an earlier visit is picked up where it was left
+        skip_saved = st.session_state.pop('skip_saved_quiz', False)
+        quiz = None if adaptive_order or skip_saved else load_saved_quiz(bank)
+        if quiz is not None:
+            st.session_state.quiz = quiz
+            st.session_state.quiz_resumed = True
+        else:
+            quiz = st.session_state.quiz = QuizState(
+                bank.digest, question_ids, question_seconds=question_seconds, time_limit=time_limit
+            )
+            if adaptive_order:
+                # Questions are picked one at a time from the whole filtered pool
+                pool = st.session_state.adaptive_pool = adaptive.start_pool(bank, pool_ids)
+                quiz.ids[0] = adaptive.pick_next(bank, current_user(), pool)
+            save_quiz()
 
     # Display quiz header
-    with st.container():
-        st.markdown('<div class="heading-container">', unsafe_allow_html=True)
-        st.title("🎓 Tamil Quiz App")
-        st.markdown('</div>', unsafe_allow_html=True)
+    st.html(render.heading("🎓 Tamil Quiz App"))
+    if st.session_state.pop('quiz_resumed', False):
+        st.info(f"Picked up your unfinished quiz at question {quiz.cursor + 1} of {len(quiz)}.")
+        st.button("Start a new quiz", key="new_quiz_btn", on_click=start_new_quiz)
+
+    # Only timed quizzes get the ticking countdown fragment
+    check_deadlines(bank)
+    if quiz.timed() and not quiz.finished():
+        quiz_timer(bank)
+
+    quiz_card(bank)
+
+# Function to get the user's unfinished quiz on this bank from an earlier visit, None when there is none
+def load_saved_quiz(bank):
+    data = progress_store.get_store().load_quiz(current_user(), bank.digest)
+    if data is None:
+        return None
+    try:
+        quiz = QuizState.from_bytes(data)
+    except ValueError:
+        # Saved in a format this version no longer reads
+        return None
+    # A quiz left before its first answer is not worth picking up
+    return quiz if quiz.answered_count and not quiz.finished() else None
+
+# Function to save the session's quiz after every change, so it can be resumed on a later visit. Only
+# named users come back to their progress, and adaptive quizzes draw from a pool that is not saved
+def save_quiz():
+    if (st.session_state.get('user_name') or "").strip() and 'adaptive_pool' not in st.session_state:
+        progress_store.get_store().save_quiz(current_user(), st.session_state.quiz)
+
+# Function to drop a resumed quiz for a new one, used as a button callback
+def start_new_quiz():
+    quiz = st.session_state.pop('quiz', None)
+    if quiz is not None:
+        progress_store.get_store().discard_quiz(current_user(), quiz.bank_digest)
+    st.session_state.skip_saved_quiz = True
+
+# Function to enforce the quiz's deadlines server-side, returns True if one ran out
+def check_deadlines(bank):
+    quiz = st.session_state.quiz
+    expired = quiz.expired()
+    if expired == "quiz":
+        quiz.finish()
+        save_quiz()
+    elif expired == "question":
+        # Time ran out on this question: it is submitted unanswered and the quiz moves on
+        qid = quiz.current()
+        quiz.time_out()
+        record_attempt(bank, qid, None, False, quiz.question_seconds)
+        adaptive.record_answer(bank, qid, current_user(), False)
+        st.session_state.timed_out = True
+        next_question(bank)
+    return expired is not None
+
+# Function to show the countdown, rerun on its own every second; a deadline running out costs one full rerun
+@st.fragment(run_every=TIMER_TICK_SECONDS)
+@profiler.rerun("quiz_timer")
+def quiz_timer(bank):
+    quiz = st.session_state.get('quiz')
+    if quiz is None or check_deadlines(bank) or quiz.finished():
+        st.rerun()
+    question_left, quiz_left = quiz.remaining()
+    parts = []
+    if question_left is not None:
+        parts.append(f"{math.ceil(question_left)} s left on this question")
+    if quiz_left is not None:
+        minutes, seconds = divmod(math.ceil(quiz_left), 60)
+        parts.append(f"{minutes}:{seconds:02d} left in the quiz")
+    if question_left is not None:
+        st.progress(question_left / quiz.question_seconds, text="⏱️ " + " · ".join(parts))
+    elif parts:
+        st.caption("⏱️ " + " · ".join(parts))
+
+# Function to display quiz progress and the current question or results; clicks rerun only this fragment
+@st.fragment
+@profiler.rerun("quiz_card")
+def quiz_card(bank):
+    quiz = st.session_state.quiz
 
     # Display progress
-    with st.container():
-        st.markdown('<div class="progress-container">', unsafe_allow_html=True)
-        col1, col2 = st.columns([1, 4])
-        with col1:
-            st.write(f"Question {st.session_state.current_question + 1}/{st.session_state.total_questions}")
-        with col2:
-            progress = st.session_state.current_question / st.session_state.total_questions
-            st.progress(progress)
-        st.markdown('</div>', unsafe_allow_html=True)
+    col1, col2 = st.columns([1, 4])
+    with col1:
+        shown = min(quiz.cursor + 1, len(quiz))
+        st.write(f"Question {shown}/{len(quiz)}")
+    with col2:
+        progress = quiz.cursor / len(quiz)
+        st.progress(progress)
+
+    if 'adaptive_pool' in st.session_state:
+        st.caption(f"Adaptive order, your estimated ability: {adaptive.ability(current_user()):+.2f}")
 
-    # Display results if quiz is finished
-    if st.session_state.show_results:
-        show_results()
+    if st.session_state.pop('timed_out', False):
+        st.warning("⏰ Time ran out on the last question, it was counted as unanswered.")
+
+    # Display results once the last question is done
+    if quiz.finished():
+        show_results(quiz)
         return
 
     # Get current question
-    if st.session_state.current_question < st.session_state.total_questions:
-        item = st.session_state.quiz_data[st.session_state.current_question]
-        display_question(item)
-    else:
-        st.session_state.show_results = True
-        st.rerun()
+    display_question(bank, quiz, quiz.current())
 
 # Function to display a question
-def display_question(item):
-    question = item["question"]
-    correct_answer = item["answer"]
-    options = item["options"]
-    correct_option = item.get("correct_option", "")
+@profiler.timed("render_question")
+def display_question(bank, quiz, qid):
+    question = bank.questions[qid]
+    correct_answer = bank.answers[qid]
+    correct_option = bank.correct_options[qid]
+    explanation = bank.explanations[qid]
 
     # Display question with better styling
-    st.markdown('<div class="question-card">', unsafe_allow_html=True)
-    st.subheader(f"Question {st.session_state.current_question + 1}")
-    st.markdown(f"**{question}**")
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.html(render.question_card(quiz.cursor + 1, question))
 
     # Display options
-    option_letters = ["A", "B", "C", "D"]
-    option_dict = {}
-
-    # Map options to letters
-    for j, opt in enumerate(options[:4]):
-        letter = option_letters[j]
-        # Get the value of the first (and only) key in the option dictionary
-        option_text = list(opt.values())[0]
-        option_dict[letter] = option_text
+    option_letters = OPTION_LETTERS
+    option_dict = bank.options(qid)
 
     # Create answer section
-    if not st.session_state.answered:
+    user_answer = quiz.choice()
+    if user_answer is None:
         for letter in option_letters:
             if letter in option_dict:
-                st.markdown(f'<div class="option-container spaced-option">', unsafe_allow_html=True)
-                if st.button(f"{letter}) {option_dict[letter]}", key=f"btn_{letter}_{st.session_state.current_question}"):
-                    check_answer(letter, correct_option, correct_answer, option_dict)
-                    st.session_state.answered = True
-                    st.rerun()
-                st.markdown('</div>', unsafe_allow_html=True)
+                st.button(
+                    f"{letter}) {option_dict[letter]}",
+                    key=f"btn_{letter}_{quiz.cursor}",
+                    on_click=check_answer,
+                    args=(bank, qid, letter)
+                )
+        # Answer times count from here, once the options are on screen
+        quiz.show()
     else:
+        # Visual reward for a correct answer, once
+        if st.session_state.pop('celebrate', False):
+            st.balloons()
+
         # After answering, show the options with feedback
         for letter in option_letters:
             if letter in option_dict:
                 # Determine button color and feedback
-                if st.session_state.user_answer == letter:
+                if user_answer == letter:
                     if letter == correct_option:
                         st.success(f"{letter}) {option_dict[letter]}")
-                        st.markdown(f'<div class="correct-answer" style="gap:5px; padding: 0px 10px" >✅ Correct! Answer: {correct_answer}</div>', unsafe_allow_html=True)
+                        st.html(render.answer_feedback(True, correct_answer))
                     else:
                         st.error(f"{letter}) {option_dict[letter]}")
-                        st.markdown(f'<div class="incorrect-answer">❌ Incorrect. The correct answer is: {correct_answer}</div>', unsafe_allow_html=True)
+                        st.html(render.answer_feedback(False, correct_answer))
                 elif letter == correct_option:
                     st.success(f"{letter}) {option_dict[letter]}")
                 else:
                     st.info(f"{letter}) {option_dict[letter]}")
 
         # Show explanation if available
-        if "explanation" in item:
+        if explanation is not None:
             with st.expander("Explanation"):
-                st.write(item["explanation"])
+                st.write(explanation)
 
         # Show memory aid for the answer
-        memory_aid = create_memory_aid(question, correct_answer)
-        st.markdown(f'<div class="memory-tip">💡 <b>Memory Tip:</b> {memory_aid}</div>', unsafe_allow_html=True)
+        st.html(render.memory_tip(memory_aids.memory_aid(bank, qid)))
 
-        # Show next question button
-        if st.button("Next Question ➡️", key="next_btn"):
-            question_time = time.time() - st.session_state.start_time
-            st.session_state.question_times.append(question_time)
-            st.session_state.start_time = time.time()
-            st.session_state.current_question += 1
-            st.session_state.answered = False
-            st.rerun()
-
-# Function to check the answer
-def check_answer(user_answer, correct_letter, correct_answer, option_dict):
-    st.session_state.answered = True
-    st.session_state.user_answer = user_answer
-
-    if user_answer == correct_letter:
-        st.session_state.correct_count += 1
-        st.balloons()  # Visual reward for correct answer
-        st.success("✓ Correct! Well done! 🎉")
-    else:
-        if correct_letter:
-            st.error(f"✗ Not quite. The correct answer is {correct_letter}) {option_dict[correct_letter]}")
-        else:
-            st.error(f"✗ Not quite. The correct answer is: {correct_answer}")
-
-    # Show the full answer for educational purposes
-    with st.expander("Learn More About This Answer"):
-        st.write(correct_answer)
-
-        # Add visual spacing
-        st.write("")
+        # Show how this question went on earlier attempts
+        previous = st.session_state.get('previous_attempts')
+        if previous:
+            marks = " ".join("✅" if correct else "❌" for _, correct, _, _ in previous)
+            st.caption(f"Your last {len(previous)} attempts at this question: {marks}")
 
-        # Add a visualization or diagram placeholder
-        st.markdown("**Visualization helps with memory retention:**")
-        st.markdown("Try to visualize this concept or create a mental image to help you remember.")
+        # Show next question button
+        st.button("Next Question ➡️", key="next_btn", on_click=next_question, args=(bank,))
+
+# Function to move to the next question, used as a button callback
+def next_question(bank):
+    quiz = st.session_state.quiz
+    quiz.advance()
+    pool = st.session_state.get('adaptive_pool')
+    if pool is not None and not quiz.finished():
+        quiz.ids[quiz.cursor] = adaptive.pick_next(bank, current_user(), pool)
+    save_quiz()
+
+# Function to switch the app mode, used as a button callback so it costs one full rerun
+def set_mode(mode):
+    st.session_state.mode = mode
+
+# Function to get the name progress is saved under. Without a name each session gets its own id, so
+# anonymous students never share saved progress, ability estimates or rollups
+def current_user():
+    name = (st.session_state.get('user_name') or "").strip()
+    if name:
+        return name
+    if 'anonymous_user' not in st.session_state:
+        st.session_state.anonymous_user = f"anonymous-{uuid.uuid4().hex[:12]}"
+    return st.session_state.anonymous_user
+
+# Function to queue a quiz answer for the progress store, an answer's time also goes to the question's
+# latency sketch
+def record_attempt(bank, qid, chosen_option, correct, latency):
+    store = progress_store.get_store()
+    question_hash = bank.question_hash(qid)
+    st.session_state.previous_attempts = store.last_attempts(current_user(), question_hash)
+    store.record_attempt(
+        current_user(), question_hash, chosen_option, correct, latency, topics=analytics.topics(bank, qid)
+    )
+    # A timed-out question was never answered, so it has no answer time
+    if chosen_option is not None:
+        store.record_latency(question_hash, {analytics.LATENCY_METRIC: int(latency * 1000)})
+
+# Function to check the answer, used as a button callback; feedback is drawn by display_question
+def check_answer(bank, qid, user_answer):
+    quiz = st.session_state.quiz
+    # Answers after a deadline, or clicks left over from an earlier question, are ignored
+    if check_deadlines(bank) or quiz.current() != qid:
+        return
+    correct = user_answer == bank.correct_options[qid]
+    latency = quiz.answer(user_answer, correct)
+    if latency is None:
+        # A stale click on a question that was already answered
+        return
+    if correct:
+        st.session_state.celebrate = True
+    record_attempt(bank, qid, user_answer, correct, latency)
+    adaptive.record_answer(bank, qid, current_user(), correct)
+    save_quiz()
 
 # Function to display results
-def show_results():
-    score_percentage = (st.session_state.correct_count / st.session_state.total_questions) * 100
-    avg_time = sum(st.session_state.question_times) / len(st.session_state.question_times) if st.session_state.question_times else 0
+@profiler.timed("render_results")
+def show_results(quiz):
+    results = quiz.results()
+    score_percentage = results["score_percentage"]
+    avg_time = results["avg_seconds"]
 
-    st.markdown('<div class="result-container">', unsafe_allow_html=True)
-    st.title("🏆 Quiz Completed!")
+    # Based on score, show different messages
+    if score_percentage >= 90:
+        feedback = "🌟 Outstanding! You have excellent knowledge!"
+    elif score_percentage >= 70:
+        feedback = "👏 Great job! You have good understanding!"
+    elif score_percentage >= 50:
+        feedback = "👍 Good effort! Keep practicing to improve!"
+    else:
+        feedback = "🔄 You might need more practice. Keep going!"
+    st.html(render.result_header(feedback))
+    if score_percentage >= 90:
+        st.balloons()
 
     # Create a metrics display
     col1, col2, col3 = st.columns(3)
-    col1.metric("Total Questions", st.session_state.total_questions)
-    col2.metric("Correct Answers", st.session_state.correct_count)
+    col1.metric("Total Questions", results["total"])
+    col2.metric("Correct Answers", results["correct"])
     col3.metric("Score", f"{score_percentage:.1f}%")
 
-    # Show average time per question
+    # Show average time per question, counted from each question appearing to its answer
     st.metric("Average Time per Question", f"{avg_time:.1f} seconds")
-
-    # Based on score, show different messages
-    if score_percentage >= 90:
-        st.balloons()
-        st.markdown('<p class="feedback-text">🌟 Outstanding! You have excellent knowledge!</p>', unsafe_allow_html=True)
-    elif score_percentage >= 70:
-        st.markdown('<p class="feedback-text">👏 Great job! You have good understanding!</p>', unsafe_allow_html=True)
-    elif score_percentage >= 50:
-        st.markdown('<p class="feedback-text">👍 Good effort! Keep practicing to improve!</p>', unsafe_allow_html=True)
-    else:
-        st.markdown('<p class="feedback-text">🔄 You might need more practice. Keep going!</p>', unsafe_allow_html=True)
+    quantiles = results["quantiles"]
+    if quantiles[0.5] is not None:
+        st.caption(
+            f"Median {quantiles[0.5]:.1f} s, 90% of answers within {quantiles[0.9]:.1f} s, "
+            f"99% within {quantiles[0.99]:.1f} s."
+        )
+    if results["timeouts"] or results["answered"] < results["total"]:
+        st.caption(
+            f"{results['timeouts']} questions timed out, "
+            f"{results['total'] - results['answered']} were not reached before the quiz time ran out."
+        )
 
     # Show a visualization of results
-    chart_data = pd.DataFrame({
-        'Category': ['Correct', 'Incorrect'],
-        'Count': [st.session_state.correct_count, st.session_state.total_questions - st.session_state.correct_count]
-    })
-
     st.markdown("### Your Performance")
-    st.bar_chart(chart_data.set_index('Category'))
+    with profiler.phase("chart"):
+        chart_data = {
+            'Correct': results["correct"],
+            'Incorrect': results["total"] - results["correct"]
+        }
+        st.html(render.bar_chart(chart_data))
 
     # Learning tips based on performance
     st.markdown("### Learning Tips")
@@ -572,19 +524,59 @@ def show_results():
         - Connect these concepts to real-world examples
         """)
 
+    # Results are drawn inside the quiz fragment, so leaving the quiz needs a full rerun
+    if st.button("See your progress 📈", key="results_progress"):
+        st.session_state.mode = "progress"
+        st.rerun()
+
     # Show a restart button
     if st.button("Restart Quiz 🔄"):
+        progress_store.get_store().discard_quiz(current_user(), quiz.bank_digest)
         for key in list(st.session_state.keys()):
-            del st.session_state[key]
+            if key not in ('user_name', 'anonymous_user'):
+                del st.session_state[key]
+        # The next quiz is a new one even if a saved quiz is still around
+        st.session_state.skip_saved_quiz = True
         st.rerun()
 
-    st.markdown('</div>', unsafe_allow_html=True)
+# Function to display the user's history across every quiz, summed from the rollups
+@profiler.timed("render_progress")
+def display_progress(bank):
+    st.html(render.heading("📈 Your Progress"))
+    user = current_user()
+    # Answers from before rollups were kept are added once, through the bank loaded now
+    backfill_key = (user, bank.digest)
+    if st.session_state.get('rollup_backfill') != backfill_key:
+        analytics.backfill(bank, user)
+        st.session_state.rollup_backfill = backfill_key
+
+    history = analytics.history(user)
+    if not history.attempts():
+        st.info("No answers saved yet. Take a quiz and your progress will show up here.")
+        return
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Questions Answered", history.attempts())
+    col2.metric("Accuracy", f"{history.accuracy():.1f}%")
+    col3.metric("Average Time", f"{history.avg_seconds():.1f} seconds")
+
+    st.markdown("### Accuracy by Day")
+    st.html(render.bar_chart(history.daily(PROGRESS_DAYS), top=100, suffix="%"))
+
+    st.markdown("### Weakest Topics")
+    for dimension, label in analytics.DIMENSIONS.items():
+        weakest = history.weakest(dimension)
+        if weakest:
+            st.markdown(f"**{label}**")
+            st.html(render.bar_chart({name: accuracy for name, accuracy, _ in weakest}, top=100, suffix="%"))
+
+    for tab, dimension in zip(st.tabs(list(analytics.DIMENSIONS.values())), analytics.DIMENSIONS):
+        with tab:
+            st.dataframe(history.table(dimension), hide_index=True)
 
 # Function to display home page
+@profiler.timed("render_home")
 def display_home(data=None):
-    st.markdown('<div class="heading-container fade-in">', unsafe_allow_html=True)
-    st.title("Welcome to TNPSC Quiz App! 📚")
-    st.markdown('</div>', unsafe_allow_html=True)
+    st.html(render.heading("Welcome to TNPSC Quiz App! 📚", extra="fade-in"))
 
     col1, col2 = st.columns(2)
 
@@ -604,9 +596,7 @@ def display_home(data=None):
 
         # Only enable button if data is loaded
         if data is not None:
-            if st.button("Start Quiz", key="start_quiz"):
-                st.session_state.mode = "quiz"
-                st.rerun()
+            st.button("Start Quiz", key="start_quiz", on_click=set_mode, args=("quiz",))
         else:
             st.button("Start Quiz", key="start_quiz", disabled=True)
             st.caption("Please upload a quiz file to enable")
@@ -627,9 +617,7 @@ def display_home(data=None):
 
         # Only enable button if data is loaded
         if data is not None:
-            if st.button("Study Flashcards", key="start_flashcards"):
-                st.session_state.mode = "flashcards"
-                st.rerun()
+            st.button("Study Flashcards", key="start_flashcards", on_click=set_mode, args=("flashcards",))
         else:
             st.button("Study Flashcards", key="start_flashcards", disabled=True)
             st.caption("Please upload a quiz file to enable")
@@ -659,6 +647,7 @@ def display_home(data=None):
                     "unit": "Unit I: Sample",
                     "pairs": [
                         {
+                            "id": "sample-1",
                             "question": "Sample question?",
                             "answer": "Sample answer",
                             "options": [
@@ -669,13 +658,208 @@ def display_home(data=None):
                             ],
                             "correct_option": "A",
                             "explanation": "Explanation for the answer",
-                            "syllabus_area": "Sample area"
+                            "syllabus_area": "Sample area",
+                            "difficulty": "Easy"
                         }
                     ]
                 }
             ]
             st.code(json.dumps(example, indent=2, ensure_ascii=False), language="json")
 
+# Function to get the bank and this session's shuffled question order
+def get_session_bank(uploaded_files, stream_limit=None):
+    uploaded_file = uploaded_files[0] if len(uploaded_files) == 1 else None
+    if not uploaded_files:
+        if os.path.isdir(SERVER_BANK_PATH):
+            bank = quiz_bank.load_bank_dir(SERVER_BANK_PATH)
+        else:
+            bank = quiz_bank.load_bank_file(SERVER_BANK_PATH, max_pairs=stream_limit)
+    elif uploaded_file is None:
+        # Several files are parsed in parallel and merged into one bank
+        bank = quiz_bank.load_bank_files([(f.name, f.getvalue()) for f in uploaded_files])
+    elif stream_limit:
+        # Streaming loads are keyed by upload and cap so reruns reuse them
+        stream_key = (uploaded_file.file_id, stream_limit)
+        if st.session_state.get('bank_stream_key') != stream_key:
+            uploaded_file.seek(0)
+            bank, stats = quiz_bank.load_bank_streaming(uploaded_file, max_pairs=stream_limit)
+            st.session_state.bank_stream_key = stream_key
+            st.session_state.bank_stream_stats = stats
+            st.session_state.bank_handle = quiz_bank.share(bank)
+        bank = st.session_state.bank_handle.bank
+    else:
+        bank = quiz_bank.load_bank(uploaded_file.getvalue())
+    if uploaded_file is None or not stream_limit:
+        # The handle now holds another bank, so streaming again has to load again
+        st.session_state.pop('bank_stream_key', None)
+        st.session_state.pop('bank_stream_stats', None)
+
+    # The session pins one shared read-only copy of its bank, replacing the handle unpins the old one
+    handle = st.session_state.get('bank_handle')
+    if handle is None or handle.bank is not bank:
+        st.session_state.bank_handle = quiz_bank.share(bank)
+
+    # Learned difficulties feed the Difficulty selector and adaptive order, refreshed now and then
+    adaptive.refresh(bank)
+
+    # The shuffle seed is picked once so the order stays put across reruns
+    if 'bank_seed' not in st.session_state:
+        st.session_state.bank_seed = random.randrange(2**32)
+    return bank
+
+# Function to get the facet index and learned difficulty version this session selects from. The bands move
+# as anyone's answers come in, so the latest is only taken up when renew is set
+def session_facets(bank, renew=False):
+    view = st.session_state.get('facets_view')
+    if renew or view is None or view[0] != bank.digest:
+        view = st.session_state.facets_view = (bank.digest, *adaptive.facets(bank))
+    return view[1:]
+
+# Function to get this session's shuffled question ids for the chosen filters. New learned difficulty bands
+# are taken up with new filters, or with renew for a quiz or deck about to start, never under one in progress
+def get_filtered_ids(bank, filters, collapse=False, renew=False):
+    filter_key = (bank.digest, tuple((name, tuple(values)) for name, values in filters.items()), collapse)
+    changed = st.session_state.get('filter_key') != filter_key
+    facets, version = session_facets(bank, renew or changed)
+    # Learned difficulty bands only change the selection when a difficulty is chosen
+    selection = (filter_key, version if filters.get("difficulty") else 0)
+    if st.session_state.get('filter_selection') != selection:
+        selected = facets.select(filters)
+        st.session_state.filter_key = filter_key
+        st.session_state.filter_selection = selection
+        ids = quiz_bank.shuffled_ids(bank, st.session_state.bank_seed, selected)
+        if collapse:
+            ids = dedup.collapse(bank, ids)
+        st.session_state.filtered_ids = ids
+        # A new selection means a new flashcard deck
+        if changed:
+            for key in ('flashcards', 'current_card', 'is_flipped'):
+                st.session_state.pop(key, None)
+    return st.session_state.filtered_ids
+
+# Function to display the duplicate report, one expander per cluster
+@profiler.timed("render_duplicates")
+def display_duplicates(bank):
+    st.html(render.heading("🔍 Duplicate Questions"))
+    duplicates = dedup.duplicates(bank)
+    clusters = duplicates.clusters()
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Clusters", len(clusters))
+    col2.metric("Exact copies", duplicates.exact)
+    col3.metric("Near duplicates", duplicates.near)
+    if not clusters:
+        st.info("No duplicate questions found in this bank.")
+        return
+    st.caption(
+        "Collapsing duplicates keeps the first question listed in each cluster, or the first listed one "
+        "the filters include."
+    )
+
+    # Large banks can have thousands of clusters, so they are shown a page at a time
+    pages = (len(clusters) - 1) // DUPLICATES_PER_PAGE + 1
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    start = (page - 1) * DUPLICATES_PER_PAGE
+    for number, members in enumerate(clusters[start:start + DUPLICATES_PER_PAGE], start + 1):
+        canonical = int(members[0])
+        with st.expander(f"{number}. {bank.questions[canonical]} ({len(members)} questions)"):
+            for qid in members:
+                qid = int(qid)
+                lesson = bank.lesson_names[bank.lesson_of(qid)] or "Unnamed lesson"
+                st.markdown(f"- **{bank.questions[qid]}** → {bank.answers[qid]}  \n  _{lesson}_")
+
+# Function to show what loading found wrong with the bank, with the full report as a download
+def display_report(report):
+    if report is None or report.clean():
+        return
+    notice = st.sidebar.warning if report.skipped_pairs or report.skipped_lessons else st.sidebar.info
+    notice(f"Bank problems: {report.summary()}")
+    with st.sidebar.expander("Problem details"):
+        st.dataframe(report.rows()[:REPORT_ROWS_SHOWN], hide_index=True)
+        st.download_button(
+            "Download report",
+            data=lambda: json.dumps(report.to_dict(), indent=2, ensure_ascii=False),
+            file_name="bank_report.json",
+            mime="application/json",
+            key="report_btn"
+        )
+
+# Function to show search hits in the sidebar with buttons to study them
+def display_search(bank, query):
+    hits, _, total = search_index.search(bank, query)
+    if not total:
+        st.sidebar.caption("No matching questions")
+        return
+    if total > len(hits):
+        st.sidebar.caption(f"{total} matching questions, the best {len(hits)} are listed")
+    else:
+        st.sidebar.caption(f"{total} matching questions")
+    picked = st.sidebar.multiselect(
+        "Pick results (all if none picked)",
+        [int(qid) for qid in hits[:SEARCH_PICK_LIMIT]],
+        format_func=lambda qid: bank.questions[qid][:80],
+        key="search_picked"
+    )
+    ids = array("I", picked) if picked else array("I", hits.tobytes())
+    col1, col2 = st.sidebar.columns(2)
+    col1.button("Quiz results", key="search_quiz", on_click=study_search_results, args=(bank.digest, ids, "quiz"))
+    col2.button(
+        "Flashcards", key="search_flashcards", on_click=study_search_results, args=(bank.digest, ids, "flashcards")
+    )
+
+# Function to study search hits (or go back to the filters when ids is None), used as a button callback
+def study_search_results(digest=None, ids=None, mode=None):
+    if ids is None:
+        st.session_state.pop('search_results', None)
+    else:
+        st.session_state.search_results = (digest, ids)
+    # The quiz and the deck are rebuilt from the new questions
+    for key in ('quiz', 'adaptive_pool', 'flashcards', 'current_card', 'is_flipped'):
+        st.session_state.pop(key, None)
+    if mode is not None:
+        st.session_state.mode = mode
+
+# Function to display the profiler panel in the sidebar
+def display_profiler():
+    with st.sidebar.expander("Profiler", expanded=True):
+        count = st.number_input("Reruns to show", min_value=1, max_value=profiler.RING_SIZE, value=10)
+        rows = []
+        for record in profiler.recent_reruns(count):
+            row = {"mode": record["mode"], "total ms": round(record["total"] * 1000, 1)}
+            for name, seconds in sorted(record["phases"].items(), key=lambda item: -item[1]):
+                row[name] = round(seconds * 1000, 1)
+            rows.append(row)
+        if rows:
+            st.dataframe(rows, hide_index=True)
+        else:
+            st.caption("No reruns recorded yet.")
+
+        shared = quiz_bank.registry_stats()
+        st.caption(
+            f"Shared banks: {shared['banks']} cached, {shared['pinned']} in use by "
+            f"{shared['sessions']} sessions, {shared['bytes'] / 1e6:.1f} MB"
+        )
+
+        col1, col2 = st.columns(2)
+        if col1.button("Dump JSON", key="profile_json"):
+            st.caption(f"Wrote {profiler.dump('json')}")
+        if col2.button("Dump Prometheus", key="profile_prom"):
+            st.caption(f"Wrote {profiler.dump('prometheus')}")
+
+# Function to list the questions that take longest to answer across all users, for finding confusing ones
+def display_slowest(bank):
+    with st.sidebar.expander("Slowest questions"):
+        st.caption(
+            f"Ranked by the time 90% of answers took, questions with at least "
+            f"{analytics.MIN_LATENCY_ANSWERS} answers."
+        )
+        if st.button("Find slow questions", key="slowest_btn"):
+            rows = analytics.slowest_questions(bank)
+            if rows:
+                st.dataframe(rows, hide_index=True)
+            else:
+                st.caption("Not enough answers yet.")
+
 # Main function to run the app
 def main():
     # Load custom CSS
@@ -684,8 +868,21 @@ def main():
     # Create a sidebar for settings
     st.sidebar.title("Quiz Settings")
 
-    # File uploader in sidebar for JSON file
-    uploaded_file = st.sidebar.file_uploader("Upload Quiz JSON file", type="json")
+    # File uploader in sidebar for JSON files, several are merged into one bank. A bank compiled with
+    # compile_bank.py is memory-mapped instead of parsed
+    uploaded_files = st.sidebar.file_uploader(
+        "Upload Quiz JSON files", type=["json", "qbank"], accept_multiple_files=True
+    )
+    has_bank = bool(uploaded_files) or bool(SERVER_BANK_PATH)
+    server_dir = not uploaded_files and bool(SERVER_BANK_PATH) and os.path.isdir(SERVER_BANK_PATH)
+    if not uploaded_files and SERVER_BANK_PATH:
+        kind = "directory" if server_dir else "bank"
+        st.sidebar.caption(f"Using server {kind}: {os.path.basename(os.path.normpath(SERVER_BANK_PATH))}")
+
+    # Progress is saved per name so it survives restarts and refreshes
+    st.sidebar.text_input(
+        "Your name (for saved progress)", key="user_name", placeholder="Progress is kept for this visit only"
+    )
 
     # Navigation menu in sidebar
     st.sidebar.markdown("---")
@@ -696,23 +893,31 @@ def main():
         st.session_state.mode = "home"
 
     # Navigation buttons
-    if st.sidebar.button("Home 🏠", key="nav_home"):
-        st.session_state.mode = "home"
-        st.rerun()
-
-    if st.sidebar.button("Quiz Mode 📝", key="nav_quiz"):
-        if uploaded_file is not None:
-            st.session_state.mode = "quiz"
-            st.rerun()
-        else:
-            st.sidebar.warning("Please upload a JSON file first.")
-
-    if st.sidebar.button("Flashcards 📇", key="nav_flashcards"):
-        if uploaded_file is not None:
-            st.session_state.mode = "flashcards"
-            st.rerun()
-        else:
-            st.sidebar.warning("Please upload a JSON file first.")
+    st.sidebar.button("Home 🏠", key="nav_home", on_click=set_mode, args=("home",))
+
+    quiz_clicked = st.sidebar.button(
+        "Quiz Mode 📝", key="nav_quiz", on_click=set_mode if has_bank else None, args=("quiz",)
+    )
+    if quiz_clicked and not has_bank:
+        st.sidebar.warning("Please upload a JSON file first.")
+
+    flashcards_clicked = st.sidebar.button(
+        "Flashcards 📇", key="nav_flashcards", on_click=set_mode if has_bank else None, args=("flashcards",)
+    )
+    if flashcards_clicked and not has_bank:
+        st.sidebar.warning("Please upload a JSON file first.")
+
+    progress_clicked = st.sidebar.button(
+        "Progress 📈", key="nav_progress", on_click=set_mode if has_bank else None, args=("progress",)
+    )
+    if progress_clicked and not has_bank:
+        st.sidebar.warning("Please upload a JSON file first.")
+
+    duplicates_clicked = st.sidebar.button(
+        "Duplicates 🔍", key="nav_duplicates", on_click=set_mode if has_bank else None, args=("duplicates",)
+    )
+    if duplicates_clicked and not has_bank:
+        st.sidebar.warning("Please upload a JSON file first.")
 
     # Learning tips in sidebar
     st.sidebar.markdown("---")
@@ -724,28 +929,104 @@ def main():
     - Connect new knowledge with what you already know
     """)
 
-    if uploaded_file is not None:
+    # Opt-in timing panel for the last reruns
+    st.sidebar.markdown("---")
+    if st.sidebar.checkbox("Show profiler", value=False, key="show_profiler"):
+        display_profiler()
+
+    if has_bank:
         try:
-            # Load and shuffle the quiz data
-            data = json.load(uploaded_file)
-            random.shuffle(data)
+            # Large files can be streamed lesson by lesson up to a question cap
+            stream_limit = None
+            single_file = len(uploaded_files) == 1 or (not uploaded_files and not server_dir)
+            # Compiled banks are mapped whole, there is nothing to stream
+            bank_name = uploaded_files[0].name if uploaded_files else SERVER_BANK_PATH
+            can_stream = single_file and not bank_name.endswith(binary_bank.EXTENSION)
+            if can_stream and st.sidebar.checkbox("Streaming load (large files)", value=False):
+                stream_limit = st.sidebar.number_input(
+                    "Questions to load",
+                    min_value=1,
+                    value=1000,
+                    step=100
+                )
 
-            # Extract all question pairs for counting
-            all_pairs = []
-            for lesson in data:
-                all_pairs.extend(lesson.get("pairs", []))
+            # Load the quiz data once per upload and shuffle it once per session
+            bank = get_session_bank(uploaded_files, stream_limit)
+            if stream_limit and uploaded_files:
+                stats = st.session_state.bank_stream_stats
+                st.sidebar.caption(
+                    f"Loaded {stats['pairs']} questions from {stats['lessons']} lessons "
+                    f"({stats['bytes_read'] / 1e6:.1f} MB read in {stats['seconds']:.2f} s)"
+                )
+
+            display_report(bank.report)
+            if st.session_state.get('show_profiler'):
+                display_slowest(bank)
+
+            # Full-text search, its hits can be studied as their own quiz or deck
+            query = st.sidebar.text_input("Search questions", key="search_query", placeholder="Tamil or English words")
+            if query.strip():
+                display_search(bank, query)
+
+            # Add difficulty and topic filters, answered from the bank's facet index with learned difficulty bands
+            # as of this session's last new quiz, deck or filter change
+            mode = st.session_state.mode
+            starting = (
+                (mode == "quiz" and 'quiz' not in st.session_state)
+                or (mode == "flashcards" and 'flashcards' not in st.session_state)
+            )
+            facets, _ = session_facets(bank, starting)
+            difficulty = st.sidebar.selectbox("Difficulty", ["All", "Easy", "Medium", "Hard"], index=0)
+            # Counts go in a caption: a selectbox whose option labels change is a new widget, reset to "All"
+            st.sidebar.caption(" · ".join(f"{d} {facets.count('difficulty', d)}" for d in ("Easy", "Medium", "Hard")))
+            filters = {
+                "difficulty": [] if difficulty == "All" else [difficulty],
+                "unit": st.sidebar.multiselect("Units", facets.values("unit")),
+                "lesson_name": st.sidebar.multiselect("Lessons", facets.values("lesson_name")),
+                "syllabus_area": st.sidebar.multiselect("Syllabus areas", facets.values("syllabus_area")),
+            }
+            # Merged banks can be narrowed to the files their lessons came from
+            sources = facets.values("source")
+            if len(sources) > 1:
+                filters["source"] = st.sidebar.multiselect("Source files", sources)
+            # Repeated and lightly reworded questions can be shown once
+            collapse = st.sidebar.checkbox("Collapse duplicate questions", value=False, key="collapse_duplicates")
+            question_ids = get_filtered_ids(bank, filters, collapse, starting)
+            if collapse:
+                st.sidebar.caption(f"{dedup.duplicates(bank).hidden()} duplicate questions hidden")
+
+            # Search results picked for study replace the filtered questions until cleared
+            search_results = st.session_state.get('search_results')
+            if search_results is not None and search_results[0] == bank.digest:
+                question_ids = search_results[1]
+                st.sidebar.info(f"Studying {len(question_ids)} search results")
+                st.sidebar.button("Back to filtered questions", key="clear_search", on_click=study_search_results)
 
             # Number of questions slider
-            total_available = len(all_pairs)
-            num_questions = st.sidebar.slider(
-                "Number of questions to practice",
-                min_value=1,
-                max_value=total_available,
-                value=min(10, total_available),
-                step=1
+            total_available = len(question_ids)
+            if total_available > 1:
+                num_questions = st.sidebar.slider(
+                    "Number of questions to practice",
+                    min_value=1,
+                    max_value=total_available,
+                    value=min(10, total_available),
+                    step=1
+                )
+            else:
+                num_questions = total_available
+                if total_available == 0:
+                    st.sidebar.warning("No questions match the selected filters.")
+
+            # Adaptive order picks each next question to suit the user's estimated ability
+            adaptive_order = st.sidebar.checkbox(
+                "Adaptive question order",
+                value=False,
+                help="Picks each next question from the filtered bank to match your estimated ability"
             )
 
-            # Add quiz timer option
+            # Add quiz timer option, the limits apply from the next quiz started
+            time_per_question = 0
+            time_limit_minutes = 0
             timed_quiz = st.sidebar.checkbox("Enable timed quiz", value=False)
             if timed_quiz:
                 time_per_question = st.sidebar.slider(
@@ -755,27 +1036,36 @@ def main():
                     value=30,
                     step=5
                 )
-                st.session_state.time_per_question = time_per_question
-
-            # Add difficulty options
-            difficulty = st.sidebar.selectbox(
-                "Difficulty",
-                ["All", "Easy", "Medium", "Hard"],
-                index=0
-            )
+                time_limit_minutes = st.sidebar.number_input(
+                    "Whole quiz limit in minutes (0 for none)",
+                    min_value=0,
+                    max_value=300,
+                    value=0,
+                    step=5
+                )
 
             # Mode routing
-            if st.session_state.mode == "quiz":
-                run_quiz(data, num_questions)
+            needs_questions = st.session_state.mode not in ("home", "progress") and 'quiz' not in st.session_state
+            if needs_questions and total_available == 0:
+                st.warning("No questions match the selected filters. Change them in the sidebar.")
+            elif st.session_state.mode == "quiz":
+                run_quiz(
+                    bank, question_ids, num_questions, adaptive_order, time_per_question, time_limit_minutes * 60
+                )
             elif st.session_state.mode == "flashcards":
-                # Create flashcards from quiz data
-                flashcards = create_flashcards(data)
-                display_flashcards(flashcards)
+                # Create flashcards from quiz data once per bank
+                if 'flashcards' not in st.session_state:
+                    st.session_state.flashcards = create_flashcards(bank, question_ids)
+                display_flashcards(bank, st.session_state.flashcards)
+            elif st.session_state.mode == "duplicates":
+                display_duplicates(bank)
+            elif st.session_state.mode == "progress":
+                display_progress(bank)
             else:  # Home mode
-                display_home(data)
+                display_home(bank)
 
-        except json.JSONDecodeError:
-            st.error("Error: Invalid JSON format in the uploaded file.")
+        except json.JSONDecodeError as e:
+            st.error(f"Error: Invalid JSON format in the uploaded file ({e}).")
         except Exception as e:
             st.error(f"Error: {str(e)}")
     else:
@@ -784,4 +1074,5 @@ def main():
 
 # Run the app
 if __name__ == "__main__":
-    main()
+    with profiler.rerun(st.session_state.get('mode')):
+        main()
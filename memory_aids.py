@@ -0,0 +1,155 @@
+import math
+import re
+from array import array
+from collections import Counter
+from functools import lru_cache
+
+import profiler
+
+# Words plus the Tamil block, whose vowel signs are not matched by \w alone
+TOKEN_RE = re.compile(r"[\w\u0B80-\u0BFF]+")
+# Key terms kept per question
+TOP_TERMS = 3
+# Ad-hoc tips (text that is not in a loaded bank) kept in memory
+ADHOC_CACHE_SIZE = 4096
+
+STOPWORDS = frozenset("""
+a about above after all also an and any are as at be because been before being between both but by can
+did do does during each for from had has have having he her here his how if in into is it its itself
+just more most no nor not of off on once only or other our out over own same she should so some such
+than that the their them then there these they this those through to too under until up very was we
+were what when where which while who whom why will with would you your
+""".split())
+
+FALLBACK_TIP = "Try to create a mental image or association to remember this answer."
+
+
+# Function to yield (lowercase term, word as written), skipping stopwords, numbers and very short words
+def _terms(text):
+    if not text:
+        return
+    for word in TOKEN_RE.findall(text):
+        term = word.lower()
+        if len(term) > 2 and not term.isdigit() and term not in STOPWORDS:
+            yield term, word
+
+
+# Function to split text into lowercase terms
+def tokenize(text):
+    return [term for term, _ in _terms(text)]
+
+
+# Function to turn key terms into the tip shown under an answer
+def format_tip(terms):
+    if terms:
+        return f"Remember these key terms: {', '.join(terms)}"
+    return FALLBACK_TIP
+
+
+# Function to list a bank's answer and explanation terms as (terms, first spellings, question ids,
+# term ids, answer flags); compact enough to send back from a parsing worker
+def extract_terms(bank):
+    vocabulary = {}
+    spellings = []
+    doc_ids, term_ids, answer_flags = array("I"), array("I"), bytearray()
+    for qid in range(len(bank)):
+        # Answers and explanations set the statistics, only answer terms become tips
+        for flag, text in ((1, bank.answers[qid]), (0, bank.explanations[qid])):
+            for term, word in _terms(text):
+                term_id = vocabulary.get(term)
+                if term_id is None:
+                    term_id = vocabulary[term] = len(spellings)
+                    spellings.append(word)
+                doc_ids.append(qid)
+                term_ids.append(term_id)
+                answer_flags.append(flag)
+    return list(vocabulary), spellings, doc_ids, term_ids, answer_flags
+
+
+# Function to combine the extracted terms of banks that are appended one after another,
+# parts is a list of (number of questions, extract_terms result)
+def merge_terms(parts):
+    import numpy as np
+
+    vocabulary = {}
+    spellings = []
+    docs, terms, flags = [], [], []
+    base = 0
+    for size, (part_terms, part_spellings, part_docs, part_term_ids, part_flags) in parts:
+        remap = np.empty(len(part_terms), dtype=np.int64)
+        for local_id, (term, word) in enumerate(zip(part_terms, part_spellings)):
+            term_id = vocabulary.get(term)
+            if term_id is None:
+                term_id = vocabulary[term] = len(spellings)
+                spellings.append(word)
+            remap[local_id] = term_id
+        docs.append(np.frombuffer(part_docs, dtype=np.uint32).astype(np.int64) + base)
+        terms.append(remap[np.frombuffer(part_term_ids, dtype=np.uint32)])
+        flags.append(np.frombuffer(part_flags, dtype=np.uint8))
+        base += size
+    if not docs:
+        return [], [], np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.uint8)
+    return list(vocabulary), spellings, np.concatenate(docs), np.concatenate(terms), np.concatenate(flags)
+
+
+# Function to pick each question's top TF-IDF answer terms in one pass over the bank,
+# from already extracted (and merged) terms when given
+def compute_key_terms(bank, top_n=TOP_TERMS, extracted=None):
+    import numpy as np
+
+    if extracted is None:
+        extracted = extract_terms(bank)
+    vocabulary, spellings, doc_ids, term_ids, answer_flags = extracted
+    key_terms = [()] * len(bank)
+    if not len(term_ids):
+        return key_terms
+
+    docs = np.asarray(doc_ids, dtype=np.int64)
+    terms = np.asarray(term_ids, dtype=np.int64)
+    in_answer = np.asarray(answer_flags, dtype=bool)
+    vocab_size = len(vocabulary)
+
+    # Term frequency per (question, term) and document frequency per term
+    keys, tf = np.unique(docs * vocab_size + terms, return_counts=True)
+    pair_docs, pair_terms = keys // vocab_size, keys % vocab_size
+    df = np.bincount(pair_terms, minlength=vocab_size)
+    idf = np.log((1 + len(bank)) / (1 + df)) + 1
+    doc_lengths = np.bincount(docs, minlength=len(bank))
+    scores = tf / doc_lengths[pair_docs] * idf[pair_terms]
+
+    # Keep answer terms only, best score first within each question
+    answer_keys = np.unique(docs[in_answer] * vocab_size + terms[in_answer])
+    keep = np.isin(keys, answer_keys, assume_unique=True)
+    pair_docs, pair_terms, scores = pair_docs[keep], pair_terms[keep], scores[keep]
+    order = np.lexsort((pair_terms, -scores, pair_docs))
+    pair_docs, pair_terms = pair_docs[order], pair_terms[order]
+    group_starts = np.searchsorted(pair_docs, pair_docs, side="left")
+    top = (np.arange(len(pair_docs)) - group_starts) < top_n
+
+    # Tips use the first spelling seen for each term
+    grouped = {}
+    for qid, term in zip(pair_docs[top].tolist(), pair_terms[top].tolist()):
+        grouped.setdefault(qid, []).append(spellings[term])
+    for qid, found in grouped.items():
+        key_terms[qid] = tuple(found)
+    return key_terms
+
+
+# Function to get the precomputed tip for a question in the bank
+@profiler.timed("memory_aid")
+def memory_aid(bank, qid):
+    if bank.key_terms is None:
+        return memory_aid_for_text(bank.answers[qid])
+    return format_tip(bank.key_terms[qid])
+
+
+# Function to make a tip for text outside a loaded bank, using term frequency only
+@lru_cache(maxsize=ADHOC_CACHE_SIZE)
+def memory_aid_for_text(answer):
+    counts = Counter()
+    spellings = {}
+    for term, word in _terms(answer):
+        counts[term] += 1
+        spellings.setdefault(term, word)
+    terms = sorted(counts, key=lambda term: (-counts[term] * math.log(1 + len(term)), term))
+    return format_tip([spellings[term] for term in terms[:TOP_TERMS]])
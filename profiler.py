@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+# Completed reruns kept for the debug panel
+RING_SIZE = 200
+# Where dumps are written, override with the QUIZ_PROFILE_DIR environment variable
+DEFAULT_DUMP_DIR = "."
+
+_reruns = deque(maxlen=RING_SIZE)
+# phase -> [calls, total seconds, max seconds], across every session in the process
+_counters = {}
+_lock = threading.Lock()
+# Each session's script runs in its own thread, so the open rerun is per thread
+_local = threading.local()
+
+
+# Function to add one timing to the process-wide counters and the open rerun
+def _record(name, seconds):
+    with _lock:
+        counter = _counters.get(name)
+        if counter is None:
+            counter = _counters[name] = [0, 0.0, 0.0]
+        counter[0] += 1
+        counter[1] += seconds
+        if seconds > counter[2]:
+            counter[2] = seconds
+    rerun = getattr(_local, "rerun", None)
+    if rerun is not None:
+        phases = rerun["phases"]
+        phases[name] = phases.get(name, 0.0) + seconds
+
+
+# Context manager that times one phase of the current rerun
+@contextmanager
+def phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, time.perf_counter() - started)
+
+
+# Decorator that times every call of a function as a phase
+def timed(name):
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+# Context manager (or decorator) around a script or fragment run, st.rerun() ends it early but
+# it is still recorded; inside an open run it only adds to that run
+@contextmanager
+def rerun(mode=None):
+    if getattr(_local, "rerun", None) is not None:
+        yield _local.rerun
+        return
+    record = {"started_at": time.time(), "mode": mode, "phases": {}}
+    _local.rerun = record
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        _local.rerun = None
+        record["total"] = time.perf_counter() - started
+        _record("rerun", record["total"])
+        with _lock:
+            _reruns.append(record)
+
+
+# Function to get the last n completed reruns, newest first
+def recent_reruns(n=20):
+    with _lock:
+        return list(_reruns)[-n:][::-1]
+
+
+def counters():
+    with _lock:
+        return {name: {"calls": c[0], "total_seconds": c[1], "max_seconds": c[2]} for name, c in _counters.items()}
+
+
+# Function to format the counters in the Prometheus text exposition format
+def prometheus_text():
+    lines = [
+        "# HELP quiz_phase_seconds_total Time spent in each phase of a rerun.",
+        "# TYPE quiz_phase_seconds_total counter",
+    ]
+    stats = counters()
+    for name, c in sorted(stats.items()):
+        lines.append(f'quiz_phase_seconds_total{{phase="{name}"}} {c["total_seconds"]:.6f}')
+    lines += ["# HELP quiz_phase_calls_total Number of times each phase ran.", "# TYPE quiz_phase_calls_total counter"]
+    for name, c in sorted(stats.items()):
+        lines.append(f'quiz_phase_calls_total{{phase="{name}"}} {c["calls"]}')
+    lines += ["# HELP quiz_phase_max_seconds Slowest single run of each phase.", "# TYPE quiz_phase_max_seconds gauge"]
+    for name, c in sorted(stats.items()):
+        lines.append(f'quiz_phase_max_seconds{{phase="{name}"}} {c["max_seconds"]:.6f}')
+    return "\n".join(lines) + "\n"
+
+
+# Function to write the counters to a local file as "prometheus" or "json", returns the path
+def dump(fmt="json", directory=None):
+    directory = directory or os.environ.get("QUIZ_PROFILE_DIR", DEFAULT_DUMP_DIR)
+    if fmt == "prometheus":
+        path = os.path.join(directory, "quiz_profile.prom")
+        content = prometheus_text()
+    else:
+        path = os.path.join(directory, "quiz_profile.json")
+        content = json.dumps({"counters": counters(), "reruns": recent_reruns(RING_SIZE)}, indent=2)
+    with open(path, "w") as f:
+        f.write(content)
+    return path
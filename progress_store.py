@@ -0,0 +1,375 @@
+import atexit
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from latency_sketch import QUANTILES, LatencySketch, bucket_of
+
+logger = logging.getLogger(__name__)
+
+# Where progress is kept, override with the QUIZ_PROGRESS_DB environment variable
+DEFAULT_DB_PATH = "quiz_progress.db"
+# Writes are batched by a background thread, at most this many per transaction
+BATCH_SIZE = 500
+# How long the writer waits for more work before committing a partial batch
+FLUSH_SECONDS = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    question_hash TEXT NOT NULL,
+    chosen_option TEXT,
+    correct INTEGER NOT NULL,
+    latency_ms INTEGER,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_by_question
+    ON attempts (user, question_hash, created_at DESC);
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    question_hash TEXT NOT NULL,
+    old_level INTEGER,
+    new_level INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS reviews_by_question
+    ON reviews (user, question_hash, created_at DESC);
+CREATE TABLE IF NOT EXISTS mastery (
+    user TEXT NOT NULL,
+    question_hash TEXT NOT NULL,
+    mastery_level INTEGER NOT NULL,
+    ease REAL NOT NULL,
+    interval REAL NOT NULL,
+    reps INTEGER NOT NULL,
+    due REAL NOT NULL,
+    last_reviewed REAL,
+    PRIMARY KEY (user, question_hash)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS abilities (
+    user TEXT PRIMARY KEY,
+    rating REAL NOT NULL,
+    answers INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS item_difficulty (
+    question_hash TEXT PRIMARY KEY,
+    difficulty REAL NOT NULL,
+    answers INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollups (
+    user TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    day TEXT NOT NULL,
+    attempts INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    latency_ms INTEGER NOT NULL,
+    timed INTEGER NOT NULL,
+    PRIMARY KEY (user, dimension, value, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rollup_marks (
+    user TEXT PRIMARY KEY,
+    live_since REAL,
+    backfilled INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS latency_buckets (
+    question_hash TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (metric, question_hash, bucket)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS latency_summary (
+    metric TEXT NOT NULL,
+    question_hash TEXT NOT NULL,
+    answers INTEGER NOT NULL,
+    p50_ms REAL NOT NULL,
+    p90_ms REAL NOT NULL,
+    p99_ms REAL NOT NULL,
+    PRIMARY KEY (metric, question_hash)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS saved_quizzes (
+    user TEXT NOT NULL,
+    bank_digest TEXT NOT NULL,
+    state BLOB NOT NULL,
+    saved_at REAL NOT NULL,
+    PRIMARY KEY (user, bank_digest)
+) WITHOUT ROWID;
+"""
+
+INSERT_SQL = {
+    "attempt": "INSERT INTO attempts (user, question_hash, chosen_option, correct, latency_ms, created_at) "
+               "VALUES (?, ?, ?, ?, ?, ?)",
+    "review": "INSERT INTO reviews (user, question_hash, old_level, new_level, created_at) VALUES (?, ?, ?, ?, ?)",
+    "mastery": "INSERT OR REPLACE INTO mastery (user, question_hash, mastery_level, ease, interval, reps, due, "
+               "last_reviewed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+    "ability": "INSERT OR REPLACE INTO abilities (user, rating, answers, updated_at) VALUES (?, ?, ?, ?)",
+    "difficulty": "INSERT OR REPLACE INTO item_difficulty (question_hash, difficulty, answers, updated_at) "
+                  "VALUES (?, ?, ?, ?)",
+    # Rollup rows add their counts to the (user, dimension, value, day) bucket
+    "rollup": "INSERT INTO rollups (user, dimension, value, day, attempts, correct, latency_ms, timed) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (user, dimension, value, day) DO UPDATE SET "
+              "attempts = attempts + excluded.attempts, correct = correct + excluded.correct, "
+              "latency_ms = latency_ms + excluded.latency_ms, timed = timed + excluded.timed",
+    "rollup_mark": "INSERT OR IGNORE INTO rollup_marks (user, live_since) VALUES (?, ?)",
+    # Latency rows add to one bucket of a question's sketch, see latency_sketch
+    "latency": "INSERT INTO latency_buckets (question_hash, metric, bucket, count) VALUES (?, ?, ?, ?) "
+               "ON CONFLICT (metric, question_hash, bucket) DO UPDATE SET count = count + excluded.count",
+    "latency_summary": "INSERT OR REPLACE INTO latency_summary (metric, question_hash, answers, p50_ms, p90_ms, "
+                       "p99_ms) VALUES (?, ?, ?, ?, ?, ?)",
+}
+# Quiz snapshots are written right away instead of queued, see ProgressStore.save_quiz
+SAVE_QUIZ_SQL = "INSERT OR REPLACE INTO saved_quizzes (user, bank_digest, state, saved_at) VALUES (?, ?, ?, ?)"
+# Rollup dimension that counts every attempt, its value is always ""
+OVERALL = "all"
+# Queue kind for a list of (kind, row) writes that have to be committed together
+GROUP = "group"
+
+
+# Function to get the local calendar day rollups file an attempt under
+def day_of(timestamp):
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+# Function to list the rollup rows one attempt adds to, topics maps dimension -> value. The overall
+# row is kept per day, topic rows for all time (day ""), so a user has one row per topic and per day
+def _rollup_rows(user, topics, correct, latency_ms, created_at):
+    counts = (1, int(correct), latency_ms or 0, int(latency_ms is not None))
+    rows = [(user, OVERALL, "", day_of(created_at), *counts)]
+    for dimension, value in topics.items():
+        if value is not None:
+            rows.append((user, dimension, value, "", *counts))
+    return rows
+
+
+# Function to re-read the quantiles of question sketches that were just added to, keys are
+# (question hash, metric); runs in the writer's transaction so summaries match their buckets
+def _summarize_latency(conn, keys):
+    for question_hash, metric in keys:
+        sketch = LatencySketch.from_buckets(conn.execute(
+            "SELECT bucket, count FROM latency_buckets WHERE metric = ? AND question_hash = ?",
+            (metric, question_hash),
+        ))
+        quantiles = sketch.quantiles(QUANTILES)
+        conn.execute(INSERT_SQL["latency_summary"], (metric, question_hash, len(sketch), *quantiles.values()))
+
+
+# Function to open a connection with the settings every store connection uses
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# SQLite progress store, clicks only enqueue rows and a writer thread inserts them in batches
+class ProgressStore:
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("QUIZ_PROGRESS_DB", DEFAULT_DB_PATH)
+        conn = _connect(self.path)
+        conn.executescript(SCHEMA)
+        conn.close()
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name="progress-writer", daemon=True)
+        self._writer.start()
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = _connect(self.path)
+        return conn
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + FLUSH_SECONDS
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            rows = {}
+            for kind, row in batch:
+                if kind == GROUP:
+                    for grouped_kind, grouped_row in row:
+                        rows.setdefault(grouped_kind, []).append(grouped_row)
+                elif kind is not None:
+                    rows.setdefault(kind, []).append(row)
+            try:
+                with conn:
+                    for kind, kind_rows in rows.items():
+                        conn.executemany(INSERT_SQL[kind], kind_rows)
+                    if "latency" in rows:
+                        _summarize_latency(conn, {row[:2] for row in rows["latency"]})
+            except sqlite3.Error as e:
+                logger.warning("Dropped %d progress writes: %s", len(batch), e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    # Function to queue an attempt, topics (dimension -> value) also adds it to the user's rollups
+    def record_attempt(self, user, question_hash, chosen_option, correct, latency_seconds=None, topics=None):
+        latency_ms = None if latency_seconds is None else int(latency_seconds * 1000)
+        now = time.time()
+        writes = [("attempt", (user, question_hash, chosen_option, int(correct), latency_ms, now))]
+        if topics is not None:
+            # The first live rollup marks where a backfill of older attempts has to stop. The attempt, the
+            # mark and the rollups go in one queue item, so a backfill sees all of them or none
+            writes.append(("rollup_mark", (user, now)))
+            writes.extend(("rollup", row) for row in _rollup_rows(user, topics, correct, latency_ms, now))
+        self._queue.put((GROUP, writes))
+
+    # Function to queue an answer's timings for the question's latency sketches, timings maps metric -> ms
+    def record_latency(self, question_hash, timings):
+        for metric, ms in timings.items():
+            self._queue.put(("latency", (question_hash, metric, bucket_of(ms), 1)))
+
+    def record_review(self, user, question_hash, old_level, state):
+        now = time.time()
+        self._queue.put(("review", (user, question_hash, old_level, state["mastery_level"], now)))
+        self.save_mastery(user, question_hash, state)
+
+    def save_mastery(self, user, question_hash, state):
+        self._queue.put(("mastery", (
+            user, question_hash, state["mastery_level"], state["ease"], state["interval"],
+            state["reps"], state["due"], state["last_reviewed"],
+        )))
+
+    # Function to save the adaptive model's estimates after an answer
+    def save_estimates(self, user, rating, user_answers, question_hash, difficulty, item_answers):
+        now = time.time()
+        self._queue.put(("ability", (user, rating, user_answers, now)))
+        self._queue.put(("difficulty", (question_hash, difficulty, item_answers, now)))
+
+    # Function to save a snapshot of a user's quiz, replacing the one saved on the same bank. It is written
+    # before returning, so a quiz that was just finished or restarted is never read back in its older state
+    def save_quiz(self, user, quiz):
+        conn = self._reader()
+        with conn:
+            conn.execute(SAVE_QUIZ_SQL, (user, quiz.bank_digest, quiz.to_bytes(), time.time()))
+
+    # Function to forget a user's saved quiz on a bank, right away
+    def discard_quiz(self, user, bank_digest):
+        conn = self._reader()
+        with conn:
+            conn.execute("DELETE FROM saved_quizzes WHERE user = ? AND bank_digest = ?", (user, bank_digest))
+
+    # Function to wait until every queued write is committed
+    def flush(self):
+        self._queue.put((None, None))
+        self._queue.join()
+
+    def last_attempts(self, user, question_hash, limit=5):
+        return self._reader().execute(
+            "SELECT chosen_option, correct, latency_ms, created_at FROM attempts "
+            "WHERE user = ? AND question_hash = ? ORDER BY created_at DESC LIMIT ?",
+            (user, question_hash, limit),
+        ).fetchall()
+
+    # Function to get saved scheduling state for a user, keyed by question hash
+    def load_mastery(self, user):
+        rows = self._reader().execute(
+            "SELECT question_hash, mastery_level, ease, interval, reps, due, last_reviewed "
+            "FROM mastery WHERE user = ?",
+            (user,),
+        )
+        return {row[0]: row[1:] for row in rows}
+
+    # Function to get a user's (rating, answers), None for a new user
+    def load_ability(self, user):
+        return self._reader().execute(
+            "SELECT rating, answers FROM abilities WHERE user = ?", (user,)
+        ).fetchone()
+
+    # Function to get a user's rollup rows as (dimension, value, day, attempts, correct, latency ms, timed)
+    def load_rollups(self, user):
+        return self._reader().execute(
+            "SELECT dimension, value, day, attempts, correct, latency_ms, timed FROM rollups WHERE user = ?",
+            (user,),
+        ).fetchall()
+
+    # Function to add a user's attempts from before rollups were kept live, once per user. topics_of maps a
+    # question hash to its topics, or None when the loaded bank does not have the question; those attempts
+    # are left out. Returns how many attempts were rolled up
+    def backfill_rollups(self, user, topics_of):
+        conn = self._reader()
+        # The write lock is held throughout so the writer cannot add live rollups in between
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            mark = conn.execute("SELECT live_since, backfilled FROM rollup_marks WHERE user = ?", (user,)).fetchone()
+            if mark is not None and mark[1]:
+                conn.rollback()
+                return 0
+            live_since = mark[0] if mark is not None and mark[0] is not None else float("inf")
+            buckets = {}
+            added = 0
+            rows = conn.execute(
+                "SELECT question_hash, correct, latency_ms, created_at FROM attempts WHERE user = ? AND created_at < ?",
+                (user, live_since),
+            )
+            for question_hash, correct, latency_ms, created_at in rows:
+                topics = topics_of(question_hash)
+                if topics is None:
+                    continue
+                added += 1
+                for row in _rollup_rows(user, topics, correct, latency_ms, created_at):
+                    bucket = buckets.get(row[:4])
+                    if bucket is None:
+                        buckets[row[:4]] = list(row[4:])
+                    else:
+                        for i, count in enumerate(row[4:]):
+                            bucket[i] += count
+            conn.executemany(INSERT_SQL["rollup"], [key + tuple(counts) for key, counts in buckets.items()])
+            conn.execute(
+                "INSERT INTO rollup_marks (user, live_since, backfilled) VALUES (?, ?, 1) "
+                "ON CONFLICT (user) DO UPDATE SET backfilled = 1",
+                (user, None if mark is None else mark[0]),
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return added
+
+    # Function to list questions by the time 90% of their answers took, slowest first, as (question hash,
+    # answers, p50 ms, p90 ms, p99 ms)
+    def load_slowest(self, metric, min_answers):
+        return self._reader().execute(
+            "SELECT question_hash, answers, p50_ms, p90_ms, p99_ms FROM latency_summary "
+            "WHERE metric = ? AND answers >= ? ORDER BY p90_ms DESC",
+            (metric, min_answers),
+        ).fetchall()
+
+    # Function to get the bytes of a user's last saved quiz on a bank, None when there is none
+    def load_quiz(self, user, bank_digest):
+        row = self._reader().execute(
+            "SELECT state FROM saved_quizzes WHERE user = ? AND bank_digest = ?", (user, bank_digest)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    # Function to get every learned question difficulty as question hash -> (difficulty, answers)
+    def load_difficulties(self):
+        rows = self._reader().execute("SELECT question_hash, difficulty, answers FROM item_difficulty")
+        return {row[0]: row[1:] for row in rows}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+# Function to get the process-wide store, opened on first use
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProgressStore()
+            atexit.register(_store.flush)
+        return _store
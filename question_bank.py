@@ -0,0 +1,150 @@
+import hashlib
+import sys
+from array import array
+from bisect import bisect_right
+
+# Options are shown with positional letters, as many as the quiz displays
+OPTION_LETTERS = ("A", "B", "C", "D")
+# A pair shows at least this many options
+MIN_OPTIONS = 2
+# Letters correct_option may take for a pair with n options
+_VALID_CORRECT = [frozenset(OPTION_LETTERS[:n]) if n >= MIN_OPTIONS else frozenset()
+                  for n in range(len(OPTION_LETTERS) + 1)]
+
+
+# Function to read a pair's difficulty label as "Easy", "Medium" or "Hard"
+def _difficulty(value):
+    if not isinstance(value, str) or not value.strip():
+        return None
+    return sys.intern(value.strip().capitalize())
+
+
+# Function to intern a text field so repeated strings share one object
+def _intern(value):
+    if value is None:
+        return None
+    return sys.intern(value if isinstance(value, str) else str(value))
+
+
+# Function to read a pair's option texts, None when the pair cannot be shown: it needs a question, an
+# answer, 2 to 4 options and a correct_option naming one of them. validation.pair_problem says why
+def _option_texts(pair):
+    try:
+        options = pair["options"]
+        correct = pair["correct_option"]
+        if pair["question"] is None or pair["answer"] is None or correct not in _VALID_CORRECT[len(options)]:
+            return None
+    except (KeyError, TypeError, IndexError):
+        return None
+    if options.__class__ is not list:
+        return None
+    texts = []
+    for letter, option in zip(OPTION_LETTERS, options):
+        # Options are shown by position, a labelled option such as {"A": "..."} must carry its position's letter
+        if option.__class__ is dict:
+            if len(option) != 1 or letter not in option:
+                return None
+            option = option[letter]
+        texts.append(_intern(option))
+    return texts
+
+
+# Columnar store for a whole bank, questions are addressed by integer id
+class QuestionBank:
+    __slots__ = (
+        "digest", "size", "report", "facets", "key_terms", "estimates", "duplicates", "search",
+        "questions", "answers", "correct_options", "explanations", "syllabus_areas", "difficulties",
+        "option_texts", "option_offsets",
+        "lesson_names", "lesson_units", "lesson_sources", "lesson_offsets", "_hashes",
+    )
+
+    def __init__(self, digest="", size=0):
+        self.digest = digest
+        self.size = size
+        # ValidationReport from loading, None for banks built without one
+        self.report = None
+        self.facets = None
+        self.key_terms = None
+        self.estimates = None
+        self.duplicates = None
+        self.search = None
+        self.questions = []
+        self.answers = []
+        self.correct_options = []
+        self.explanations = []
+        self.syllabus_areas = []
+        self.difficulties = []
+        self.option_texts = []
+        self.option_offsets = array("I", [0])
+        self.lesson_names = []
+        self.lesson_units = []
+        # File each lesson was read from, None for a single-file bank
+        self.lesson_sources = []
+        self.lesson_offsets = array("I", [0])
+        self._hashes = None
+
+    def __len__(self):
+        return len(self.questions)
+
+    # Function to append one lesson, checking each pair while it is packed. Pairs that cannot be shown
+    # are left out and passed to report.reject(pair_index, pair), pair ids to report.seen_id(pair_index, id).
+    # Packing stops once the bank holds limit questions
+    def add_lesson(self, lesson, pairs, source=None, report=None, limit=None):
+        self.lesson_names.append(_intern(lesson.get("lesson_name")))
+        self.lesson_units.append(_intern(lesson.get("unit")))
+        self.lesson_sources.append(_intern(source))
+        for pair_index, pair in enumerate(pairs):
+            if limit is not None and len(self.questions) >= limit:
+                break
+            texts = _option_texts(pair)
+            pair_id = pair.get("id") if texts is not None else None
+            if texts is None or (pair_id is not None and not isinstance(pair_id, (str, int))):
+                if report is not None:
+                    report.reject(pair_index, pair)
+                continue
+            if pair_id is not None and report is not None:
+                report.seen_id(pair_index, pair_id)
+            self.questions.append(_intern(pair["question"]))
+            self.answers.append(_intern(pair["answer"]))
+            self.correct_options.append(_intern(pair["correct_option"]))
+            self.explanations.append(_intern(pair.get("explanation")))
+            self.syllabus_areas.append(_intern(pair.get("syllabus_area")))
+            self.difficulties.append(_difficulty(pair.get("difficulty")))
+            self.option_texts.extend(texts)
+            self.option_offsets.append(len(self.option_texts))
+        self.lesson_offsets.append(len(self.questions))
+
+    # Function to append every lesson of another (not yet indexed) bank, ids continue after ours
+    def extend(self, other):
+        question_base = len(self.questions)
+        option_base = len(self.option_texts)
+        for name in ("questions", "answers", "correct_options", "explanations", "syllabus_areas", "difficulties",
+                     "option_texts", "lesson_names", "lesson_units", "lesson_sources"):
+            getattr(self, name).extend(getattr(other, name))
+        self.option_offsets.extend(offset + option_base for offset in other.option_offsets[1:])
+        self.lesson_offsets.extend(offset + question_base for offset in other.lesson_offsets[1:])
+
+    def options(self, qid):
+        texts = self.option_texts[self.option_offsets[qid]:self.option_offsets[qid + 1]]
+        return dict(zip(OPTION_LETTERS, texts))
+
+    def lesson_of(self, qid):
+        return bisect_right(self.lesson_offsets, qid) - 1
+
+    def lesson_ids(self, lesson_index):
+        return range(self.lesson_offsets[lesson_index], self.lesson_offsets[lesson_index + 1])
+
+    def num_lessons(self):
+        return len(self.lesson_names)
+
+    # Function to get a stable per-question key that survives re-uploads and reordering
+    def question_hash(self, qid):
+        if self._hashes is not None:
+            return self._hashes[qid]
+        content = "\x1f".join((self.questions[qid], self.answers[qid], *self.options(qid).values()))
+        return hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+
+    def question_hashes(self):
+        if self._hashes is None:
+            self._hashes = [self.question_hash(qid) for qid in range(len(self))]
+        return self._hashes
@@ -0,0 +1,467 @@
+import codecs
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+import tracemalloc
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import binary_bank
+import memory_aids
+import profiler
+from facet_index import FacetIndex
+from question_bank import QuestionBank
+from validation import ValidationReport
+
+# Cache limits for parsed banks shared by every session in this process
+MAX_CACHED_BANKS = 8
+MAX_CACHED_BYTES = 256 * 1024 * 1024
+
+# Bytes read per step by the streaming loader
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Multi-file banks with at least this many files are parsed in a process pool
+MIN_PARALLEL_FILES = 2
+# Worker processes for parsing, override with the QUIZ_PARSE_WORKERS environment variable
+PARSE_WORKERS = int(os.environ.get("QUIZ_PARSE_WORKERS", 0)) or os.cpu_count() or 1
+
+
+# Thread-safe registry of parsed banks keyed by content hash, shared read-only by every session.
+# Sessions pin the banks they use through a BankHandle, only unpinned banks are evicted (LRU)
+class BankCache:
+    def __init__(self, max_entries=MAX_CACHED_BANKS, max_bytes=MAX_CACHED_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._refs = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, digest):
+        with self._lock:
+            bank = self._entries.get(digest)
+            if bank is not None:
+                self._entries.move_to_end(digest)
+            return bank
+
+    # Function to add a bank, returns the copy already registered under the same hash if there is one
+    def put(self, bank):
+        with self._lock:
+            existing = self._entries.get(bank.digest)
+            if existing is not None:
+                self._entries.move_to_end(bank.digest)
+                return existing
+            self._entries[bank.digest] = bank
+            self._bytes += bank.size
+            self._evict()
+            return bank
+
+    # Function to drop least recently used unpinned banks until the limits hold, keeping the newest
+    def _evict(self):
+        newest = next(reversed(self._entries), None)
+        for digest in list(self._entries):
+            if len(self._entries) <= self.max_entries and self._bytes <= self.max_bytes:
+                break
+            if digest == newest or self._refs.get(digest):
+                continue
+            self._bytes -= self._entries.pop(digest).size
+
+    # Function to pin a bank for one session, it stays cached until the handle is dropped
+    def acquire(self, bank):
+        with self._lock:
+            if bank.digest not in self._entries:
+                self._entries[bank.digest] = bank
+                self._bytes += bank.size
+            self._refs[bank.digest] = self._refs.get(bank.digest, 0) + 1
+        return BankHandle(self, bank)
+
+    def _release(self, digest):
+        with self._lock:
+            count = self._refs.get(digest, 0) - 1
+            if count > 0:
+                self._refs[digest] = count
+                return
+            self._refs.pop(digest, None)
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "banks": len(self._entries),
+                "pinned": len(self._refs),
+                "sessions": sum(self._refs.values()),
+                "bytes": self._bytes,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# A session's reference to a shared bank, the pin is released when the handle is garbage collected
+class BankHandle:
+    __slots__ = ("bank", "_finalizer", "__weakref__")
+
+    def __init__(self, cache, bank):
+        self.bank = bank
+        self._finalizer = weakref.finalize(self, cache._release, bank.digest)
+
+    def release(self):
+        self._finalizer()
+
+
+_cache = BankCache()
+
+
+# Function to pin a bank in the shared registry for the calling session
+def share(bank, cache=None):
+    cache = _cache if cache is None else cache
+    return cache.acquire(bank)
+
+
+# Function to get the shared registry's size for the profiler panel
+def registry_stats():
+    return _cache.stats()
+
+
+# Function to hash the raw bytes of an uploaded bank
+def bank_digest(raw):
+    with profiler.phase("hash_upload"):
+        return hashlib.sha256(raw).hexdigest()
+
+
+# Function to check one lesson and pack its valid pairs into the bank in the same pass. Problems are
+# recorded in the bank's report, lessons that cannot be read are left out. Returns the pairs packed
+def add_lesson(bank, lesson, lesson_index, source=None, max_pairs=None):
+    report = bank.report
+    pairs = report.check_lesson(lesson_index, lesson, source)
+    if pairs is None:
+        return 0
+    before = len(bank)
+    bank.add_lesson(lesson, pairs, source, report, max_pairs)
+    return len(bank) - before
+
+
+# Function to end a bank's validation, fails when problems left nothing to load
+def finish_report(bank):
+    bank.report.close()
+    error = bank.report.first_error()
+    if not len(bank) and error:
+        raise ValueError(f"No questions could be loaded: {error}.")
+
+
+# Function to build the lookup structures a bank needs once it is fully loaded,
+# extracted is the bank's memory-aid terms when the parsing workers already collected them
+def index_bank(bank, extracted=None):
+    with profiler.phase("facet_index"):
+        bank.facets = FacetIndex(bank)
+    with profiler.phase("key_terms"):
+        bank.key_terms = memory_aids.compute_key_terms(bank, extracted=extracted)
+
+
+# Function to check a parsed bank and pack it into a QuestionBank
+def build_bank(data, digest="", size=0):
+    if not isinstance(data, list):
+        raise ValueError("Quiz file must contain a list of lessons.")
+
+    bank = QuestionBank(digest, size)
+    bank.report = ValidationReport()
+    with profiler.phase("flatten"):
+        for lesson_index, lesson in enumerate(data):
+            add_lesson(bank, lesson, lesson_index)
+    finish_report(bank)
+    index_bank(bank)
+    return bank
+
+
+# Function to parse a bank from raw bytes, reusing the cached copy when possible
+def load_bank(raw, cache=None):
+    cache = _cache if cache is None else cache
+    if binary_bank.is_compiled(raw):
+        return load_compiled(raw, cache)
+    digest = bank_digest(raw)
+    bank = cache.get(digest)
+    if bank is None:
+        with profiler.phase("json_parse"):
+            data = json.loads(raw)
+        bank = cache.put(build_bank(data, digest, len(raw)))
+    return bank
+
+
+# Function to open an uploaded compiled bank: it is checked against its content hash, saved once and
+# memory-mapped, so nothing is parsed and every worker shares the file's pages. Reruns find it in the cache
+# by the hash its header claims, so only a bank that is not cached yet is hashed
+@profiler.timed("load_compiled")
+def load_compiled(raw, cache=None):
+    cache = _cache if cache is None else cache
+    bank = cache.get(binary_bank.content_hash(raw))
+    if bank is None:
+        bank = cache.put(binary_bank.open_uploaded(raw, binary_bank.verify(raw)))
+    return bank
+
+
+# Incremental reader that walks the top-level lesson array one lesson at a time
+class LessonStream:
+    def __init__(self, stream, chunk_size=STREAM_CHUNK_SIZE):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self._hasher = hashlib.sha256()
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8-sig")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def digest(self):
+        return self._hasher.hexdigest()
+
+    def _read(self, size):
+        chunk = self.stream.read(size)
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        self.bytes_read += len(chunk)
+        self._hasher.update(chunk)
+        # Drop the consumed prefix so the buffer only holds the current lesson
+        self._buffer = self._buffer[self._pos:] + self._text.decode(chunk, final=not chunk)
+        self._pos = 0
+        self._eof = not chunk
+        return bool(chunk)
+
+    def _next_char(self):
+        while True:
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._read(self.chunk_size):
+                return ""
+
+    def _expect(self, allowed):
+        char = self._next_char()
+        if not char or char not in allowed:
+            found = repr(char) if char else "end of file"
+            raise ValueError(f"Invalid quiz file: expected {' or '.join(allowed)} but found {found}.")
+        self._pos += 1
+        return char
+
+    def __iter__(self):
+        self._expect("[")
+        if self._next_char() == "]":
+            self._pos += 1
+            return
+        while True:
+            self._next_char()
+            read_size = self.chunk_size
+            while True:
+                try:
+                    lesson, end = self._decoder.raw_decode(self._buffer, self._pos)
+                    break
+                except json.JSONDecodeError:
+                    if self._eof:
+                        raise
+                    # Lesson is not fully buffered yet, read a bigger step and retry
+                    self._read(read_size)
+                    read_size *= 2
+            self._pos = end
+            yield lesson
+            if self._expect(",]") == "]":
+                return
+
+
+# Function to load a bank lesson by lesson, stopping once max_pairs are read. trace_memory measures peak
+# memory with tracemalloc, which is process-wide and slows every thread's allocations, so only scripts that
+# own the process turn it on; the app leaves it off
+@profiler.timed("stream_load")
+def load_bank_streaming(stream, max_pairs=None, chunk_size=STREAM_CHUNK_SIZE, cache=None, trace_memory=False):
+    cache = _cache if cache is None else cache
+    tracing = trace_memory and tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+    elif trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+
+    bank = QuestionBank()
+    bank.report = ValidationReport()
+    reader = LessonStream(stream, chunk_size)
+    try:
+        for lesson_index, lesson in enumerate(reader):
+            # Each lesson dict is packed into the bank and then dropped
+            add_lesson(bank, lesson, lesson_index, max_pairs=max_pairs)
+            if max_pairs and len(bank) >= max_pairs:
+                break
+        finish_report(bank)
+        index_bank(bank)
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if not tracing and trace_memory:
+            tracemalloc.stop()
+
+    stats = {
+        "lessons": bank.num_lessons(),
+        "pairs": len(bank),
+        "bytes_read": reader.bytes_read,
+        "peak_bytes": peak,
+        "seconds": time.perf_counter() - started,
+    }
+    # A truncated load is keyed by what was read and the cap, not the whole file
+    bank.digest = f"{reader.digest()}:{max_pairs or 0}"
+    bank.size = reader.bytes_read if peak is None else peak
+    return cache.put(bank), stats
+
+
+_file_digests = {}
+_file_lock = threading.Lock()
+
+
+# Function to load a bank from a server-side path, re-reading it only when the file changes
+def load_bank_file(path, max_pairs=None, cache=None):
+    cache = _cache if cache is None else cache
+    stat = os.stat(path)
+    file_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size, max_pairs)
+    with _file_lock:
+        digest = _file_digests.get(file_key)
+    bank = cache.get(digest) if digest is not None else None
+    if bank is None:
+        if binary_bank.is_compiled_file(path):
+            # Compiled banks are mapped whole, there is nothing to stream
+            bank = cache.put(binary_bank.open_bank(path))
+        else:
+            with open(path, "rb") as f:
+                if max_pairs:
+                    bank, _ = load_bank_streaming(f, max_pairs=max_pairs, cache=cache)
+                else:
+                    bank = load_bank(f.read(), cache=cache)
+        with _file_lock:
+            _file_digests[file_key] = bank.digest
+    return bank
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the process-wide parsing pool, started on first use. Workers are spawned rather than
+# forked because the server process runs threads
+def _parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+# Function to parse and check one bank file, returns (content hash, unindexed bank, memory-aid terms);
+# runs in a worker. raw is the file's bytes, or None to read it from path
+def parse_bank_file(name, raw=None, path=None):
+    if raw is None:
+        with open(path, "rb") as f:
+            raw = f.read()
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{name}: invalid JSON ({e})") from None
+    if not isinstance(data, list):
+        raise ValueError(f"{name}: quiz file must contain a list of lessons.")
+    bank = QuestionBank(size=len(raw))
+    # Problems are located by file, the report's pair ids are checked across files when merging
+    bank.report = ValidationReport()
+    for lesson_index, lesson in enumerate(data):
+        add_lesson(bank, lesson, lesson_index, source=name)
+    # Tokenizing is the slow part of indexing, so it is done here in parallel too
+    return hashlib.sha256(raw).hexdigest(), bank, memory_aids.extract_terms(bank)
+
+
+# Function to get one digest for a set of files from their names and content hashes
+def _merged_digest(named_digests):
+    content = "".join(f"{name}\0{digest}\n" for name, digest in sorted(named_digests))
+    return "files:" + hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+# Function to parse files in the pool (or inline for one file) and merge them in name order, so the
+# question ids are the same whichever worker finishes first; jobs are (name, raw, path) sorted by name
+def _merge_files(jobs, cache):
+    with profiler.phase("parse_files"):
+        if len(jobs) >= MIN_PARALLEL_FILES and PARSE_WORKERS > 1:
+            parts = list(_parse_pool().map(parse_bank_file, *zip(*jobs)))
+        else:
+            parts = [parse_bank_file(*job) for job in jobs]
+    bank = QuestionBank(_merged_digest((job[0], digest) for job, (digest, _, _) in zip(jobs, parts)))
+    existing = cache.get(bank.digest)
+    if existing is not None:
+        return existing
+    bank.report = ValidationReport()
+    with profiler.phase("merge"):
+        for _, part, _ in parts:
+            bank.extend(part)
+            bank.size += part.size
+            bank.report.merge(part.report)
+        finish_report(bank)
+        extracted = memory_aids.merge_terms([(len(part), terms) for _, part, terms in parts])
+    index_bank(bank, extracted)
+    return cache.put(bank)
+
+
+# Function to load several uploaded bank files as one bank; files is a list of (name, raw bytes)
+@profiler.timed("load_files")
+def load_bank_files(files, cache=None):
+    cache = _cache if cache is None else cache
+    files = sorted(files, key=lambda item: item[0])
+    for name, raw in files:
+        if binary_bank.is_compiled(raw):
+            raise ValueError(f"{name}: compiled banks are loaded on their own, not merged with other files.")
+    digest = _merged_digest((name, bank_digest(raw)) for name, raw in files)
+    bank = cache.get(digest)
+    if bank is None:
+        bank = _merge_files([(name, raw, None) for name, raw in files], cache)
+    return bank
+
+
+# Function to load every .json file in a server-side directory as one bank, re-reading it only when
+# a file is added, removed or changed
+@profiler.timed("load_files")
+def load_bank_dir(path, cache=None):
+    cache = _cache if cache is None else cache
+    names = sorted(name for name in os.listdir(path) if name.lower().endswith(".json"))
+    if not names:
+        raise ValueError(f"No .json bank files in {path}.")
+    paths = [os.path.join(path, name) for name in names]
+    stats = [os.stat(file_path) for file_path in paths]
+    dir_key = (os.path.abspath(path), tuple((name, s.st_mtime_ns, s.st_size) for name, s in zip(names, stats)))
+    with _file_lock:
+        digest = _file_digests.get(dir_key)
+    bank = cache.get(digest) if digest is not None else None
+    if bank is None:
+        bank = _merge_files([(name, None, file_path) for name, file_path in zip(names, paths)], cache)
+        with _file_lock:
+            _file_digests[dir_key] = bank.digest
+    return bank
+
+
+# Function to get the lesson order for this session's shuffle seed
+def lesson_permutation(num_lessons, seed):
+    order = list(range(num_lessons))
+    random.Random(seed).shuffle(order)
+    return order
+
+
+# Function to list question ids with lessons in a seeded shuffled order
+def shuffled_ids(bank, seed, selected=None):
+    ids = array("I")
+    for lesson_index in lesson_permutation(bank.num_lessons(), seed):
+        lesson_ids = bank.lesson_ids(lesson_index)
+        if selected is None:
+            ids.extend(lesson_ids)
+        else:
+            # Selected ids are sorted, so each lesson's share is one slice
+            start = bisect_left(selected, lesson_ids.start)
+            stop = bisect_left(selected, lesson_ids.stop)
+            ids.extend(selected[start:stop])
+    return ids
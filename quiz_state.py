@@ -0,0 +1,248 @@
+import struct
+import time
+from array import array
+
+from binary_bank import le_array, le_bytes
+from latency_sketch import LatencySketch
+from question_bank import OPTION_LETTERS
+
+# Serialized header: magic, digest length, question count, cursor, answered, correct, total latency ms,
+# seconds per question, timeouts, ms left on the question and on the quiz (0 when untimed), then ms
+# since the quiz started
+HEADER = struct.Struct("<4sHIIIIQIIIII")
+MAGIC = b"QZS4"
+# Latencies are stored in whole milliseconds, capped to fit the array type
+MAX_LATENCY_MS = 2**32 - 1
+# Moments kept per question, as ms since the quiz started plus one (0 when not reached): the question was
+# drawn and the answer was submitted
+MARKS = ("shown", "submitted")
+SHOWN, SUBMITTED = range(len(MARKS))
+
+
+# Function to pack seconds left into whole ms, at least 1 so a running clock is not read as none
+def _left_ms(seconds):
+    if seconds is None:
+        return 0
+    return max(1, min(int(seconds * 1000), MAX_LATENCY_MS))
+
+
+# One session's quiz: question order, cursor, answers and timings, all sized by the quiz length
+class QuizState:
+    __slots__ = ("bank_digest", "ids", "cursor", "choices", "answered_bits", "correct_bits",
+                 "latency_ms", "answered_count", "correct_count", "latency_total_ms", "question_started",
+                 "question_seconds", "question_deadline", "quiz_deadline", "timeouts", "origin", "marks",
+                 "sketch")
+
+    # question_seconds and time_limit (seconds for the whole quiz) are 0 for no limit
+    def __init__(self, bank_digest, question_ids, now=None, question_seconds=0, time_limit=0):
+        size = len(question_ids)
+        self.bank_digest = bank_digest
+        self.ids = array("I", question_ids)
+        self.cursor = 0
+        # Chosen option per question as its index in OPTION_LETTERS plus one, 0 when unanswered
+        self.choices = bytearray(size)
+        self.answered_bits = bytearray((size + 7) // 8)
+        self.correct_bits = bytearray((size + 7) // 8)
+        self.latency_ms = array("I", [0]) * size
+        # Running totals so results never walk the arrays
+        self.answered_count = 0
+        self.correct_count = 0
+        self.latency_total_ms = 0
+        self.timeouts = 0
+        # Deadlines are monotonic clock readings, 0 when there is none
+        now = time.monotonic() if now is None else now
+        self.origin = now
+        self.marks = array("I", [0]) * (len(MARKS) * size)
+        # Times from shown to submitted of this session's answers
+        self.sketch = LatencySketch()
+        self.question_seconds = question_seconds
+        self.quiz_deadline = now + time_limit if time_limit else 0.0
+        self._start_question(now)
+
+    def _start_question(self, now):
+        self.question_started = now
+        self.question_deadline = now + self.question_seconds if self.question_seconds else 0.0
+
+    def timed(self):
+        return bool(self.question_seconds or self.quiz_deadline)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def finished(self):
+        return self.cursor >= len(self.ids)
+
+    # Function to get the question id under the cursor, None once the quiz is done
+    def current(self):
+        return None if self.finished() else self.ids[self.cursor]
+
+    def is_answered(self, position=None):
+        position = self.cursor if position is None else position
+        return bool(self.answered_bits[position >> 3] & (1 << (position & 7)))
+
+    def is_correct(self, position=None):
+        position = self.cursor if position is None else position
+        return bool(self.correct_bits[position >> 3] & (1 << (position & 7)))
+
+    # Function to get the option letter chosen for a question, None if it was not answered
+    def choice(self, position=None):
+        position = self.cursor if position is None else position
+        index = self.choices[position] if position < len(self.choices) else 0
+        return OPTION_LETTERS[index - 1] if index else None
+
+    # Function to get the time since the current question was shown, in seconds
+    def elapsed(self, now=None):
+        now = time.monotonic() if now is None else now
+        return max(0.0, now - self.question_started)
+
+    # Function to get one of a question's moments as stored in MARKS order, 0 when it was not reached
+    def mark(self, kind, position=None):
+        position = self.cursor if position is None else position
+        return self.marks[len(MARKS) * position + kind]
+
+    # Function to set a moment of the current question, once
+    def _set_mark(self, kind, now):
+        slot = len(MARKS) * self.cursor + kind
+        if not self.marks[slot]:
+            # Stored plus one so a moment at the very start is not read as unset
+            self.marks[slot] = min(int((now - self.origin) * 1000), MAX_LATENCY_MS - 1) + 1
+
+    # Function to note that the current question has been drawn, called once its options are on screen
+    def show(self, now=None):
+        if not self.finished() and not self.is_answered():
+            self._set_mark(SHOWN, time.monotonic() if now is None else now)
+
+    # Function to record the answer to the current question, returns its latency in seconds from when the
+    # question was shown
+    def answer(self, letter, correct, now=None):
+        position = self.cursor
+        if self.finished() or self.is_answered(position):
+            return None
+        now = time.monotonic() if now is None else now
+        # A question answered before it was noted as shown counts from when it was reached
+        self._set_mark(SHOWN, self.question_started)
+        self._set_mark(SUBMITTED, now)
+        latency = self.mark(SUBMITTED) - self.mark(SHOWN)
+        seconds = latency / 1000
+        bit = 1 << (position & 7)
+        self.answered_bits[position >> 3] |= bit
+        if correct:
+            self.correct_bits[position >> 3] |= bit
+            self.correct_count += 1
+        self.choices[position] = OPTION_LETTERS.index(letter) + 1
+        self.latency_ms[position] = latency
+        self.latency_total_ms += latency
+        self.answered_count += 1
+        self.sketch.add(latency)
+        return seconds
+
+    def advance(self, now=None):
+        if not self.finished():
+            self.cursor += 1
+        self._start_question(time.monotonic() if now is None else now)
+
+    # Function to get the seconds left as (on this question, in the quiz), None where there is no limit.
+    # The question clock stops once it is answered
+    def remaining(self, now=None):
+        now = time.monotonic() if now is None else now
+        question = None
+        if self.question_deadline and not self.is_answered():
+            question = max(0.0, self.question_deadline - now)
+        quiz = max(0.0, self.quiz_deadline - now) if self.quiz_deadline else None
+        return question, quiz
+
+    # Function to check the deadlines, returns "quiz" or "question" for the one that ran out, else None
+    def expired(self, now=None):
+        if self.finished():
+            return None
+        now = time.monotonic() if now is None else now
+        if self.quiz_deadline and now >= self.quiz_deadline:
+            return "quiz"
+        if self.question_deadline and now >= self.question_deadline and not self.is_answered():
+            return "question"
+        return None
+
+    # Function to record the current question as unanswered in time, it counts as incorrect
+    def time_out(self):
+        position = self.cursor
+        if self.finished() or self.is_answered(position):
+            return
+        self.answered_bits[position >> 3] |= 1 << (position & 7)
+        latency = min(int(self.question_seconds * 1000), MAX_LATENCY_MS)
+        self.latency_ms[position] = latency
+        self.latency_total_ms += latency
+        self.answered_count += 1
+        self.timeouts += 1
+
+    # Function to end the quiz early, questions not reached stay unanswered
+    def finish(self):
+        self.cursor = len(self.ids)
+        self.question_deadline = 0.0
+
+    # Function to summarize the quiz from the running totals
+    def results(self):
+        total = len(self.ids)
+        return {
+            "total": total,
+            "answered": self.answered_count,
+            "correct": self.correct_count,
+            "score_percentage": self.correct_count / total * 100 if total else 0.0,
+            "avg_seconds": self.latency_total_ms / self.answered_count / 1000 if self.answered_count else 0.0,
+            "timeouts": self.timeouts,
+            # Seconds from shown to submitted at each summary quantile, None before any answer
+            "quantiles": {
+                q: None if ms is None else ms / 1000 for q, ms in self.sketch.quantiles().items()
+            },
+        }
+
+    # Function to pack the state into bytes, for persisting a session
+    def to_bytes(self, now=None):
+        digest = self.bank_digest.encode("utf-8")
+        now = time.monotonic() if now is None else now
+        question_left, quiz_left = self.remaining(now)
+        clock = min(int((now - self.origin) * 1000), MAX_LATENCY_MS)
+        header = HEADER.pack(MAGIC, len(digest), len(self.ids), self.cursor, self.answered_count,
+                             self.correct_count, self.latency_total_ms, self.question_seconds, self.timeouts,
+                             _left_ms(question_left), _left_ms(quiz_left), clock)
+        return b"".join((header, digest, le_bytes(self.ids), bytes(self.choices), bytes(self.answered_bits),
+                         bytes(self.correct_bits), le_bytes(self.latency_ms), le_bytes(self.marks)))
+
+    @classmethod
+    def from_bytes(cls, data, now=None):
+        if len(data) < HEADER.size:
+            raise ValueError("Saved quiz state is too short.")
+        (magic, digest_len, size, cursor, answered, correct, latency_total, question_seconds, timeouts,
+         question_left, quiz_left, clock) = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a saved quiz state.")
+        bits = (size + 7) // 8
+        offset = HEADER.size
+        sections = []
+        for length in (digest_len, 4 * size, size, bits, bits, 4 * size, 4 * len(MARKS) * size):
+            sections.append(data[offset:offset + length])
+            offset += length
+        if offset != len(data):
+            raise ValueError("Saved quiz state has the wrong length.")
+        state = cls(sections[0].decode("utf-8"), (), now)
+        state.ids = le_array("I", sections[1])
+        state.choices = bytearray(sections[2])
+        state.answered_bits = bytearray(sections[3])
+        state.correct_bits = bytearray(sections[4])
+        state.latency_ms = le_array("I", sections[5])
+        state.marks = le_array("I", sections[6])
+        state.cursor = cursor
+        state.answered_count = answered
+        state.correct_count = correct
+        state.latency_total_ms = latency_total
+        state.timeouts = timeouts
+        # Deadlines resume with the time that was left when the state was saved
+        now = time.monotonic() if now is None else now
+        state.question_seconds = question_seconds
+        state.question_deadline = now + question_left / 1000 if question_left else 0.0
+        state.quiz_deadline = now + quiz_left / 1000 if quiz_left else 0.0
+        # Moments stay relative to the quiz start, which is moved to keep the time that had passed
+        state.origin = now - clock / 1000
+        for position in range(size):
+            if state.mark(SUBMITTED, position):
+                state.sketch.add(state.mark(SUBMITTED, position) - state.mark(SHOWN, position))
+        return state
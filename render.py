@@ -0,0 +1,81 @@
+import html
+import re
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+
+STYLESHEET_PATH = Path(__file__).parent / "static" / "quiz.css"
+
+# Each view is one HTML payload built from a template compiled at import
+HEADING = Template('<div class="heading-container$extra"><h1>$title</h1></div>')
+QUESTION_CARD = Template('<div class="question-card"><h3>Question $number</h3><p><strong>$question</strong></p></div>')
+FLASHCARD = Template(
+    '<div class="flashcard$flipped"><div class="flashcard-inner">'
+    '<div class="flashcard-front"><div class="flashcard-content"><h3>$front</h3></div></div>'
+    '<div class="flashcard-back"><div class="flashcard-content"><p>$back</p>$tip</div></div>'
+    '</div></div>'
+)
+MEMORY_TIP = Template('<div class="memory-tip">💡 <b>Memory Tip:</b> $tip</div>')
+CORRECT_ANSWER = Template('<div class="correct-answer">✅ Correct! Answer: $answer</div>')
+INCORRECT_ANSWER = Template('<div class="incorrect-answer">❌ Incorrect. The correct answer is: $answer</div>')
+BAR_ROW = Template(
+    '<div class="bar-row"><span class="bar-label">$label</span>'
+    '<span class="bar-track"><span class="bar-fill" style="width:$percent%"></span></span>'
+    '<span class="bar-value">$value</span></div>'
+)
+RESULT_HEADER = Template(
+    '<div class="result-container"><h1>🏆 Quiz Completed!</h1><p class="feedback-text">$feedback</p></div>'
+)
+
+
+# Function to read and minify the stylesheet once per process
+@lru_cache(maxsize=1)
+def style_tag():
+    css = STYLESHEET_PATH.read_text(encoding="utf-8")
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return f"<style>{css.strip()}</style>"
+
+
+# Function to escape bank text before it goes into a template
+def _text(value):
+    return html.escape(str(value), quote=False)
+
+
+def heading(title, extra=""):
+    return HEADING.substitute(title=_text(title), extra=f" {extra}" if extra else "")
+
+
+def question_card(number, question):
+    return QUESTION_CARD.substitute(number=number, question=_text(question))
+
+
+def memory_tip(tip):
+    return MEMORY_TIP.substitute(tip=_text(tip))
+
+
+def flashcard(front, back, tip, flipped):
+    return FLASHCARD.substitute(
+        front=_text(front), back=_text(back), tip=memory_tip(tip), flipped=" flipped" if flipped else ""
+    )
+
+
+def answer_feedback(correct, answer):
+    template = CORRECT_ANSWER if correct else INCORRECT_ANSWER
+    return template.substitute(answer=_text(answer))
+
+
+def result_header(feedback):
+    return RESULT_HEADER.substitute(feedback=_text(feedback))
+
+
+# Function to draw a horizontal bar chart from a label -> count mapping, no dataframe needed.
+# Bars are scaled to top (the largest value by default) and values shown with suffix
+def bar_chart(counts, top=None, suffix=""):
+    top = top or max(counts.values(), default=0) or 1
+    rows = "".join(
+        BAR_ROW.substitute(label=_text(label), value=f"{value}{suffix}", percent=round(value * 100 / top, 1))
+        for label, value in counts.items()
+    )
+    return f'<div class="bar-chart">{rows}</div>'
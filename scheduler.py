@@ -0,0 +1,124 @@
+import heapq
+import time
+from array import array
+from datetime import date, datetime
+
+# SM-2 settings
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+DAY_SECONDS = 24 * 60 * 60
+# Cards rated below "Recall" come back within the same session
+RELEARN_SECONDS = 10 * 60
+MASTERY_LEVELS = 6
+
+
+# Function to get the local calendar day of a timestamp
+def _day(timestamp):
+    return date.fromtimestamp(timestamp).toordinal()
+
+
+# SM-2 spaced repetition over a deck of question ids, next card from a due-time heap
+class Scheduler:
+    def __init__(self, question_ids, now=None):
+        now = time.time() if now is None else now
+        size = len(question_ids)
+        self.ids = question_ids
+        self.ease = array("f", [DEFAULT_EASE]) * size
+        self.interval = array("f", [0.0]) * size  # days
+        self.reps = array("H", [0]) * size
+        self.due = array("d", [now]) * size
+        self.last_reviewed = array("d", [0.0]) * size
+        self.mastery_level = bytearray(size)
+        self.mastery_counts = [size] + [0] * (MASTERY_LEVELS - 1)
+        # Heap entries are (due, card); an entry is stale once due[card] moved on
+        self._heap = [(now, card) for card in range(size)]
+        self._day_counts = {_day(now): size} if size else {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _set_due(self, card, due):
+        old_day = _day(self.due[card])
+        self._day_counts[old_day] -= 1
+        if not self._day_counts[old_day]:
+            del self._day_counts[old_day]
+        new_day = _day(due)
+        self._day_counts[new_day] = self._day_counts.get(new_day, 0) + 1
+        self.due[card] = due
+        heapq.heappush(self._heap, (due, card))
+        # Drop stale entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self.ids):
+            self._heap = [(self.due[c], c) for c in range(len(self.ids))]
+            heapq.heapify(self._heap)
+
+    # Function to get the card with the earliest due time
+    def next_due(self):
+        heap = self._heap
+        while heap and heap[0][0] != self.due[heap[0][1]]:
+            heapq.heappop(heap)
+        return heap[0][1] if heap else None
+
+    def due_today(self, now=None):
+        today = _day(time.time() if now is None else now)
+        return sum(count for day, count in self._day_counts.items() if day <= today)
+
+    # Function to apply a 0-5 rating to a card with the SM-2 update
+    def review(self, card, quality, now=None):
+        now = time.time() if now is None else now
+        if quality < 3:
+            self.reps[card] = 0
+            self.interval[card] = 0.0
+            due = now + RELEARN_SECONDS
+        else:
+            reps = self.reps[card] + 1
+            if reps == 1:
+                interval = 1.0
+            elif reps == 2:
+                interval = 6.0
+            else:
+                interval = self.interval[card] * self.ease[card]
+            self.reps[card] = min(reps, 65535)
+            self.interval[card] = interval
+            due = now + interval * DAY_SECONDS
+        penalty = 5 - quality
+        self.ease[card] = max(MIN_EASE, self.ease[card] + 0.1 - penalty * (0.08 + penalty * 0.02))
+
+        self.mastery_counts[self.mastery_level[card]] -= 1
+        self.mastery_counts[quality] += 1
+        self.mastery_level[card] = quality
+        self.last_reviewed[card] = now
+        self._set_due(card, due)
+
+    # Function to restore saved scheduling state for one card
+    def restore(self, card, mastery_level, ease, interval, reps, due, last_reviewed=0.0):
+        self.mastery_counts[self.mastery_level[card]] -= 1
+        self.mastery_counts[mastery_level] += 1
+        self.mastery_level[card] = mastery_level
+        self.ease[card] = ease
+        self.interval[card] = interval
+        self.reps[card] = reps
+        self.last_reviewed[card] = last_reviewed
+        self._set_due(card, due)
+
+    def raw_state(self, card):
+        return {
+            "mastery_level": self.mastery_level[card],
+            "ease": self.ease[card],
+            "interval": self.interval[card],
+            "reps": self.reps[card],
+            "due": self.due[card],
+            "last_reviewed": self.last_reviewed[card],
+        }
+
+    def card_state(self, card):
+        return {
+            "mastery_level": self.mastery_level[card],
+            "ease": round(self.ease[card], 3),
+            "interval": round(self.interval[card], 3),
+            "reps": self.reps[card],
+            "due_date": datetime.fromtimestamp(self.due[card]).strftime("%Y-%m-%d %H:%M:%S"),
+            "last_reviewed": (
+                datetime.fromtimestamp(self.last_reviewed[card]).strftime("%Y-%m-%d %H:%M:%S")
+                if self.last_reviewed[card] else None
+            ),
+        }
@@ -0,0 +1,134 @@
+import threading
+import unicodedata
+from bisect import bisect_left
+
+import profiler
+from memory_aids import STOPWORDS, TOKEN_RE
+
+# Searched fields and how much a match in each counts
+FIELD_WEIGHTS = {"question": 3.0, "answer": 2.0, "explanation": 1.0, "syllabus_area": 1.5}
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+# Query words shorter than this only match whole terms
+MIN_PREFIX = 2
+# Terms a single query word may expand to, shortest first
+MAX_EXPANSIONS = 64
+MAX_RESULTS = 200
+
+_lock = threading.Lock()
+
+
+# Function to split text into searchable terms, the same way for documents and queries
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize("NFC", text).casefold()
+    return [word for word in TOKEN_RE.findall(text) if word not in STOPWORDS]
+
+
+# BM25 index over a bank: a sorted vocabulary for prefix lookup and, per term, the ids of the
+# questions it occurs in with their precomputed BM25 weights
+class SearchIndex:
+    __slots__ = ("size", "terms", "offsets", "doc_ids", "weights")
+
+    def __init__(self, bank):
+        import numpy as np
+
+        self.size = len(bank)
+        vocabulary = {}
+        term_ids, doc_ids, counts = [], [], []
+        lengths = np.zeros(self.size, dtype=np.float32)
+        fields = {
+            "question": bank.questions,
+            "answer": bank.answers,
+            "explanation": bank.explanations,
+            "syllabus_area": bank.syllabus_areas,
+        }
+        for qid in range(self.size):
+            weighted = {}
+            length = 0.0
+            for name, values in fields.items():
+                weight = FIELD_WEIGHTS[name]
+                for term in tokenize(values[qid]):
+                    weighted[term] = weighted.get(term, 0.0) + weight
+                    length += weight
+            lengths[qid] = length
+            for term, count in weighted.items():
+                term_id = vocabulary.get(term)
+                if term_id is None:
+                    term_id = vocabulary[term] = len(vocabulary)
+                term_ids.append(term_id)
+                doc_ids.append(qid)
+                counts.append(count)
+
+        # Renumber terms in sorted order so a prefix is one contiguous range of term ids
+        self.terms = sorted(vocabulary)
+        rank = np.empty(len(vocabulary), dtype=np.int64)
+        rank[[vocabulary[term] for term in self.terms]] = np.arange(len(self.terms))
+        term_ids = rank[np.asarray(term_ids, dtype=np.int64)]
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        self.doc_ids = np.asarray(doc_ids, dtype=np.uint32)[order]
+        tf = np.asarray(counts, dtype=np.float32)[order]
+        self.offsets = np.searchsorted(term_ids, np.arange(len(self.terms) + 1)).astype(np.int64)
+
+        # Each posting's BM25 contribution is fixed per bank, so queries only add weights up
+        doc_freq = np.diff(self.offsets).astype(np.float32)
+        idf = np.log1p((self.size - doc_freq + 0.5) / (doc_freq + 0.5))
+        average = float(lengths.mean()) if self.size else 1.0
+        norm = K1 * (1 - B + B * lengths[self.doc_ids] / (average or 1.0))
+        self.weights = (idf[term_ids] * tf * (K1 + 1) / (tf + norm)).astype(np.float32)
+
+    # Function to get the term ids a query word matches, the word itself first
+    def expand(self, word):
+        start = bisect_left(self.terms, word)
+        if len(word) < MIN_PREFIX:
+            return [start] if start < len(self.terms) and self.terms[start] == word else []
+        stop = bisect_left(self.terms, word + "\U0010ffff", start)
+        matches = sorted(range(start, stop), key=lambda term_id: len(self.terms[term_id]))
+        return matches[:MAX_EXPANSIONS]
+
+    # Function to rank questions for a query, returns (question ids, scores) of the best limit hits, best
+    # first, and how many questions matched in all
+    def search(self, query, limit=MAX_RESULTS):
+        import numpy as np
+
+        scores = None
+        for word in dict.fromkeys(tokenize(query)):
+            term_ids = self.expand(word)
+            if not term_ids:
+                continue
+            if scores is None:
+                scores = np.zeros(self.size, dtype=np.float32)
+            # A word counts once per question, through its best matching term
+            word_scores = np.zeros(self.size, dtype=np.float32)
+            for term_id in term_ids:
+                start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+                docs = self.doc_ids[start:stop]
+                word_scores[docs] = np.maximum(word_scores[docs], self.weights[start:stop])
+            scores += word_scores
+        if scores is None:
+            return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.float32), 0
+        hits = np.flatnonzero(scores)
+        total = len(hits)
+        if total > limit:
+            hits = hits[np.argpartition(-scores[hits], limit - 1)[:limit]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return hits.astype(np.uint32), scores[hits], total
+
+
+# Function to get a bank's search index, built on the first search
+def search_index(bank):
+    if bank.search is None:
+        with _lock:
+            if bank.search is None:
+                with profiler.phase("search_index"):
+                    bank.search = SearchIndex(bank)
+    return bank.search
+
+
+# Function to search a bank, returns (question ids, scores) of the best limit hits and the number of matches
+@profiler.timed("search")
+def search(bank, query, limit=MAX_RESULTS):
+    return search_index(bank).search(query, limit)
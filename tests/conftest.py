@@ -0,0 +1,41 @@
+import json
+import os
+import sys
+
+import pytest
+
+# The app's modules live at the top of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# A small bank in the upload format, with every optional field on some pairs
+@pytest.fixture
+def bank_json():
+    lessons = []
+    for lesson_index, unit in enumerate(["Unit I: History", "Unit II: Polity"]):
+        pairs = []
+        for i in range(6):
+            number = lesson_index * 6 + i
+            pairs.append({
+                "id": f"q{number}",
+                "question": f"சோழர் question {number} about the temple inscription?",
+                "answer": f"Answer {number}",
+                "options": [{"A": f"Answer {number}"}, {"B": f"Wrong {number}"}, {"C": "Neither"}],
+                "correct_option": "A",
+                "explanation": f"Because of inscription {number}." if i % 2 else None,
+                "syllabus_area": "History" if lesson_index == 0 else "Polity",
+                "difficulty": ["Easy", "Medium", "Hard"][i % 3],
+            })
+        lessons.append({"lesson_name": f"Lesson {lesson_index + 1}", "unit": unit, "pairs": pairs})
+    return json.dumps(lessons, ensure_ascii=False).encode("utf-8")
+
+
+# A progress store of its own in place of the process-wide one
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    import progress_store
+
+    store = progress_store.ProgressStore(str(tmp_path / "progress.db"))
+    monkeypatch.setattr(progress_store, "_store", store)
+    yield store
+    store.flush()
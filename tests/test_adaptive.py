@@ -0,0 +1,40 @@
+import adaptive
+import quiz_bank
+
+
+def _ids(facets, label):
+    return list(facets.postings["difficulty"].get(label, []))
+
+
+def test_learned_bands_leave_the_shared_index_alone(bank_json, store):
+    bank = quiz_bank.load_bank(bank_json, cache=quiz_bank.BankCache())
+    labelled = {label: _ids(bank.facets, label) for label in adaptive.LABEL_PRIORS}
+    assert adaptive.facets(bank) == (bank.facets, 0)
+
+    # Question 0 is labelled Easy but has been answered as a hard one
+    est = adaptive.estimates(bank)
+    est.values[0] = 2.0
+    est.answers[0] = adaptive.MIN_BAND_ANSWERS
+    adaptive.refresh(bank, force=True)
+    facets, version = adaptive.facets(bank)
+    assert version == 1
+    assert 0 in _ids(facets, "Hard") and 0 not in _ids(facets, "Easy")
+    assert facets.count("difficulty", "Hard") == len(labelled["Hard"]) + 1
+    assert facets.values("unit") == bank.facets.values("unit")
+    assert {label: _ids(bank.facets, label) for label in adaptive.LABEL_PRIORS} == labelled
+
+    # Nothing moved between bands, so the version stays
+    adaptive.refresh(bank, force=True)
+    assert adaptive.facets(bank)[1] == 1
+    est.values[0] = -2.0
+    adaptive.refresh(bank, force=True)
+    facets, version = adaptive.facets(bank)
+    assert version == 2 and 0 in _ids(facets, "Easy")
+
+
+def test_abilities_are_kept_for_the_most_recent_users(store, monkeypatch):
+    monkeypatch.setattr(adaptive, "MAX_CACHED_USERS", 2)
+    monkeypatch.setattr(adaptive, "_abilities", adaptive.OrderedDict())
+    for user in ("a", "b", "a", "c"):
+        adaptive.ability(user)
+    assert list(adaptive._abilities) == ["a", "c"]
@@ -0,0 +1,77 @@
+import pytest
+
+import binary_bank
+import quiz_bank
+
+
+@pytest.fixture
+def parsed(bank_json):
+    return quiz_bank.load_bank(bank_json, cache=quiz_bank.BankCache())
+
+
+def _assert_same_bank(compiled, parsed):
+    assert len(compiled) == len(parsed)
+    assert compiled.num_lessons() == parsed.num_lessons()
+    for qid in range(len(parsed)):
+        assert compiled.questions[qid] == parsed.questions[qid]
+        assert compiled.answers[qid] == parsed.answers[qid]
+        assert compiled.correct_options[qid] == parsed.correct_options[qid]
+        assert compiled.explanations[qid] == parsed.explanations[qid]
+        assert compiled.options(qid) == parsed.options(qid)
+        assert compiled.lesson_of(qid) == parsed.lesson_of(qid)
+        assert tuple(compiled.key_terms[qid]) == tuple(parsed.key_terms[qid])
+    assert list(compiled.question_hashes()) == list(parsed.question_hashes())
+    assert list(compiled.lesson_names) == list(parsed.lesson_names)
+    for name, postings in parsed.facets.postings.items():
+        assert {label: list(ids) for label, ids in compiled.facets.postings[name].items()} == \
+            {label: list(ids) for label, ids in postings.items()}
+
+
+def test_compiled_bank_matches_parsed_bank(parsed):
+    raw = binary_bank.compile_bank(parsed)
+    assert binary_bank.is_compiled(raw)
+    assert binary_bank.verify(raw) == binary_bank.content_hash(raw)
+    _assert_same_bank(binary_bank.bank_from_buffer(raw), parsed)
+
+
+def test_mapped_file_matches_parsed_bank(parsed, tmp_path):
+    path = tmp_path / "bank.qbank"
+    path.write_bytes(binary_bank.compile_bank(parsed))
+    assert binary_bank.is_compiled_file(path)
+    bank = binary_bank.open_bank(path)
+    _assert_same_bank(bank, parsed)
+    assert bank.facets.select({"difficulty": ["Hard"]}) == parsed.facets.select({"difficulty": ["Hard"]})
+
+
+def test_tampered_bank_is_rejected(parsed):
+    raw = bytearray(binary_bank.compile_bank(parsed))
+    raw[-1] ^= 0xFF
+    with pytest.raises(ValueError, match="content hash"):
+        binary_bank.verify(bytes(raw))
+    with pytest.raises(ValueError):
+        quiz_bank.load_compiled(bytes(raw), cache=quiz_bank.BankCache())
+
+
+@pytest.mark.parametrize("keep", [10, binary_bank.PREFIX.size + 4, -9])
+def test_truncated_bank_is_rejected(parsed, keep):
+    raw = binary_bank.compile_bank(parsed)[:keep]
+    with pytest.raises(ValueError):
+        binary_bank.verify(raw)
+    with pytest.raises(ValueError):
+        binary_bank.bank_from_buffer(raw)
+
+
+def test_unknown_version_is_rejected(parsed):
+    raw = bytearray(binary_bank.compile_bank(parsed))
+    raw[4] = binary_bank.VERSION + 1
+    with pytest.raises(ValueError, match="version"):
+        binary_bank.bank_from_buffer(bytes(raw))
+
+
+def test_cached_upload_is_not_hashed_again(parsed, tmp_path, monkeypatch):
+    monkeypatch.setattr(binary_bank, "SPOOL_DIR", str(tmp_path))
+    cache = quiz_bank.BankCache()
+    raw = binary_bank.compile_bank(parsed)
+    first = quiz_bank.load_compiled(raw, cache)
+    monkeypatch.setattr(binary_bank, "verify", lambda raw: pytest.fail("verified a cached bank"))
+    assert quiz_bank.load_compiled(raw, cache) is first
@@ -0,0 +1,56 @@
+import json
+
+import dedup
+import quiz_bank
+
+TOPICS = ["temple inscription of the chola king", "river delta irrigation in the cauvery basin",
+          "fundamental rights in the constitution", "monsoon rainfall over the western ghats",
+          "sangam literature and its poets", "budget deficit and state revenue",
+          "census of population and literacy", "parliament and the election of the speaker"]
+
+
+def _bank(questions):
+    pairs = [
+        {"question": question, "answer": answer, "options": [{"A": answer}, {"B": "None of these"}],
+         "correct_option": "A"}
+        for question, answer in questions
+    ]
+    raw = json.dumps([{"lesson_name": "L", "unit": "U", "pairs": pairs}]).encode("utf-8")
+    return quiz_bank.load_bank(raw, cache=quiz_bank.BankCache())
+
+
+# Questions 0-7 are distinct, 8 copies 2 exactly, 9 rewords 5 and 10 rewords 9 further
+QUESTIONS = [(f"What is known about the {topic}?", f"Facts about the {topic}") for topic in TOPICS] + [
+    (f"What is known about the {TOPICS[2]}?", f"Facts about the {TOPICS[2]}"),
+    (f"What is known about the {TOPICS[5]} today?", f"Facts about the {TOPICS[5]}"),
+    (f"What is now known about the {TOPICS[5]} today?", f"Facts about the {TOPICS[5]}"),
+]
+
+
+def test_clusters_near_and_exact_duplicates():
+    found = dedup.find_duplicates(_bank(QUESTIONS))
+    assert found.exact == 1
+    assert found.near == 2
+    assert [list(cluster) for cluster in found.clusters()] == [[2, 8], [5, 9, 10]]
+    assert list(found.canonical) == [0, 1, 2, 3, 4, 5, 6, 7, 2, 5, 5]
+
+
+def test_duplicates_deep_in_a_bucket_are_found(monkeypatch):
+    # Every question gets the same signature, so all share one bucket whose first question matches none
+    def same_signatures(np, shingles, offsets, multipliers, increments):
+        return np.zeros((len(offsets) - 1, dedup.NUM_PERM), dtype=np.uint16)
+
+    monkeypatch.setattr(dedup, "_signatures", same_signatures)
+    monkeypatch.setattr(dedup, "MAX_CANDIDATES", len(QUESTIONS))
+    monkeypatch.setattr(dedup, "MAX_CHECKS", len(QUESTIONS))
+    found = dedup.find_duplicates(_bank(QUESTIONS))
+    assert [list(cluster) for cluster in found.clusters()] == [[2, 8], [5, 9, 10]]
+
+
+def test_collapse_keeps_the_same_question_in_any_order():
+    bank = _bank(QUESTIONS)
+    assert list(dedup.collapse(bank, [10, 8, 9, 5, 2, 1])) == [5, 2, 1]
+    assert list(dedup.collapse(bank, [9, 2, 10, 8, 5, 1])) == [2, 5, 1]
+    # Without the canonical question, the lowest id left stands for its cluster
+    assert list(dedup.collapse(bank, [10, 8, 9])) == [8, 9]
+    assert list(dedup.collapse(bank, [])) == []
@@ -0,0 +1,56 @@
+from array import array
+
+import facet_index
+import quiz_bank
+
+
+def _index(bank_json):
+    return quiz_bank.load_bank(bank_json, cache=quiz_bank.BankCache()).facets
+
+
+def test_values_and_counts_come_from_the_bank(bank_json):
+    index = _index(bank_json)
+    assert index.values("difficulty") == ["Easy", "Hard", "Medium"]
+    assert index.values("unit") == ["Unit I: History", "Unit II: Polity"]
+    assert index.count("difficulty", "Easy") == 4
+    assert index.count("syllabus_area", "Polity") == 6
+    assert index.count("unit", "Unit III") == 0
+    # Files loaded on their own have no source
+    assert index.values("source") == []
+
+
+def test_values_in_one_facet_are_a_union(bank_json):
+    index = _index(bank_json)
+    assert list(index.select({"difficulty": ["Easy", "Hard"]})) == [0, 2, 3, 5, 6, 8, 9, 11]
+    assert list(index.select({"lesson_name": ["Lesson 2", "Lesson 1"]})) == list(range(12))
+
+
+def test_facets_are_intersected(bank_json):
+    index = _index(bank_json)
+    selected = index.select({"difficulty": ["Medium"], "unit": ["Unit II: Polity"], "syllabus_area": []})
+    assert list(selected) == [7, 10]
+    assert list(index.select({"difficulty": ["Easy"], "syllabus_area": ["History", "Polity"]})) == [0, 3, 6, 9]
+
+
+def test_unknown_values_select_nothing_and_no_filters_select_all(bank_json):
+    index = _index(bank_json)
+    assert list(index.select({"unit": ["Unit III"]})) == []
+    assert list(index.select({"unit": ["Unit III", "Unit I: History"]})) == list(range(6))
+    assert index.select({}) is None
+    assert index.select({"difficulty": []}) is None
+
+
+def test_sorted_set_helpers():
+    assert list(facet_index.union_sorted([array("I", [1, 4]), array("I", [2, 3, 9])])) == [1, 2, 3, 4, 9]
+    id_arrays = [array("I", [1, 2, 5, 8]), array("I", [2, 8, 9]), array("I", [0, 8])]
+    assert list(facet_index.intersect_sorted(id_arrays)) == [8]
+    assert list(facet_index.intersect_sorted([])) == []
+
+
+def test_prebuilt_postings_are_used_as_they_are():
+    postings = {name: {} for name in facet_index.FACETS}
+    postings["unit"] = {"A": array("I", [0, 1]), "B": array("I", [2])}
+    postings["difficulty"] = {"Hard": array("I", [1, 2])}
+    index = facet_index.FacetIndex.from_postings(3, postings)
+    assert index.size == 3
+    assert list(index.select({"unit": ["A", "B"], "difficulty": ["Hard"]})) == [1, 2]
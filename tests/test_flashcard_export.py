@@ -0,0 +1,70 @@
+import io
+import json
+
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+import flashcard_export
+import quiz_bank
+from scheduler import Scheduler
+
+NOW = 1_700_000_000.0
+
+
+@pytest.fixture
+def bank(bank_json):
+    return quiz_bank.load_bank(bank_json, cache=quiz_bank.BankCache())
+
+
+def _studied(bank):
+    deck = Scheduler(list(range(len(bank))), now=NOW)
+    for card, quality in ((0, 5), (1, 2), (2, 4), (0, 4)):
+        deck.review(card, quality, now=NOW)
+    return deck
+
+
+def _upload(data):
+    # What st.download_button does with the callable's return value
+    raw, _ = convert_data_to_bytes_and_infer_mime(data, TypeError("unsupported"))
+    return io.BytesIO(raw)
+
+
+@pytest.mark.parametrize("fmt", list(flashcard_export.FORMATS))
+def test_export_round_trips_through_download_button(bank, fmt):
+    deck = _studied(bank)
+    upload = _upload(flashcard_export.export_file(bank, deck, fmt))
+    restored = Scheduler(list(range(len(bank))), now=NOW)
+    assert flashcard_export.import_progress(bank, restored, upload) == (len(bank), 0)
+    for card in range(len(bank)):
+        assert restored.card_state(card) == deck.card_state(card)
+
+
+def test_anki_export_starts_with_front_and_back(bank):
+    text = _upload(flashcard_export.export_file(bank, _studied(bank), "anki")).read().decode("utf-8")
+    columns = [line for line in text.splitlines() if line.startswith("#columns:")][0]
+    assert columns[len("#columns:"):].split("\t")[:2] == ["front", "back"]
+    first_card = [line for line in text.splitlines() if not line.startswith("#")][0].split("\t")
+    assert first_card[:2] == [bank.questions[0], bank.answers[0]]
+
+
+@pytest.mark.parametrize("field, value", [
+    ("reps", 70000), ("reps", -1), ("ease", float("nan")), ("ease", 1.0), ("interval", float("inf")),
+    ("interval", -1.0), ("mastery_level", 6), ("reps", float("inf")),
+])
+def test_out_of_range_rows_are_skipped(bank, field, value):
+    deck = _studied(bank)
+    rows = [json.loads(line) for line in flashcard_export.export_file(bank, deck, "jsonl").read().splitlines()]
+    rows[0][field] = value
+    upload = io.BytesIO("\n".join(json.dumps(row) for row in rows).encode("utf-8"))
+    restored = Scheduler(list(range(len(bank))), now=NOW)
+    assert flashcard_export.import_progress(bank, restored, upload) == (len(bank) - 1, 1)
+    assert restored.card_state(0) == Scheduler([0], now=NOW).card_state(0)
+
+
+def test_unreadable_file_applies_nothing(bank):
+    lines = flashcard_export.export_file(bank, _studied(bank), "jsonl").read().splitlines()
+    upload = io.BytesIO(b"\n".join(lines[:3] + [b"[1, 2]"] + lines[3:]))
+    restored = Scheduler(list(range(len(bank))), now=NOW)
+    with pytest.raises(ValueError, match="Line 4"):
+        flashcard_export.import_progress(bank, restored, upload)
+    assert restored.mastery_counts[0] == len(bank)
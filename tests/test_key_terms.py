@@ -0,0 +1,61 @@
+import json
+
+import memory_aids
+import quiz_bank
+
+
+def _bank(pairs, cache=None):
+    pairs = [
+        {"question": f"Question {i}?", "answer": answer, "options": [{"A": answer}, {"B": "None"}],
+         "correct_option": "A", "explanation": explanation}
+        for i, (answer, explanation) in enumerate(pairs)
+    ]
+    raw = json.dumps([{"lesson_name": "L", "unit": "U", "pairs": pairs}], ensure_ascii=False).encode("utf-8")
+    return quiz_bank.load_bank(raw, cache=cache or quiz_bank.BankCache())
+
+
+PAIRS = [
+    ("Chola emperor Rajaraja", None),
+    ("Chola admiral Rajendra", None),
+    ("Chola queen Sembiyan", None),
+    ("Pallava king Mahendravarman", "Pallava cave temples"),
+]
+
+
+def test_rare_answer_terms_rank_first():
+    bank = _bank(PAIRS)
+    # "Chola" is in three answers, so it comes after each answer's own words; ties keep the answer's order
+    assert bank.key_terms[0] == ("emperor", "Rajaraja", "Chola")
+    assert bank.key_terms[1] == ("admiral", "Rajendra", "Chola")
+    # Explanation words count toward the score but are never tips
+    assert bank.key_terms[3][0] == "Pallava"
+    assert "cave" not in bank.key_terms[3] and "temples" not in bank.key_terms[3]
+
+
+def test_tips_keep_top_terms_and_skip_filler():
+    bank = _bank([("The 1947 Indian Independence Act by Mountbatten and Attlee", None), ("Indian Chola", None)])
+    assert memory_aids.compute_key_terms(bank, top_n=2)[0] == ("Independence", "Act")
+    assert bank.key_terms[0] == ("Independence", "Act", "Mountbatten")
+    assert memory_aids.memory_aid(bank, 1) == "Remember these key terms: Chola, Indian"
+
+
+def test_first_spelling_is_used_and_empty_answers_fall_back():
+    bank = _bank([("CHOLA navy", None), ("chola army", None), ("--", None)])
+    assert "CHOLA" in bank.key_terms[1]
+    assert bank.key_terms[2] == ()
+    assert memory_aids.memory_aid(bank, 2) == memory_aids.FALLBACK_TIP
+
+
+def test_merged_files_score_like_one_bank():
+    files = [
+        ("a.json", json.dumps([{"lesson_name": "A", "pairs": [
+            {"question": "Q?", "answer": answer, "options": [{"A": answer}, {"B": "None"}], "correct_option": "A"}
+            for answer, _ in PAIRS[:2]]}]).encode("utf-8")),
+        ("b.json", json.dumps([{"lesson_name": "B", "pairs": [
+            {"question": "Q?", "answer": answer, "options": [{"A": answer}, {"B": "None"}], "correct_option": "A",
+             "explanation": explanation}
+            for answer, explanation in PAIRS[2:]]}]).encode("utf-8")),
+    ]
+    merged = quiz_bank.load_bank_files(files, cache=quiz_bank.BankCache())
+    assert merged.key_terms == _bank(PAIRS).key_terms
+    assert merged.key_terms == memory_aids.compute_key_terms(merged)
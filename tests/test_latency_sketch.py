@@ -0,0 +1,34 @@
+import math
+import random
+
+import pytest
+
+from latency_sketch import GROWTH, NUM_BUCKETS, LatencySketch, bucket_of, bucket_value
+
+
+def test_buckets_read_back_within_the_error_bound():
+    for ms in (1.5, 7, 250, 4000, 90_000):
+        assert bucket_value(bucket_of(ms)) == pytest.approx(ms, rel=(GROWTH - 1) / 2)
+    assert bucket_of(0) == 0
+    assert bucket_of(10**12) == NUM_BUCKETS - 1
+
+
+def test_quantiles_match_the_exact_ones():
+    rng = random.Random(0)
+    times = [rng.lognormvariate(8, 1) for _ in range(5000)]
+    sketch = LatencySketch()
+    for ms in times:
+        sketch.add(ms)
+    times.sort()
+    assert len(sketch) == len(times)
+    for q, ms in sketch.quantiles().items():
+        exact = times[math.ceil(q * len(times)) - 1]
+        assert ms == pytest.approx(exact, rel=0.05)
+
+
+def test_sketches_add_up_from_their_buckets():
+    sketch = LatencySketch.from_buckets([(10, 3), (20, 1), (10, 1)])
+    assert len(sketch) == 5
+    assert sketch.quantile(0.5) == bucket_value(10)
+    assert sketch.quantile(1.0) == bucket_value(20)
+    assert LatencySketch().quantile(0.5) is None
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+import quiz_bank
+
+
+def _file(name, lesson_sizes):
+    lessons = [
+        {"lesson_name": f"{name} lesson {lesson}", "unit": name, "pairs": [
+            {"question": f"{name} {lesson}.{i}?", "answer": f"Answer {i}",
+             "options": [{"A": f"Answer {i}"}, {"B": "No"}], "correct_option": "A"}
+            for i in range(size)]}
+        for lesson, size in enumerate(lesson_sizes)
+    ]
+    return name, json.dumps(lessons).encode("utf-8")
+
+
+FILES = [_file("b.json", [2, 1]), _file("a.json", [3]), _file("c.json", [0, 2])]
+
+
+def test_files_are_appended_in_name_order():
+    bank = quiz_bank.load_bank_files(FILES, cache=quiz_bank.BankCache())
+    assert len(bank) == 8
+    assert bank.questions[0] == "a.json 0.0?"
+    assert bank.questions[3] == "b.json 0.0?"
+    assert bank.questions[6] == "c.json 1.0?"
+    # Lessons keep their ranges, the empty lesson included
+    assert list(bank.lesson_offsets) == [0, 3, 5, 6, 6, 8]
+    assert [bank.lesson_of(qid) for qid in (2, 3, 5, 6, 7)] == [0, 1, 2, 4, 4]
+    assert bank.lesson_sources == ["a.json", "b.json", "b.json", "c.json", "c.json"]
+    assert bank.options(7) == {"A": "Answer 1", "B": "No"}
+
+
+def test_ids_do_not_depend_on_upload_order():
+    first = quiz_bank.load_bank_files(FILES, cache=quiz_bank.BankCache())
+    second = quiz_bank.load_bank_files(FILES[::-1], cache=quiz_bank.BankCache())
+    assert second.digest == first.digest
+    assert second.questions == first.questions
+    assert second.question_hashes() == first.question_hashes()
+
+
+def test_source_facet_selects_each_file():
+    facets = quiz_bank.load_bank_files(FILES, cache=quiz_bank.BankCache()).facets
+    assert facets.values("source") == ["a.json", "b.json", "c.json"]
+    assert list(facets.select({"source": ["b.json"]})) == [3, 4, 5]
+    assert list(facets.select({"source": ["c.json", "a.json"]})) == [0, 1, 2, 6, 7]
+
+
+def test_renamed_file_is_a_different_bank():
+    renamed = [("d.json", FILES[1][1])] + FILES[:1] + FILES[2:]
+    cache = quiz_bank.BankCache()
+    original = quiz_bank.load_bank_files(FILES, cache=cache)
+    assert quiz_bank.load_bank_files(renamed, cache=cache).digest != original.digest
+
+
+def test_directory_loads_like_uploads(tmp_path):
+    for name, raw in FILES:
+        (tmp_path / name).write_bytes(raw)
+    (tmp_path / "notes.txt").write_text("not a bank")
+    cache = quiz_bank.BankCache()
+    loaded = quiz_bank.load_bank_dir(str(tmp_path), cache=cache)
+    assert loaded.questions == quiz_bank.load_bank_files(FILES, cache=cache).questions
+    assert quiz_bank.load_bank_dir(str(tmp_path), cache=cache) is loaded
+
+
+def test_parallel_parse_assigns_the_same_ids(monkeypatch):
+    serial = quiz_bank.load_bank_files(FILES, cache=quiz_bank.BankCache())
+    monkeypatch.setattr(quiz_bank, "PARSE_WORKERS", 2)
+    parallel = quiz_bank.load_bank_files(FILES, cache=quiz_bank.BankCache())
+    assert parallel.questions == serial.questions
+    assert list(parallel.lesson_offsets) == list(serial.lesson_offsets)
+    assert parallel.key_terms == serial.key_terms
+
+
+def test_a_bad_file_is_named():
+    with pytest.raises(ValueError, match="bad.json"):
+        quiz_bank.load_bank_files(FILES + [("bad.json", b"{")], cache=quiz_bank.BankCache())
@@ -0,0 +1,52 @@
+import pytest
+
+from quiz_state import QuizState
+
+
+def _played(now=100.0):
+    quiz = QuizState("digest", [4, 2, 7, 1], now=now, question_seconds=30, time_limit=600)
+    quiz.show(now=now + 1)
+    quiz.answer("B", True, now=now + 3)
+    quiz.advance(now=now + 4)
+    quiz.show(now=now + 4)
+    quiz.answer("A", False, now=now + 9)
+    quiz.advance(now=now + 10)
+    quiz.show(now=now + 10)
+    return quiz
+
+
+def test_round_trip_keeps_answers_and_timings():
+    quiz = _played()
+    # Loaded in another process whose clock reads differently
+    restored = QuizState.from_bytes(quiz.to_bytes(now=112.0), now=5000.0)
+    assert restored.bank_digest == "digest"
+    assert list(restored.ids) == [4, 2, 7, 1]
+    assert restored.cursor == 2
+    assert [restored.choice(p) for p in range(4)] == ["B", "A", None, None]
+    assert [restored.is_correct(p) for p in range(2)] == [True, False]
+    assert restored.results() == quiz.results()
+    assert [restored.mark(kind, 1) for kind in range(2)] == [quiz.mark(kind, 1) for kind in range(2)]
+    # The clocks carry on with the time that was left
+    assert restored.remaining(now=5000.0) == (28.0, 588.0)
+    assert restored.answer("C", True, now=5001.0) == pytest.approx(3.0)
+
+
+def test_rejects_other_bytes():
+    data = _played().to_bytes(now=112.0)
+    with pytest.raises(ValueError):
+        QuizState.from_bytes(data[:-1])
+    with pytest.raises(ValueError):
+        QuizState.from_bytes(data[:10])
+    with pytest.raises(ValueError):
+        QuizState.from_bytes(b"XXXX" + data[4:])
+
+
+def test_saved_quiz_comes_back_from_the_store(store):
+    quiz = _played()
+    # Snapshots are written before save_quiz returns, with no flush
+    store.save_quiz("ana", quiz)
+    assert QuizState.from_bytes(store.load_quiz("ana", "digest")).results() == quiz.results()
+    assert store.load_quiz("ana", "other") is None
+    assert store.load_quiz("ben", "digest") is None
+    store.discard_quiz("ana", "digest")
+    assert store.load_quiz("ana", "digest") is None
@@ -0,0 +1,49 @@
+import analytics
+import progress_store
+import quiz_bank
+
+
+def _totals(store, user):
+    totals = {}
+    for dimension, value, _, attempts, correct, latency_ms, timed in store.load_rollups(user):
+        total = totals.setdefault((dimension, value), [0, 0, 0, 0])
+        for i, count in enumerate((attempts, correct, latency_ms, timed)):
+            total[i] += count
+    return totals
+
+
+def test_live_attempts_roll_up_by_topic_and_day(bank_json, store):
+    bank = quiz_bank.load_bank(bank_json, cache=quiz_bank.BankCache())
+    for qid, correct, seconds in ((0, True, 2.0), (1, False, 4.0), (6, True, None)):
+        store.record_attempt("ana", bank.question_hash(qid), "A", correct, seconds, topics=analytics.topics(bank, qid))
+    store.flush()
+    totals = _totals(store, "ana")
+    assert totals[(progress_store.OVERALL, "")] == [3, 2, 6000, 2]
+    assert totals[("unit", "Unit I: History")] == [2, 1, 6000, 2]
+    assert totals[("syllabus_area", "Polity")] == [1, 1, 0, 0]
+    history = analytics.history("ana")
+    assert list(history.totals) == [3, 2, 6000, 2]
+    assert _totals(store, "ben") == {}
+
+
+def test_backfill_adds_older_attempts_once(bank_json, store):
+    bank = quiz_bank.load_bank(bank_json, cache=quiz_bank.BankCache())
+    # Attempts from before rollups were kept, one at a question the bank no longer has
+    store.record_attempt("ana", bank.question_hash(0), "A", True, 1.0)
+    store.record_attempt("ana", "gone", "B", False, 1.0)
+    store.flush()
+    store.record_attempt("ana", bank.question_hash(1), "B", False, 3.0, topics=analytics.topics(bank, 1))
+    store.flush()
+    assert analytics.backfill(bank, "ana") == 1
+    assert analytics.backfill(bank, "ana") == 0
+    assert _totals(store, "ana")[(progress_store.OVERALL, "")] == [2, 1, 4000, 2]
+
+
+def test_backfill_racing_a_live_attempt_counts_it_once(bank_json, store):
+    bank = quiz_bank.load_bank(bank_json, cache=quiz_bank.BankCache())
+    for qid in range(6):
+        store.record_attempt("ana", bank.question_hash(qid), "A", True, 1.0, topics=analytics.topics(bank, qid))
+        # The backfill may run before or after the writer commits the attempt, never in between
+        analytics.backfill(bank, "ana")
+    store.flush()
+    assert _totals(store, "ana")[(progress_store.OVERALL, "")] == [6, 6, 6000, 6]
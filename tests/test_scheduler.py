@@ -0,0 +1,37 @@
+from scheduler import DAY_SECONDS, MIN_EASE, RELEARN_SECONDS, Scheduler
+
+NOW = 1_700_000_000.0
+
+
+def test_intervals_follow_sm2():
+    deck = Scheduler([10, 11, 12], now=NOW)
+    deck.review(0, 5, now=NOW)
+    assert deck.due[0] == NOW + DAY_SECONDS
+    deck.review(0, 5, now=NOW)
+    assert deck.due[0] == NOW + 6 * DAY_SECONDS
+    ease = deck.ease[0]
+    deck.review(0, 4, now=NOW)
+    assert deck.interval[0] == 6 * ease
+    assert deck.reps[0] == 3
+
+
+def test_a_lapse_comes_back_in_the_session_and_lowers_ease():
+    deck = Scheduler([10, 11], now=NOW)
+    for _ in range(10):
+        deck.review(0, 0, now=NOW)
+    assert deck.reps[0] == 0
+    assert deck.due[0] == NOW + RELEARN_SECONDS
+    assert abs(deck.ease[0] - MIN_EASE) < 1e-6
+
+
+def test_next_due_and_counts_follow_reviews():
+    deck = Scheduler([10, 11, 12], now=NOW)
+    deck.review(0, 5, now=NOW)
+    deck.review(1, 2, now=NOW)
+    assert deck.next_due() == 2
+    assert deck.mastery_counts == [1, 0, 1, 0, 0, 1]
+    assert deck.due_today(now=NOW) == 2
+    deck.restore(2, 3, 2.5, 6.0, 2, NOW + 6 * DAY_SECONDS)
+    assert deck.next_due() == 1
+    assert deck.mastery_counts == [0, 0, 1, 1, 0, 1]
+    assert deck.due_today(now=NOW) == 1
@@ -0,0 +1,49 @@
+import json
+
+import quiz_bank
+import search_index
+
+
+def _bank(questions):
+    pairs = [
+        {"question": question, "answer": answer, "options": [{"A": answer}, {"B": "None of these"}],
+         "correct_option": "A", "explanation": explanation}
+        for question, answer, explanation in questions
+    ]
+    raw = json.dumps([{"lesson_name": "L", "unit": "U", "pairs": pairs}], ensure_ascii=False).encode("utf-8")
+    return quiz_bank.load_bank(raw, cache=quiz_bank.BankCache())
+
+
+BANK = [
+    ("Who built the Brihadeeswarar temple?", "Raja Raja Chola", None),
+    ("Which river flows through Thanjavur?", "Cauvery", "The temple town lies in its delta."),
+    ("Which dynasty issued the Uttaramerur inscriptions?", "The Cholas", None),
+    ("சோழர் காலக் கல்வெட்டு எங்கு உள்ளது?", "உத்திரமேரூர்", None),
+    ("What is the capital of Kerala?", "Thiruvananthapuram", None),
+]
+
+
+def test_question_matches_rank_above_explanation_matches():
+    ids, scores, total = search_index.search(_bank(BANK), "temple")
+    assert list(ids) == [0, 1]
+    assert scores[0] > scores[1]
+    assert total == 2
+
+
+def test_words_match_as_prefixes_and_every_word_adds_up():
+    bank = _bank(BANK)
+    # "chol" expands to both "chola" and "cholas"
+    assert set(search_index.search(bank, "chol")[0]) == {0, 2}
+    ids, _, _ = search_index.search(bank, "chola inscriptions")
+    assert ids[0] == 2
+    assert list(search_index.search(bank, "கல்வெ")[0]) == [3]
+    # Single letters only match whole terms
+    assert search_index.search(bank, "t")[2] == 0
+    assert search_index.search(bank, "the of")[2] == 0
+
+
+def test_total_counts_hits_past_the_limit():
+    bank = _bank([(f"Temple question {i}?", f"Answer {i}", None) for i in range(30)])
+    ids, scores, total = search_index.search(bank, "temple", limit=10)
+    assert len(ids) == len(scores) == 10
+    assert total == 30
@@ -0,0 +1,69 @@
+import io
+import json
+
+import pytest
+
+import quiz_bank
+
+
+def test_stream_reads_lessons_across_small_chunks(bank_json):
+    stream = quiz_bank.LessonStream(io.BytesIO(bank_json), chunk_size=16)
+    lessons = list(stream)
+    assert lessons == json.loads(bank_json)
+    assert stream.bytes_read == len(bank_json)
+
+
+def test_stream_accepts_text_and_a_byte_order_mark(bank_json):
+    raw = b"\xef\xbb\xbf" + bank_json
+    assert len(list(quiz_bank.LessonStream(io.BytesIO(raw), chunk_size=7))) == 2
+    text = io.StringIO(bank_json.decode("utf-8"))
+    assert len(list(quiz_bank.LessonStream(text, chunk_size=7))) == 2
+    assert list(quiz_bank.LessonStream(io.BytesIO(b" [ ] "))) == []
+
+
+@pytest.mark.parametrize("raw", [b"{}", b'[{"lesson_name": "L"}', b'[{"lesson_name": "L"} {}]'])
+def test_stream_rejects_broken_files(raw):
+    with pytest.raises(ValueError):
+        list(quiz_bank.LessonStream(io.BytesIO(raw), chunk_size=4))
+
+
+def test_streamed_bank_matches_the_whole_file_load(bank_json):
+    cache = quiz_bank.BankCache()
+    whole = quiz_bank.load_bank(bank_json, cache=cache)
+    streamed, stats = quiz_bank.load_bank_streaming(io.BytesIO(bank_json), chunk_size=64, cache=cache)
+    assert streamed.questions == whole.questions
+    assert streamed.lesson_offsets == whole.lesson_offsets
+    assert stats["lessons"] == 2 and stats["pairs"] == 12
+    assert stats["bytes_read"] == len(bank_json)
+    assert stats["peak_bytes"] is None
+
+
+def test_cap_stops_inside_a_lesson_and_keys_the_digest(bank_json):
+    cache = quiz_bank.BankCache()
+    capped, stats = quiz_bank.load_bank_streaming(io.BytesIO(bank_json), max_pairs=4, chunk_size=64, cache=cache)
+    assert len(capped) == 4
+    assert stats["lessons"] == 1
+    assert capped.questions[-1].startswith("சோழர் question 3 ")
+    assert capped.digest.endswith(":4")
+
+    # Reaching the cap on a lesson boundary does not read the next lesson
+    capped, stats = quiz_bank.load_bank_streaming(io.BytesIO(bank_json), max_pairs=6, chunk_size=64, cache=cache)
+    assert len(capped) == 6 and stats["lessons"] == 1
+    assert stats["bytes_read"] < len(bank_json)
+
+    full, _ = quiz_bank.load_bank_streaming(io.BytesIO(bank_json), max_pairs=100, chunk_size=64, cache=cache)
+    assert len(full) == 12
+    assert full.digest != capped.digest
+
+
+def test_trace_memory_reports_a_peak(bank_json):
+    _, stats = quiz_bank.load_bank_streaming(io.BytesIO(bank_json), cache=quiz_bank.BankCache(), trace_memory=True)
+    assert stats["peak_bytes"] > 0
+
+
+def test_server_file_is_streamed_only_under_a_cap(bank_json, tmp_path):
+    path = tmp_path / "bank.json"
+    path.write_bytes(bank_json)
+    cache = quiz_bank.BankCache()
+    assert len(quiz_bank.load_bank_file(str(path), max_pairs=5, cache=cache)) == 5
+    assert len(quiz_bank.load_bank_file(str(path), cache=cache)) == 12
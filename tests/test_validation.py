@@ -0,0 +1,32 @@
+import validation
+from validation import ValidationReport
+
+
+def _report(source, pair_ids, bad_pairs=0):
+    report = ValidationReport()
+    report.check_lesson(0, {"lesson_name": "L", "pairs": []}, source=source)
+    for index, pair_id in enumerate(pair_ids):
+        report.seen_id(index, pair_id)
+    for index in range(bad_pairs):
+        report.reject(len(pair_ids) + index, {"question": "q"})
+    return report
+
+
+def test_merge_adds_counts_and_checks_ids_across_files():
+    merged = _report("a.json", ["q1", "q2"], bad_pairs=1)
+    merged.merge(_report("b.json", ["q2", "q3", "q3"], bad_pairs=2))
+    assert merged.skipped_pairs == 3
+    assert merged.counts == {"missing_keys": 3, "duplicate_id": 2}
+    assert merged.warnings == 2
+    duplicates = [issue for issue in merged.issues if issue[1] == "duplicate_id"]
+    assert {issue[2][0] for issue in duplicates} == {"b.json"}
+    assert any("a.json" in issue[3] for issue in duplicates)
+
+
+def test_merge_keeps_counting_past_the_issue_limit(monkeypatch):
+    monkeypatch.setattr(validation, "MAX_ISSUES", 2)
+    merged = _report("a.json", [], bad_pairs=1)
+    merged.merge(_report("b.json", [], bad_pairs=3))
+    assert len(merged.issues) == 2
+    assert merged.counts == {"missing_keys": 4}
+    assert merged.to_dict()["truncated"] == 2
@@ -0,0 +1,149 @@
+from question_bank import MIN_OPTIONS, OPTION_LETTERS
+
+# Keys a pair needs to be shown as a question
+REQUIRED_KEYS = ("question", "answer", "options", "correct_option")
+# Problems kept with their location, any beyond this are only counted
+MAX_ISSUES = 1000
+
+
+# Function to find what stops a pair from being shown, returns (kind, message) or None. The bank's packing
+# loop makes the same checks on its fast path, this only runs for the pairs it rejects
+def pair_problem(pair):
+    if not isinstance(pair, dict):
+        return "not_object", "is not an object"
+    missing = [key for key in REQUIRED_KEYS if pair.get(key) is None]
+    if missing:
+        return "missing_keys", "is missing " + ", ".join(f"'{key}'" for key in missing)
+    options = pair["options"]
+    if not isinstance(options, list) or not MIN_OPTIONS <= len(options) <= len(OPTION_LETTERS):
+        return "options", f"needs a list of {MIN_OPTIONS} to {len(OPTION_LETTERS)} options"
+    for letter, option in zip(OPTION_LETTERS, options):
+        # Options are shown by position, so a labelled option must carry its position's letter
+        if isinstance(option, dict) and (len(option) != 1 or letter not in option):
+            return "options", f"has option {letter} written as {option!r}, expected {{\"{letter}\": ...}}"
+    correct = pair["correct_option"]
+    if correct not in OPTION_LETTERS[:len(options)]:
+        return "correct_option", f"has correct_option {correct!r}, which is not one of its options"
+    pair_id = pair.get("id")
+    if pair_id is not None and not isinstance(pair_id, (str, int)):
+        return "id", f"has id {pair_id!r}, which is not a string or number"
+    return None
+
+
+# Function to describe where a problem is, for messages
+def describe(location):
+    source, lesson_number, lesson_name, pair_number = location
+    parts = [source] if source else []
+    parts.append(f"lesson {lesson_number}" + (f" ({lesson_name})" if lesson_name else ""))
+    if pair_number:
+        parts.append(f"pair {pair_number}")
+    return ", ".join(parts)
+
+
+# What loading a bank found wrong with it, filled in by QuestionBank.add_lesson while the bank is packed.
+# Pairs and lessons with errors are left out of the bank, warnings are kept
+class ValidationReport:
+    __slots__ = ("issues", "counts", "skipped_pairs", "skipped_lessons", "warnings", "_lesson", "_ids")
+
+    def __init__(self):
+        # (severity, kind, location, message) with location as (file, lesson number, lesson name, pair number)
+        self.issues = []
+        self.counts = {}
+        self.skipped_pairs = 0
+        self.skipped_lessons = 0
+        self.warnings = 0
+        self._lesson = (None, 0, None)
+        # Pair id -> location it was first seen at, only kept while loading
+        self._ids = {}
+
+    def clean(self):
+        return not self.counts
+
+    def _add(self, severity, kind, location, message):
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        if len(self.issues) < MAX_ISSUES:
+            self.issues.append((severity, kind, location, message))
+
+    # Function to check one lesson before its pairs, returns its pair list or None to leave it out
+    def check_lesson(self, lesson_index, lesson, source=None):
+        name = lesson.get("lesson_name") if isinstance(lesson, dict) else None
+        self._lesson = (source, lesson_index + 1, name if isinstance(name, str) else None)
+        if not isinstance(lesson, dict):
+            problem = ("lesson", "is not an object")
+        else:
+            pairs = lesson.get("pairs", [])
+            if isinstance(pairs, list):
+                return pairs
+            problem = ("lesson", "has a 'pairs' value that is not a list")
+        self.skipped_lessons += 1
+        self._add("error", problem[0], self._lesson + (0,), problem[1])
+        return None
+
+    # Function to record a pair of the current lesson that was left out of the bank
+    def reject(self, pair_index, pair):
+        kind, message = pair_problem(pair) or ("unreadable", "could not be read")
+        self.skipped_pairs += 1
+        self._add("error", kind, self._lesson + (pair_index + 1,), message)
+
+    # Function to record a pair's id, a repeated id is a warning and the pair is kept
+    def seen_id(self, pair_index, pair_id):
+        location = self._lesson + (pair_index + 1,)
+        first = self._ids.setdefault(pair_id, location)
+        if first is not location:
+            self.warnings += 1
+            self._add("warning", "duplicate_id", location, f"repeats id {pair_id!r} from {describe(first)}")
+
+    # Function to fold in the report of another file loaded into the same bank, ids are checked across files
+    def merge(self, other):
+        for severity, kind, location, message in other.issues:
+            self._add(severity, kind, location, message)
+        # Problems the other report only counted are counted here too
+        for kind, count in other.counts.items():
+            shown = sum(1 for issue in other.issues if issue[1] == kind)
+            self.counts[kind] = self.counts.get(kind, 0) + count - shown
+        self.skipped_pairs += other.skipped_pairs
+        self.skipped_lessons += other.skipped_lessons
+        self.warnings += other.warnings
+        for pair_id, location in other._ids.items():
+            first = self._ids.setdefault(pair_id, location)
+            if first is not location:
+                self.warnings += 1
+                self._add("warning", "duplicate_id", location, f"repeats id {pair_id!r} from {describe(first)}")
+
+    # Function to drop what was only needed while loading
+    def close(self):
+        self._ids = {}
+
+    # Function to get the first error as one line, for banks with nothing left to load
+    def first_error(self):
+        for severity, _, location, message in self.issues:
+            if severity == "error":
+                return f"{describe(location)} {message}"
+        return None
+
+    def summary(self):
+        parts = []
+        for count, noun in ((self.skipped_pairs, "question"), (self.skipped_lessons, "lesson")):
+            if count:
+                parts.append(f"{count} {noun}{'s' if count != 1 else ''} left out")
+        if self.warnings:
+            parts.append(f"{self.warnings} warning{'s' if self.warnings != 1 else ''}")
+        return ", ".join(parts)
+
+    # Function to list the kept issues as rows for a table or a JSON report
+    def rows(self):
+        return [
+            {"severity": severity, "kind": kind, "file": location[0], "lesson": location[1],
+             "lesson_name": location[2], "pair": location[3] or None, "problem": message}
+            for severity, kind, location, message in self.issues
+        ]
+
+    def to_dict(self):
+        return {
+            "skipped_pairs": self.skipped_pairs,
+            "skipped_lessons": self.skipped_lessons,
+            "warnings": self.warnings,
+            "counts": dict(self.counts),
+            "issues": self.rows(),
+            "truncated": sum(self.counts.values()) - len(self.issues),
+        }